@@ -1,15 +1,57 @@
+import queue
 import sqlite3
-from datetime import datetime
+import threading
+import time
+
+from metrics import metrics
+
+# user_version de la base: 0 = ancienne table data, 1 = plates + sightings
+SCHEMA_VERSION = 1
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
 
 class BDDeManager:
-    def __init__(self, db_name='data.db'):
+    def __init__(self, db_name='data.db', write_behind=False, batch_size=100, flush_interval_ms=200,
+                 queue_size=10000, synchronous='NORMAL'):
         self.db_name = db_name
         self.conn = None
+        # Index en memoire des plaques connues (plaque -> nombre de lignes)
+        self.known_plates = {}
+        # Mode write-behind: les insertions passent par une file bornee videe par un thread dedie
+        self.write_behind = write_behind
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.synchronous = synchronous
+        self.stats = {
+            'queued': 0,
+            'written': 0,
+            'failed': 0,
+            'commits': 0,
+            'last_commit_ms': 0.0,
+            'max_commit_ms': 0.0,
+            'total_commit_ms': 0.0,
+        }
+        # stats et known_plates sont aussi modifies par le thread d'ecriture
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = None
         self.create_connection()
+        if self.write_behind:
+            self._writer = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+            self._writer.start()
+
+    def _configure(self, conn):
+        # WAL: les lectures ne bloquent pas l'ecrivain, synchronous reglable (OFF, NORMAL, FULL)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
 
     def create_connection(self):
         try:
             self.conn = sqlite3.connect(self.db_name)
+            self._configure(self.conn)
             print(f"Connected to database: {self.db_name}")
         except sqlite3.Error as e:
             print(f"Error connecting to database: {e}")
@@ -17,64 +59,375 @@ class BDDeManager:
     def create_table(self):
         try:
             cursor = self.conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS data (
+            # Schema normalise: une ligne par plaque, une ligne par passage (horodatage en ms epoch)
+            cursor.executescript('''
+                CREATE TABLE IF NOT EXISTS plates (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    numbers TEXT NOT NULL UNIQUE,
+                    sighting_count INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS sightings (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    numbers TEXT,
-                    date_time TEXT
-                )
+                    plate_id INTEGER NOT NULL REFERENCES plates (id) ON DELETE CASCADE,
+                    camera_id TEXT,
+                    ts_ms INTEGER NOT NULL,
+                    confidence REAL,
+                    crop_path TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_sightings_plate_ts ON sightings (plate_id, ts_ms);
+                CREATE INDEX IF NOT EXISTS idx_sightings_ts ON sightings (ts_ms);
+                CREATE INDEX IF NOT EXISTS idx_sightings_camera_ts ON sightings (camera_id, ts_ms);
             ''')
+            if cursor.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                self._migrate(cursor)
             self.conn.commit()
-            print("La Table 'data' est creee avec succes")
+            print("Les tables 'plates' et 'sightings' sont creees avec succes")
+            self.load_plates()
         except sqlite3.Error as e:
+            self.conn.rollback()
             print(f"Erreur de creation de table: {e}")
 
-    def insertion(self, numbers):
+    def _migrate(self, cursor):
+        # Ancienne table data(id, numbers, date_time[, camera_id]) convertie sur place, dans la
+        # meme transaction; les id des passages reprennent ceux de data
+        tables = {row[0]: row[1] for row in cursor.execute("SELECT name, type FROM sqlite_master")}
+        if tables.get('data') == 'table':
+            columns = [row[1] for row in cursor.execute("PRAGMA table_info(data)")]
+            camera = 'd.camera_id' if 'camera_id' in columns else 'NULL'
+            cursor.execute('''
+                INSERT OR IGNORE INTO plates (numbers)
+                SELECT DISTINCT numbers FROM data WHERE numbers IS NOT NULL
+            ''')
+            # date_time est en heure locale: le modificateur 'utc' la ramene en UTC avant '%s'
+            cursor.execute(f'''
+                INSERT INTO sightings (id, plate_id, camera_id, ts_ms)
+                SELECT d.id, p.id, {camera}, CAST(strftime('%s', d.date_time, 'utc') AS INTEGER) * 1000
+                FROM data d JOIN plates p ON p.numbers = d.numbers
+                WHERE d.date_time IS NOT NULL
+            ''')
+            cursor.execute('''
+                UPDATE plates SET sighting_count = (SELECT COUNT(*) FROM sightings WHERE plate_id = plates.id)
+            ''')
+            cursor.execute("DROP TABLE data")
+            print("Migration de 'data' vers 'plates'/'sightings' terminee")
+        if tables.get('data') != 'view':
+            # Vue de compatibilite pour les outils qui lisent encore data
+            cursor.execute('''
+                CREATE VIEW IF NOT EXISTS data AS
+                SELECT s.id AS id, p.numbers AS numbers,
+                       datetime(s.ts_ms / 1000, 'unixepoch', 'localtime') AS date_time, s.camera_id AS camera_id
+                FROM sightings s JOIN plates p ON p.id = s.plate_id
+            ''')
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def insertion(self, numbers, camera_id=None, confidence=None, crop_path=None, timestamp_ms=None):
+        with metrics.timer('db_insert'):
+            self._insertion(numbers, camera_id, confidence, crop_path, timestamp_ms)
+
+    def _insertion(self, numbers, camera_id=None, confidence=None, crop_path=None, timestamp_ms=None):
         try:
-            now = datetime.now()
-            date_time = now.strftime("%Y-%m-%d %H:%M:%S")
+            row = (numbers, timestamp_ms if timestamp_ms is not None else now_ms(), camera_id, confidence, crop_path)
 
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO data (numbers, date_time)
-                VALUES (?, ?)
-            ''', (numbers, date_time))
-            self.conn.commit()
+            if self.write_behind:
+                # Bloque si la file est pleine (contre-pression) au lieu de perdre des plaques
+                self._queue.put(row)
+                with self._lock:
+                    self.stats['queued'] += 1
+                    self.known_plates[numbers] = self.known_plates.get(numbers, 0) + 1
+                metrics.set_gauge('db_queue_depth', self._queue.qsize())
+                return
+
+            with self.conn:
+                self._insert_rows(self.conn, [row])
+            with self._lock:
+                self.known_plates[numbers] = self.known_plates.get(numbers, 0) + 1
             print("Insertion avec succes.")
         except sqlite3.Error as e:
             print(f"Erreur d'insertion des donnees: {e}")
 
+    def _insert_rows(self, conn, rows):
+        # rows: (numbers, ts_ms, camera_id, confidence, crop_path)
+        conn.executemany('''
+            INSERT INTO plates (numbers, sighting_count) VALUES (?, 1)
+            ON CONFLICT (numbers) DO UPDATE SET sighting_count = sighting_count + 1
+        ''', [(row[0],) for row in rows])
+        conn.executemany('''
+            INSERT INTO sightings (plate_id, ts_ms, camera_id, confidence, crop_path)
+            SELECT id, ?, ?, ?, ? FROM plates WHERE numbers = ?
+        ''', [row[1:] + row[:1] for row in rows])
+
+    def _writer_loop(self):
+        # Le thread ne doit jamais mourir: flush() et close_connection() attendent la file (join)
+        try:
+            conn = sqlite3.connect(self.db_name)
+            self._configure(conn)
+        except sqlite3.Error as e:
+            print(f"Erreur de connexion du thread d'ecriture: {e}")
+            conn = None
+        running = True
+        while running:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            # Regroupe jusqu'a batch_size lignes ou flush_interval secondes
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+            try:
+                if conn is None:
+                    raise sqlite3.Error(f"pas de connexion a {self.db_name}")
+                self._write_batch(conn, batch)
+            except Exception as e:
+                # Erreur inattendue: le lot est perdu (et compte comme tel), le thread continue
+                print(f"Erreur d'insertion des donnees: {e}")
+                self._batch_done(0, batch, 0.0)
+            finally:
+                for _ in range(len(batch) + (0 if running else 1)):
+                    self._queue.task_done()
+        if conn is not None:
+            conn.close()
+
+    def _write_batch(self, conn, batch):
+        start = time.perf_counter()
+        try:
+            with conn:
+                self._insert_rows(conn, batch)
+            written, failed = batch, []
+        except sqlite3.Error as e:
+            print(f"Erreur d'insertion des donnees: {e}")
+            # Lot annule: chaque ligne est reessayee seule, pour ne perdre que celles qui echouent encore
+            written, failed = [], []
+            for row in batch:
+                try:
+                    with conn:
+                        self._insert_rows(conn, [row])
+                    written.append(row)
+                except sqlite3.Error:
+                    failed.append(row)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        metrics.observe('db_commit', elapsed_ms / 1000.0)
+        self._batch_done(len(written), failed, elapsed_ms)
+
+    def _batch_done(self, written, failed, elapsed_ms):
+        metrics.inc('db_rows_written', written)
+        metrics.set_gauge('db_queue_depth', self._queue.qsize())
+        with self._lock:
+            # Plaques perdues: retirees de l'index, plate_exists ne doit pas les annoncer comme connues
+            for row in failed:
+                count = self.known_plates.get(row[0], 0) - 1
+                if count > 0:
+                    self.known_plates[row[0]] = count
+                else:
+                    self.known_plates.pop(row[0], None)
+            self.stats['written'] += written
+            self.stats['failed'] += len(failed)
+            self.stats['commits'] += 1
+            self.stats['last_commit_ms'] = elapsed_ms
+            self.stats['max_commit_ms'] = max(self.stats['max_commit_ms'], elapsed_ms)
+            self.stats['total_commit_ms'] += elapsed_ms
+        if failed:
+            metrics.inc('db_rows_failed', len(failed))
+            print(f"{len(failed)} passage(s) non enregistre(s)")
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['queue_depth'] = self.queue_depth()
+        stats['avg_commit_ms'] = stats['total_commit_ms'] / stats['commits'] if stats['commits'] else 0.0
+        return stats
+
+    def flush(self):
+        # Attend que toutes les insertions en file soient ecrites
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.join()
+
     def recup(self):
+        self.flush()
         try:
             cursor = self.conn.cursor()
-            cursor.execute('''SELECT * FROM data''')
+            cursor.execute('''
+                SELECT s.id, p.numbers, datetime(s.ts_ms / 1000, 'unixepoch', 'localtime')
+                FROM sightings s JOIN plates p ON p.id = s.plate_id ORDER BY s.id
+            ''')
             results = cursor.fetchall()
             return results
         except sqlite3.Error as e:
             print(f"Erreur dans la recuperation des donnees: {e}")
             return None
-       
-    def update_plate(self, old_plate, new_plate):
+
+    def fetch_page(self, before_id=None, limit=200, offset=0):
+        # Pagination par cle (id decroissant): cout constant quelle que soit la taille de la table;
+        # offset seulement pour un saut direct (barre de defilement), sans page voisine connue
         try:
             cursor = self.conn.cursor()
-            cursor.execute("UPDATE data SET numbers = ? WHERE numbers = ?", (new_plate, old_plate))
-            self.conn.commit()
+            cursor.execute('''
+                SELECT s.id, p.numbers, datetime(s.ts_ms / 1000, 'unixepoch', 'localtime')
+                FROM sightings s JOIN plates p ON p.id = s.plate_id
+                WHERE s.id < ? ORDER BY s.id DESC LIMIT ? OFFSET ?
+            ''', (before_id if before_id is not None else 2 ** 63 - 1, limit, offset))
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"Erreur dans la recuperation des donnees: {e}")
+            return []
+
+    def count_sightings(self):
+        # (nombre de passages, plus grand id) pour borner la table paginee a un instant donne
+        self.flush()
+        try:
+            cursor = self.conn.cursor()
+            count, max_id = cursor.execute("SELECT COUNT(*), MAX(id) FROM sightings").fetchone()
+            return count, max_id or 0
+        except sqlite3.Error as e:
+            print(f"Erreur dans le comptage des passages: {e}")
+            return 0, 0
+
+    def nth_sighting_id(self, after_id, n):
+        # id du n-ieme passage (1 = le plus ancien) d'id > after_id, ou None
+        try:
+            cursor = self.conn.cursor()
+            row = cursor.execute("SELECT id FROM sightings WHERE id > ? ORDER BY id LIMIT 1 OFFSET ?",
+                                 (after_id, n - 1)).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            print(f"Erreur dans la recherche d'un passage: {e}")
+            return None
+
+    def sightings(self, plate_text, start_ms=None, end_ms=None, limit=None):
+        """Passages d'une plaque entre start_ms et end_ms (inclus), du plus recent au plus ancien.
+
+        Lignes: (id, camera_id, ts_ms, confidence, crop_path); index (plate_id, ts_ms).
+        """
+        self.flush()
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                SELECT s.id, s.camera_id, s.ts_ms, s.confidence, s.crop_path
+                FROM plates p JOIN sightings s ON s.plate_id = p.id
+                WHERE p.numbers = ? AND s.ts_ms BETWEEN ? AND ?
+                ORDER BY s.ts_ms DESC LIMIT ?
+            ''', (plate_text, start_ms if start_ms is not None else 0,
+                  end_ms if end_ms is not None else 2 ** 63 - 1, limit if limit is not None else -1))
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"Erreur dans la recuperation des passages: {e}")
+            return []
+
+    def last_seen(self, plate_text):
+        # Dernier passage (ms epoch) ou None; MAX sur l'index (plate_id, ts_ms)
+        self.flush()
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                SELECT MAX(s.ts_ms) FROM plates p JOIN sightings s ON s.plate_id = p.id WHERE p.numbers = ?
+            ''', (plate_text,))
+            return cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Erreur dans la recuperation des passages: {e}")
+            return None
+
+    def counts_per_hour(self, start_ms, end_ms, plate_text=None, camera_id=None):
+        """Nombre de passages par heure entre start_ms et end_ms: [(debut de l'heure en ms, nombre)]."""
+        self.flush()
+        conditions = ["s.ts_ms BETWEEN ? AND ?"]
+        params = [start_ms, end_ms]
+        if plate_text is not None:
+            conditions.append("s.plate_id = (SELECT id FROM plates WHERE numbers = ?)")
+            params.append(plate_text)
+        if camera_id is not None:
+            conditions.append("s.camera_id = ?")
+            params.append(camera_id)
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(f'''
+                SELECT s.ts_ms / 3600000 * 3600000 AS hour, COUNT(*)
+                FROM sightings s WHERE {' AND '.join(conditions)}
+                GROUP BY hour ORDER BY hour
+            ''', params)
+            return cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"Erreur dans le comptage des passages: {e}")
+            return []
+
+    def load_plates(self):
+        # Charge une seule fois les plaques connues (une ligne par plaque, compteur tenu a jour)
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute('''SELECT numbers, sighting_count FROM plates''')
+            self.known_plates = dict(cursor.fetchall())
+        except sqlite3.Error as e:
+            print(f"Erreur lors du chargement des plaques: {e}")
+
+    def plate_exists(self, plate_text):
+        # Recherche O(1) dans l'index en memoire, sans requete SQLite
+        metrics.inc('db_lookup')
+        return plate_text in self.known_plates
+
+    def update_plate(self, old_plate, new_plate):
+        # Une seule ligne de plates a renommer; si la nouvelle plaque existe deja, ses passages sont fusionnes
+        self.flush()
+        if old_plate == new_plate:
+            return
+        try:
+            with self.conn:
+                cursor = self.conn.cursor()
+                old_id = cursor.execute("SELECT id FROM plates WHERE numbers = ?", (old_plate,)).fetchone()
+                if old_id is None:
+                    return
+                new_id = cursor.execute("SELECT id FROM plates WHERE numbers = ?", (new_plate,)).fetchone()
+                if new_id is None:
+                    cursor.execute("UPDATE plates SET numbers = ? WHERE id = ?", (new_plate, old_id[0]))
+                else:
+                    cursor.execute("UPDATE sightings SET plate_id = ? WHERE plate_id = ?", (new_id[0], old_id[0]))
+                    cursor.execute('''
+                        UPDATE plates SET sighting_count = sighting_count +
+                            (SELECT sighting_count FROM plates WHERE id = ?) WHERE id = ?
+                    ''', (old_id[0], new_id[0]))
+                    cursor.execute("DELETE FROM plates WHERE id = ?", (old_id[0],))
+            with self._lock:
+                count = self.known_plates.pop(old_plate, 0)
+                self.known_plates[new_plate] = self.known_plates.get(new_plate, 0) + count
             print("Mise a jour reussie.")
         except sqlite3.Error as e:
             print(f"Erreur lors de la mise a jour des donnees: {e}")
 
     def delete_plate(self, plate_text):
+        self.flush()
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("DELETE FROM data WHERE numbers = ?", (plate_text,))
-            self.conn.commit()
+            with self.conn:
+                cursor = self.conn.cursor()
+                cursor.execute('''
+                    DELETE FROM sightings WHERE plate_id = (SELECT id FROM plates WHERE numbers = ?)
+                ''', (plate_text,))
+                cursor.execute("DELETE FROM plates WHERE numbers = ?", (plate_text,))
+            with self._lock:
+                self.known_plates.pop(plate_text, None)
             print("Suppression reussie.")
         except sqlite3.Error as e:
             print(f"Erreur lors de la suppression des donnees: {e}")
 
     def close_connection(self):
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
         if self.conn:
             self.conn.close()
+            self.conn = None
             print(f"Connexion a la base de donnees '{self.db_name}' fermee.")
 
 	
@@ -0,0 +1,286 @@
+"""Mode sans interface (serveur): reconnaissance sur videos, flux et dossiers d'images.
+
+    python -m anpr batch video.mp4 rtsp://camera/stream images/ -o plates.jsonl
+    python -m anpr batch videos/*.mp4 --format csv -o plates.csv --workers 4 --db data.db
+
+Chaque fichier (ou paquet d'images) est traite dans un processus du pool avec
+son propre PlateRecognizer; les resultats sont ecrits au fil de l'eau, une ligne
+par plaque detectee (source, frame, timestamp, boite, texte, confiances).
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+from capture import capture_file, capture_images, list_images
+from mjpeg import frame_scale
+from plate_format import compile_formats
+
+FIELDS = ['source', 'frame', 'timestamp', 'xmin', 'ymin', 'xmax', 'ymax', 'text', 'confidence',
+          'ocr_score', 'track_id']
+
+_recognizer_options = None
+_results = None
+_fast_reader = None
+
+
+def _init_worker(options, results):
+    global _recognizer_options, _results, _fast_reader
+    _recognizer_options = options
+    _results = results
+    # Un processus par coeur: on evite la sur-souscription des threads internes
+    import cv2
+    cv2.setNumThreads(options['threads'])
+    try:
+        import torch
+        torch.set_num_threads(options['threads'])
+    except ImportError:
+        pass
+    from plate_format import set_plate_formats
+    set_plate_formats(options['plate_formats'])
+    if options['fast_ocr']:
+        from digit_reader import load_digit_reader
+        _fast_reader = load_digit_reader(options['digit_templates'])
+    from models import registry
+    registry.configure(model_path=options['model'], gpu=options['gpu'], backend=options['backend'],
+                       input_size=options['imgsz'], threads=options['threads'])
+
+
+def _make_recognizer(tracking):
+    from models import registry
+    from recognition import PlateRecognizer
+
+    options = _recognizer_options
+    # Modeles charges une fois par processus (registre), etat (suivi) neuf pour chaque source
+    model, reader = registry.get()
+    return PlateRecognizer(
+        model,
+        reader,
+        tracking=tracking,
+        motion_gate=options['motion_gate'] and tracking,
+        fast_reader=_fast_reader,
+    )
+
+
+def _packet_records(source, index, timestamp, packet):
+    # Boites en pixels de la pleine resolution, comme PlateEvent.bbox
+    scale = frame_scale(packet.frame)
+    records = []
+    for i, (xmin, ymin, xmax, ymax, confidence) in enumerate(packet.boxes):
+        xmin, ymin, xmax, ymax = (int(value) * scale for value in (xmin, ymin, xmax, ymax))
+        records.append({
+            'source': source,
+            'frame': index,
+            'timestamp': round(timestamp, 3),
+            'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax,
+            'text': packet.plates[i] if i < len(packet.plates) else "",
+            'confidence': round(confidence, 4),
+            'ocr_score': round(float(packet.scores[i]), 4) if i < len(packet.scores) else 0.0,
+            'track_id': packet.tracks[i][0] if i < len(packet.tracks) else None,
+        })
+    return records
+
+
+def _plate_rows(events, start_ms, timestamp):
+    # (plaque, source, confiance, horodatage ms) pour BDDeManager.insertion, comme la GUI
+    timestamp_ms = start_ms + int(timestamp * 1000)
+    return [(event.plate, event.camera_id, event.confidence, timestamp_ms) for event in events]
+
+
+def _process_unit(unit):
+    """Traite une video/URL ou un paquet d'images; renvoie (source, nombre de frames).
+
+    Une erreur (modele, fichier illisible, ...) est signalee par un message 'error' et
+    n'arrete que cette unite; le message 'frames' de fin d'unite est toujours envoye.
+    """
+    kind, source, paths = unit
+    is_video = kind == 'video'
+    count = 0
+    pending = []
+    plates = []
+    # Horodatage des plaques: debut du traitement de l'unite + position de la frame dans la video
+    start_ms = int(time.time() * 1000)
+    timestamp = 0.0
+    try:
+        recognizer = _make_recognizer(tracking=is_video)
+        frames = capture_file(source) if is_video else capture_images(paths)
+        try:
+            for index, timestamp, frame in frames:
+                packet = recognizer.process(frame, index, timestamp)
+                name = source if is_video else paths[index]
+                pending.extend(_packet_records(name, index, timestamp, packet))
+                # Plaques finales: une par piste terminee (video) ou par lecture (images)
+                plates.extend(_plate_rows(recognizer.plate_records(packet, name), start_ms, timestamp))
+                count += 1
+                if len(pending) >= 50:
+                    _results.put(('records', pending))
+                    pending = []
+        finally:
+            # Pistes encore ouvertes, y compris quand la lecture s'est arretee sur une erreur
+            plates.extend(_plate_rows(recognizer.finish(source), start_ms, timestamp))
+    except Exception as e:
+        _results.put(('error', f"{source}: {type(e).__name__}: {e}"))
+    finally:
+        if pending:
+            _results.put(('records', pending))
+        if plates:
+            _results.put(('plates', plates))
+        _results.put(('frames', count))
+    return source, count
+
+
+def work_units(inputs, images_per_unit):
+    units = []
+    for item in inputs:
+        if os.path.isdir(item):
+            images = list_images(item)
+            for i in range(0, len(images), images_per_unit):
+                units.append(('images', item, images[i:i + images_per_unit]))
+        elif item.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
+            units.append(('images', item, [item]))
+        else:
+            # Fichier video ou URL RTSP/HTTP lue par cv2.VideoCapture
+            units.append(('video', item, None))
+    return units
+
+
+class RecordWriter:
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        self.writer = None
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(stream, fieldnames=FIELDS)
+            self.writer.writeheader()
+
+    def write(self, records):
+        if self.writer is not None:
+            self.writer.writerows(records)
+        else:
+            for record in records:
+                self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+
+def run_batch(args):
+    units = work_units(args.inputs, args.images_per_unit)
+    if not units:
+        print("Aucune entree a traiter.", file=sys.stderr)
+        return 1
+    try:
+        compile_formats(args.plate_format.split(','))
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    options = {
+        'model': args.model,
+        'backend': args.backend,
+        'imgsz': args.imgsz,
+        'fast_ocr': args.fast_ocr,
+        'plate_formats': args.plate_format,
+        'digit_templates': args.digit_templates,
+        'gpu': args.gpu,
+        'threads': args.threads,
+        'motion_gate': args.motion_gate,
+    }
+    db_manager = None
+    if args.db:
+        from DBHelper import BDDeManager
+        db_manager = BDDeManager(args.db, write_behind=True)
+        db_manager.create_table()
+
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    writer = RecordWriter(out, args.format)
+    total_frames = 0
+    failed = 0
+    start = time.perf_counter()
+    last_report = start
+
+    # 'spawn': chaque processus charge ses propres modeles (torch n'aime pas le fork)
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    workers = max(1, min(args.workers, len(units)))
+    try:
+        with context.Pool(workers, initializer=_init_worker, initargs=(options, results)) as pool:
+            pending = pool.map_async(_process_unit, units)
+            done = 0
+            while done < len(units):
+                try:
+                    kind, payload = results.get(timeout=0.5)
+                except queue.Empty:
+                    if pending.ready() and not pending.successful():
+                        break
+                    continue
+                if kind == 'frames':
+                    # Message de fin d'une unite: arrive apres tous ses enregistrements
+                    done += 1
+                    total_frames += payload
+                    continue
+                if kind == 'error':
+                    # Unite en echec: on le signale et on continue avec les suivantes
+                    failed += 1
+                    print(payload, file=sys.stderr)
+                    continue
+                if kind == 'plates':
+                    if db_manager is not None:
+                        for plate_text, camera_id, confidence, timestamp_ms in payload:
+                            db_manager.insertion(plate_text, camera_id, confidence, timestamp_ms=timestamp_ms)
+                    continue
+                writer.write(payload)
+                now = time.perf_counter()
+                if now - last_report > 10:
+                    print(f"{total_frames} frames, {total_frames / (now - start):.1f} fps", file=sys.stderr)
+                    last_report = now
+            pending.get()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if db_manager is not None:
+            db_manager.close_connection()
+
+    elapsed = time.perf_counter() - start
+    print(f"{total_frames} frames en {elapsed:.1f} s: {total_frames / max(elapsed, 1e-9):.1f} fps "
+          f"({workers} processus)", file=sys.stderr)
+    if failed:
+        print(f"{failed} entree(s) sur {len(units)} en echec", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='anpr', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    batch = sub.add_parser('batch', help="reconnaissance hors ligne sur videos, URLs et dossiers d'images")
+    batch.add_argument('inputs', nargs='+', help="fichiers video, URLs rtsp/http, images ou dossiers d'images")
+    batch.add_argument('-o', '--output', help="fichier de sortie (stdout par defaut)")
+    batch.add_argument('--format', choices=('jsonl', 'csv'), default='jsonl')
+    batch.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    batch.add_argument('--threads', type=int, default=1, help="threads torch/OpenCV par processus")
+    batch.add_argument('--model', default='best.pt')
+    batch.add_argument('--backend', choices=('ultralytics', 'onnx'), default='ultralytics',
+                       help="detecteur: PyTorch (best.pt) ou onnxruntime (best.onnx, best.int8.onnx)")
+    batch.add_argument('--imgsz', type=int, default=640, help="taille d'entree du modele ONNX")
+    batch.add_argument('--gpu', action='store_true')
+    batch.add_argument('--plate-format', default='dz',
+                       help="formats de plaque acceptes: dz, fr ou nom=GABARIT (D chiffre, L lettre, A les deux)")
+    batch.add_argument('--fast-ocr', action='store_true',
+                       help="lecteur de chiffres rapide (format a 10 chiffres), EasyOCR en secours")
+    batch.add_argument('--digit-templates', help="modeles de chiffres appris (.npz) pour --fast-ocr")
+    batch.add_argument('--motion-gate', action='store_true', help="saute la detection sur les scenes immobiles")
+    batch.add_argument('--images-per-unit', type=int, default=64)
+    batch.add_argument('--db', help="enregistre aussi les plaques dans cette base SQLite")
+    batch.set_defaults(func=run_batch)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""Temps de decodage JPEG par frame selon le mode de FrameGrabber.
+
+'full' decode chaque frame en pleine resolution; les modes reduits decodent une
+petite image pour YOLO, plus la pleine resolution pour la fraction
+``--plate-ratio`` des frames qui contiennent une plaque a lire.
+
+Usage: python bench_decode.py [fichier.mjpeg] [--frames 200] [--plate-ratio 0.2] [--size 1920x1080]
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from bench_mjpeg import synthetic_stream
+from mjpeg import DECODE_MODES, JpegFrame, MJPEGParser, decode_jpeg
+
+
+def load_frames(path):
+    with open(path, 'rb') as f:
+        return [bytes(frame) for frame in MJPEGParser(io.BufferedReader(f))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--plate-ratio", type=float, default=0.2,
+                        help="fraction des frames avec une plaque (decodage pleine resolution en plus)")
+    parser.add_argument("--size", default="640x480", help="taille du flux synthetique (LARGEURxHAUTEUR)")
+    args = parser.parse_args()
+
+    if args.path:
+        frames = load_frames(args.path)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'synthetic.mjpeg')
+            synthetic_stream(path, args.frames, False, tuple(int(v) for v in args.size.split('x')))
+            frames = load_frames(path)
+
+    every = int(1 / args.plate_ratio) if args.plate_ratio > 0 else 0
+    print(f"{len(frames)} frames, plaque 1 frame sur {every or 'jamais'}")
+    print(f"{'mode':>10} {'ms/frame':>10} {'detect size':>12}")
+    for mode, (flags, scale) in DECODE_MODES.items():
+        start = time.perf_counter()
+        for i, data in enumerate(frames):
+            if mode == 'full':
+                image = decode_jpeg(data, flags)
+            else:
+                frame = JpegFrame(data, mode)
+                image = frame.image
+                if every and i % every == 0:
+                    frame.crop(0, 0, 10, 10)
+        elapsed = (time.perf_counter() - start) / len(frames)
+        print(f"{mode:>10} {elapsed * 1e3:>10.2f} {image.shape[1]:>6}x{image.shape[0]:<5}")
+
+
+if __name__ == "__main__":
+    main()
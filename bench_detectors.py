@@ -0,0 +1,108 @@
+"""Comparaison precision / latence des backends de detection sur les memes frames.
+
+    python bench_detectors.py ultralytics:best.pt onnx:best.onnx onnx:best.int8.onnx --threads 4
+
+Le premier backend sert de reference: pour chaque autre backend on donne le
+taux d'accord (boites appariees a IoU >= --iou) avec la reference, et, sur le
+corpus synthetique, precision/rappel par rapport a la verite terrain. Les
+backends dont la dependance ou le modele manque sont ignores.
+"""
+import argparse
+import json
+import sys
+import time
+
+from bench_pipeline import summarize
+from capture import capture_images, list_images
+from detectors import load_detector
+from synthetic import make_corpus
+from tracker import iou
+
+
+def match(predicted, expected, threshold):
+    """Nombre de boites de ``predicted`` appariees (une a une) a une boite de ``expected``."""
+    matched = 0
+    remaining = list(expected)
+    for box in sorted(predicted, key=lambda b: -b[4] if len(b) > 4 else 0):
+        best = max(remaining, key=lambda other: iou(box[:4], other[:4]), default=None)
+        if best is not None and iou(box[:4], best[:4]) >= threshold:
+            remaining.remove(best)
+            matched += 1
+    return matched
+
+
+def accuracy(predictions, references, threshold):
+    true_positives = sum(match(p, r, threshold) for p, r in zip(predictions, references))
+    predicted = sum(len(p) for p in predictions)
+    expected = sum(len(r) for r in references)
+    precision = true_positives / predicted if predicted else 0.0
+    recall = true_positives / expected if expected else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {'precision': precision, 'recall': recall, 'f1': f1}
+
+
+def run_backend(spec, frames, args):
+    backend, _, model_path = spec.partition(':')
+    detector = load_detector(backend, model_path or 'best.pt', input_size=args.imgsz, threads=args.threads)
+    for frame in frames[:2]:
+        detector.detect_batch([frame])
+    samples = []
+    predictions = []
+    for _ in range(args.repeat):
+        predictions = []
+        for frame in frames:
+            start = time.perf_counter()
+            boxes = detector.detect_batch([frame])[0]
+            samples.append(time.perf_counter() - start)
+            predictions.append(boxes)
+    return summarize(samples), predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('backends', nargs='*', default=['ultralytics:best.pt', 'onnx:best.onnx'],
+                        help="backend:modele, le premier sert de reference")
+    parser.add_argument('--frames', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=2)
+    parser.add_argument('--corpus', help="dossier d'images a la place du corpus synthetique")
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--threads', type=int)
+    parser.add_argument('--iou', type=float, default=0.5)
+    parser.add_argument('--json', help="ecrit les resultats dans ce fichier")
+    args = parser.parse_args()
+
+    if args.corpus:
+        frames = [image for _, _, image in capture_images(list_images(args.corpus))][:args.frames]
+        truth = None
+    else:
+        corpus = make_corpus(args.frames, seed=args.seed)
+        frames = [frame for frame, _ in corpus]
+        truth = [[box[:4] for box in boxes] for _, boxes in corpus]
+
+    report = {}
+    reference = None
+    print(f"{'backend':>28} {'p50 ms':>9} {'p95 ms':>9} {'fps':>8} {'accord':>8} {'prec':>6} {'rappel':>6}")
+    for spec in args.backends:
+        try:
+            stats, predictions = run_backend(spec, frames, args)
+        except Exception as e:
+            print(f"{spec:>28} ignore: {e}")
+            continue
+        if reference is None:
+            reference = predictions
+        stats['agreement'] = accuracy(predictions, reference, args.iou)['f1']
+        if truth is not None:
+            stats.update(accuracy(predictions, truth, args.iou))
+        report[spec] = stats
+        print(f"{spec:>28} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['fps']:>8.1f} "
+              f"{stats['agreement']:>8.3f} {stats.get('precision', 0.0):>6.3f} {stats.get('recall', 0.0):>6.3f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Bus d'evenements contre des serveurs locaux de substitution.
+
+Lance un serveur HTTP (webhook) et un serveur TCP sur 127.0.0.1, branche les
+sinks JSONL (avec rotation), SQLite, webhook, TCP et un sink volontairement
+lent, publie N evenements puis verifie ce que chaque destination a recu. Le
+temps de ``publish`` (p50/p99/max) montre qu'un sink lent ne bloque pas
+l'editeur: il perd des evenements (colonne dropped) au lieu de ralentir.
+
+Usage: python bench_events.py [--events 20000] [--slow-ms 50]
+"""
+import argparse
+import http.server
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from DBHelper import BDDeManager
+from events import EventBus, PlateEvent, CallbackSink, JsonlSink, SQLiteSink, TcpSink, WebhookSink
+
+
+class WebhookStandIn(http.server.ThreadingHTTPServer):
+    def __init__(self):
+        self.received = 0
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(handler):
+                body = handler.rfile.read(int(handler.headers['Content-Length']))
+                self.received += len(json.loads(body)['events'])
+                handler.send_response(204)
+                handler.send_header('Content-Length', '0')
+                handler.end_headers()
+
+            def log_message(handler, format, *args):
+                pass
+
+        super().__init__(('127.0.0.1', 0), Handler)
+
+
+class TcpStandIn(threading.Thread):
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.server = socket.create_server(('127.0.0.1', 0))
+        self.port = self.server.getsockname()[1]
+        self.received = 0
+
+    def run(self):
+        conn, _ = self.server.accept()
+        with conn, conn.makefile('rb') as stream:
+            for line in stream:
+                json.loads(line)
+                self.received += 1
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q / 100.0))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--slow-ms', type=float, default=50.0)
+    args = parser.parse_args()
+
+    webhook = WebhookStandIn()
+    threading.Thread(target=webhook.serve_forever, daemon=True).start()
+    tcp = TcpStandIn()
+    tcp.start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl_path = os.path.join(tmp, 'events.jsonl')
+        bus = EventBus()
+        sinks = [
+            bus.add_sink(JsonlSink(jsonl_path, max_bytes=256 * 1024, backup_count=50, buffer_size=args.events)),
+            bus.add_sink(SQLiteSink(os.path.join(tmp, 'events.db'), buffer_size=args.events)),
+            bus.add_sink(WebhookSink(f"http://127.0.0.1:{webhook.server_address[1]}/plates",
+                                     buffer_size=args.events, batch_size=200)),
+            bus.add_sink(TcpSink('127.0.0.1', tcp.port, buffer_size=args.events)),
+            bus.add_sink(CallbackSink(lambda events: time.sleep(args.slow_ms / 1000.0), name='slow',
+                                      buffer_size=100, batch_size=10)),
+        ]
+
+        latencies = []
+        start = time.perf_counter()
+        for index in range(args.events):
+            event = PlateEvent(f"{index:010d}", 0.9, f"cam{index % 4}", bbox=(10, 20, 110, 60))
+            t0 = time.perf_counter()
+            bus.publish([event])
+            latencies.append(time.perf_counter() - t0)
+        publish_time = time.perf_counter() - start
+        stats = {sink.name: sink.stats() for sink in sinks}
+        bus.close(timeout=30.0)
+        time.sleep(0.2)
+
+        lines = 0
+        for name in os.listdir(tmp):
+            if name.startswith('events.jsonl'):
+                with open(os.path.join(tmp, name), 'rb') as f:
+                    lines += sum(1 for _ in f)
+        rotated = sum(name.startswith('events.jsonl.') for name in os.listdir(tmp))
+        check = BDDeManager(os.path.join(tmp, 'events.db'))
+        rows = check.conn.execute("SELECT COUNT(*) FROM sightings").fetchone()[0]
+        check.conn.close()
+
+    print(f"{args.events} evenements publies en {publish_time:.2f} s "
+          f"({args.events / publish_time:.0f}/s), publish p50 {percentile(latencies, 50) * 1e6:.1f} us "
+          f"p99 {percentile(latencies, 99) * 1e6:.1f} us max {max(latencies) * 1e3:.2f} ms")
+    print(f"{'sink':>8} {'dropped':>8} {'errors':>7}  recus")
+    received = {'jsonl': f"{lines} lignes, {rotated} fichiers tournes", 'sqlite': f"{rows} passages",
+                'webhook': webhook.received, 'tcp': tcp.received, 'slow': sinks[-1].written}
+    for sink in sinks:
+        print(f"{sink.name:>8} {stats[sink.name]['dropped']:>8} {sink.errors:>7}  {received[sink.name]}")
+    webhook.shutdown()
+    complete = lines == rows == webhook.received == tcp.received == args.events
+    return 0 if complete else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
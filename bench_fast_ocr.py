@@ -0,0 +1,115 @@
+"""Banc d'essai du lecteur de chiffres rapide face a EasyOCR.
+
+Pour chaque crop de plaque: taux de lecture directe (sans EasyOCR), exactitude
+des lectures directes, latence par plaque du lecteur rapide, d'EasyOCR seul et
+du chemin complet (rapide + secours EasyOCR). EasyOCR est ignore s'il manque.
+
+    python bench_fast_ocr.py --plates 300
+    python bench_fast_ocr.py --corpus crops/ --fit --save-templates digits.npz
+
+Avec --corpus, chaque image est un crop de plaque nomme par son texte
+(0123456789.jpg, 0123456789_2.png, ...). --fit apprend des modeles sur la
+premiere moitie du corpus et mesure sur la seconde.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+
+from bench_pipeline import summarize
+from capture import list_images
+from digit_reader import load_digit_reader
+from recognition import preprocess_image, read_license_plate, read_license_plates_fast
+from synthetic import make_corpus
+
+
+def load_crops(args):
+    if args.corpus:
+        crops = []
+        for path in list_images(args.corpus):
+            text = os.path.splitext(os.path.basename(path))[0].split('_')[0]
+            image = cv2.imread(path, cv2.IMREAD_COLOR)
+            if image is not None:
+                crops.append((image, text))
+        return crops
+    crops = []
+    for frame, truth in make_corpus(args.plates, seed=args.seed, max_plates=1):
+        crops.extend((frame[y0:y1, x0:x1], text) for x0, y0, x1, y1, text in truth)
+    return crops[:args.plates]
+
+
+def timed(func, items):
+    samples, outputs = [], []
+    for item in items:
+        start = time.perf_counter()
+        outputs.append(func(item))
+        samples.append(time.perf_counter() - start)
+    return summarize(samples), outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--plates', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--corpus', help="dossier de crops nommes par leur texte")
+    parser.add_argument('--templates', help="modeles de chiffres appris (.npz)")
+    parser.add_argument('--fit', action='store_true', help="apprend les modeles sur la premiere moitie")
+    parser.add_argument('--save-templates', help="enregistre les modeles (apres --fit)")
+    parser.add_argument('--json', help="ecrit les resultats dans ce fichier")
+    args = parser.parse_args()
+
+    crops = load_crops(args)
+    fast_reader = load_digit_reader(args.templates)
+    if args.fit:
+        train, crops = crops[:len(crops) // 2], crops[len(crops) // 2:]
+        learned = fast_reader.fit([preprocess_image(image) for image, _ in train], [text for _, text in train])
+        print(f"{learned} caracteres appris sur {len(train)} plaques")
+        if args.save_templates:
+            fast_reader.save(args.save_templates)
+    if not crops:
+        print("Aucune plaque a mesurer")
+        return 1
+
+    report = {'plates': len(crops)}
+    stats, reads = timed(lambda item: fast_reader.read(preprocess_image(item[0])), crops)
+    hits = [(text, truth) for (text, _), (_, truth) in zip(reads, crops) if text is not None]
+    report['fast'] = stats
+    report['hit_rate'] = len(hits) / len(crops)
+    report['hit_accuracy'] = sum(text == truth for text, truth in hits) / len(hits) if hits else 0.0
+
+    try:
+        import easyocr
+        reader = easyocr.Reader(['en'], gpu=False, verbose=False)
+    except ImportError:
+        reader = None
+    if reader is not None:
+        report['easyocr'], easy_reads = timed(lambda item: read_license_plate(preprocess_image(item[0]), reader),
+                                              crops)
+        report['easyocr_accuracy'] = sum(text == truth for (text, _), (_, truth) in zip(easy_reads, crops)) / len(crops)
+        report['fast_with_fallback'], combined = timed(
+            lambda item: read_license_plates_fast([item[0]], reader, fast_reader)[0], crops)
+        report['combined_accuracy'] = sum(text == truth for (text, _), (_, truth) in zip(combined, crops)) / len(crops)
+
+    print(f"{len(crops)} plaques: lecture directe {report['hit_rate']:.1%}, "
+          f"exactitude des lectures directes {report['hit_accuracy']:.1%}")
+    print(f"{'chemin':>20} {'p50 ms':>9} {'p95 ms':>9} {'plaques/s':>10}")
+    for name in ('fast', 'easyocr', 'fast_with_fallback'):
+        if name in report:
+            stats = report[name]
+            print(f"{name:>20} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['fps']:>10.1f}")
+    if reader is None:
+        print("easyocr absent: chemins EasyOCR ignores")
+    else:
+        print(f"exactitude EasyOCR {report['easyocr_accuracy']:.1%}, rapide + secours {report['combined_accuracy']:.1%}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Rejoue un enregistrement MJPEG dans l'ancien et le nouveau parseur.
+
+Rapporte le debit (MB/s) et les octets alloues temporairement par frame
+(pic tracemalloc). 'session' est le nouveau parseur suivi de la copie de
+chaque frame faite par LibcameraSession (frames passees a un autre thread):
+c'est le cout reel de la capture locale. Sans fichier, un flux synthetique
+640x480 est genere.
+
+Usage: python bench_mjpeg.py [fichier.mjpeg] [--frames 300] [--garbage]
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from mjpeg import MJPEGParser
+
+
+def old_parser(stream):
+    # Boucle d'origine de FrameGrabber._capture_local_camera, sans le decodage
+    buffer = b''
+    while True:
+        chunk = stream.read(4096)
+        if not chunk:
+            return
+        buffer += chunk
+        start_marker = buffer.find(b'\xff\xd8')
+        end_marker = buffer.find(b'\xff\xd9')
+        if start_marker != -1 and end_marker != -1:
+            jpeg_data = buffer[start_marker:end_marker+2]
+            buffer = buffer[end_marker+2:]
+            yield jpeg_data
+
+
+def new_parser(stream):
+    return iter(MJPEGParser(stream))
+
+
+def session_parser(stream):
+    # Comme LibcameraSession.read: une copie par frame
+    return (bytes(frame) for frame in MJPEGParser(stream))
+
+
+def synthetic_stream(path, frames, garbage, size=(640, 480)):
+    rng = np.random.default_rng(0)
+    base = cv2.resize(rng.integers(0, 255, (60, 80, 3), dtype=np.uint8), size)
+    with open(path, 'wb') as f:
+        for i in range(frames):
+            frame = np.roll(base, i * 4, axis=1)
+            cv2.putText(frame, f"{i:05d}", (40, 240), cv2.FONT_HERSHEY_SIMPLEX, 3, (255, 255, 255), 5)
+            ok, data = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+            if garbage and i % 10 == 0:
+                f.write(b'\x00\xff\xd9garbage')
+            f.write(data.tobytes())
+
+
+def run(parser, data, measure_alloc):
+    stream = io.BufferedReader(io.BytesIO(data), buffer_size=65536)
+    frames = 0
+    alloc = 0
+    if measure_alloc:
+        tracemalloc.start()
+    start = time.perf_counter()
+    for frame in parser(stream):
+        frames += 1
+        if measure_alloc:
+            current, peak = tracemalloc.get_traced_memory()
+            alloc += peak - current
+            tracemalloc.reset_peak()
+    elapsed = time.perf_counter() - start
+    if measure_alloc:
+        tracemalloc.stop()
+    return frames, elapsed, alloc / max(frames, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--garbage", action="store_true", help="insere des octets parasites dans le flux synthetique")
+    args = parser.parse_args()
+
+    path = args.path
+    tmp = None
+    if path is None:
+        tmp = tempfile.NamedTemporaryFile(suffix='.mjpeg', delete=False)
+        tmp.close()
+        path = tmp.name
+        synthetic_stream(path, args.frames, args.garbage)
+    with open(path, 'rb') as f:
+        data = f.read()
+    if tmp is not None:
+        os.unlink(path)
+
+    print(f"{len(data) / 1e6:.1f} MB")
+    print(f"{'parser':>8} {'frames':>8} {'MB/s':>10} {'alloc KB/frame':>16}")
+    for name, parser_func in (('old', old_parser), ('new', new_parser), ('session', session_parser)):
+        frames, elapsed, _ = run(parser_func, data, False)
+        _, _, alloc = run(parser_func, data, True)
+        print(f"{name:>8} {frames:>8} {len(data) / 1e6 / elapsed:>10.1f} {alloc / 1024:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""Banc d'essai reproductible du chemin chaud detection -> OCR.
+
+Chaque etape est mesuree separement sur un corpus fixe (synthetique par
+defaut, ou un dossier d'images), puis le pipeline complet:
+
+    detect (YOLO predict), crop, preprocess_image, readtext (EasyOCR),
+    ocr_loop / ocr_recognize / ocr_stacked, format (plate_format.normalize_plate), draw_label,
+    convert_to_qimage, render_frame, db_insert, db_lookup, end_to_end
+
+render_frame est le chemin d'affichage actuel (FrameRenderer: mise a
+l'echelle 640x480 dans un tampon reutilise, QImage BGR888), a comparer a
+convert_to_qimage (cvtColor pleine resolution a chaque frame). De meme, par
+frame: ocr_loop (un readtext par plaque), ocr_recognize (plaques empilees, un
+appel reader.recognize, qui sur CPU fait encore une passe du reseau par
+plaque) et ocr_stacked (le chemin batch_ocr: crops completes a une largeur
+commune, une seule passe du reseau pour toutes les plaques).
+
+Les etapes dont la dependance manque (ultralytics, easyocr, PyQt5, best.pt)
+sont signalees comme ignorees. Sortie: p50/p95/p99 (ms), fps, RSS max, et un
+JSON comparable entre commits:
+
+    python bench_pipeline.py --json base.json
+    python bench_pipeline.py --compare base.json --tolerance 0.15
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+
+from capture import capture_images, list_images
+from plate_format import normalize_plate
+from recognition import PlateRecognizer, preprocess_image, read_license_plate, read_license_plates_batch
+from synthetic import make_corpus
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * q / 100.0
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+
+def peak_rss_mb():
+    # ru_maxrss est en Ko sous Linux, en octets sous macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024.0 * 1024.0) if sys.platform == 'darwin' else rss / 1024.0
+
+
+def summarize(samples):
+    mean = sum(samples) / len(samples) if samples else 0.0
+    return {
+        'n': len(samples),
+        'p50_ms': percentile(samples, 50) * 1e3,
+        'p95_ms': percentile(samples, 95) * 1e3,
+        'p99_ms': percentile(samples, 99) * 1e3,
+        'mean_ms': mean * 1e3,
+        'fps': 1.0 / mean if mean > 0 else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def measure(func, items, repeat=1, warmup=2):
+    for item in items[:warmup]:
+        func(item)
+    samples = []
+    for _ in range(repeat):
+        for item in items:
+            start = time.perf_counter()
+            func(item)
+            samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def load_models(model_path):
+    model = reader = None
+    try:
+        from ultralytics import YOLO
+        if os.path.exists(model_path):
+            model = YOLO(model_path)
+    except ImportError:
+        pass
+    try:
+        import easyocr
+        reader = easyocr.Reader(['en'], gpu=False, verbose=False)
+    except ImportError:
+        pass
+    return model, reader
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class RecognizeOnly:
+    def __init__(self, reader):
+        self.recognize = reader.recognize
+
+
+def run(args):
+    if args.corpus:
+        frames = [(image, []) for _, _, image in capture_images(list_images(args.corpus))][:args.frames]
+    else:
+        frames = make_corpus(args.frames, seed=args.seed)
+    model, reader = load_models(args.model)
+    # Sans YOLO, les boites de verite terrain (synthetiques) remplacent la detection
+    recognizer = PlateRecognizer(model, reader, tracking=False, motion_gate=False)
+
+    if model is not None:
+        boxes_per_frame = [recognizer.detect(frame) for frame, _ in frames]
+    else:
+        boxes_per_frame = [[(x0, y0, x1, y1, 1.0) for x0, y0, x1, y1, _ in truth] for _, truth in frames]
+    crops = [frame[y0:y1, x0:x1] for (frame, _), boxes in zip(frames, boxes_per_frame)
+             for x0, y0, x1, y1, _ in boxes]
+    binaries = [preprocess_image(crop) for crop in crops]
+    texts = [text for _, truth in frames for *_, text in truth] or ["OI23456789"]
+
+    results = {}
+    skipped = []
+
+    if model is not None:
+        results['detect'] = measure(lambda item: recognizer.detect(item[0]), frames, args.repeat)
+    else:
+        skipped.append('detect')
+    results['crop'] = measure(lambda item: [item[0][y0:y1, x0:x1].copy() for x0, y0, x1, y1, _ in item[1]],
+                              list(zip([f for f, _ in frames], boxes_per_frame)), args.repeat)
+    results['preprocess_image'] = measure(preprocess_image, crops, args.repeat)
+    if reader is not None:
+        results['readtext'] = measure(lambda binary: read_license_plate(binary, reader), binaries, args.repeat)
+        frame_crops = [[frame[y0:y1, x0:x1] for x0, y0, x1, y1, _ in boxes]
+                       for (frame, _), boxes in zip(frames, boxes_per_frame) if boxes]
+        results['ocr_loop'] = measure(
+            lambda plates: [read_license_plate(preprocess_image(crop), reader) for crop in plates],
+            frame_crops, args.repeat)
+        # Lecteur reduit a recognize(): read_license_plates_batch repasse par reader.recognize
+        recognize_only = RecognizeOnly(reader)
+        results['ocr_recognize'] = measure(lambda plates: read_license_plates_batch(plates, recognize_only),
+                                           frame_crops, args.repeat)
+        results['ocr_stacked'] = measure(lambda plates: read_license_plates_batch(plates, reader),
+                                         frame_crops, args.repeat)
+    else:
+        skipped.extend(['readtext', 'ocr_loop', 'ocr_recognize', 'ocr_stacked'])
+    results['format'] = measure(normalize_plate, texts * 100, args.repeat)
+    results['draw_label'] = measure(
+        lambda item: [recognizer.draw_label(item[0], *box[:4], "0123456789", box[4]) for box in item[1]],
+        list(zip([f.copy() for f, _ in frames], boxes_per_frame)), args.repeat)
+    try:
+        from PyQt5 import QtGui
+
+        def convert_to_qimage(frame):
+            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            h, w, ch = image.shape
+            return QtGui.QImage(image.data, w, h, ch * w, QtGui.QImage.Format_RGB888)
+
+        results['convert_to_qimage'] = measure(convert_to_qimage, [f for f, _ in frames], args.repeat)
+
+        from frame_render import FrameRenderer
+        renderer = FrameRenderer(max_fps=0)
+
+        def render_frame(frame):
+            buffer = renderer.acquire()
+            renderer.release(renderer.render(frame, buffer))
+
+        results['render_frame'] = measure(render_frame, [f for f, _ in frames], args.repeat)
+    except ImportError:
+        skipped.extend(['convert_to_qimage', 'render_frame'])
+
+    from DBHelper import BDDeManager
+    # BDDeManager affiche un message par operation: on le coupe pendant la mesure
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        db_manager = BDDeManager(os.path.join(tmp, 'bench.db'))
+        db_manager.create_table()
+        results['db_insert'] = measure(db_manager.insertion, texts, args.repeat)
+        results['db_lookup'] = measure(db_manager.plate_exists, texts * 100, args.repeat)
+        db_manager.close_connection()
+
+    if model is not None and reader is not None:
+        results['end_to_end'] = measure(lambda item: recognizer.process_frame(item[0].copy()), frames, args.repeat)
+    else:
+        skipped.append('end_to_end')
+
+    return {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'frames': len(frames),
+        'plates': len(crops),
+        'seed': args.seed,
+        'stages': results,
+        'skipped': skipped,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Renvoie la liste des etapes dont p50 ou p95 s'est degrade de plus de ``tolerance``."""
+    regressions = []
+    for stage, stats in current['stages'].items():
+        base = baseline.get('stages', {}).get(stage)
+        if not base:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            if base[key] > 0 and stats[key] > base[key] * (1.0 + tolerance):
+                regressions.append((stage, key, base[key], stats[key]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--corpus', help="dossier d'images a la place du corpus synthetique")
+    parser.add_argument('--model', default='best.pt')
+    parser.add_argument('--json', help="ecrit les resultats dans ce fichier")
+    parser.add_argument('--compare', help="resultats de reference (JSON) a comparer")
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+
+    report = run(args)
+    print(f"{report['frames']} frames, {report['plates']} plaques, revision {report['revision']}")
+    print(f"{'stage':>18} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'fps':>10} {'rss MB':>8}")
+    for stage, stats in report['stages'].items():
+        print(f"{stage:>18} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} {stats['p99_ms']:>9.3f} "
+              f"{stats['fps']:>10.1f} {stats['peak_rss_mb']:>8.1f}")
+    if report['skipped']:
+        print(f"ignorees (dependance ou modele absent): {', '.join(report['skipped'])}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for stage, key, before, after in regressions:
+            print(f"REGRESSION {stage} {key}: {before:.3f} -> {after:.3f} ms")
+        if regressions:
+            return 1
+        print(f"Aucune regression (tolerance {args.tolerance:.0%}) par rapport a {baseline.get('revision')}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
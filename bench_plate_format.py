@@ -0,0 +1,105 @@
+"""Normalisation des candidats OCR: ancien chemin caractere par caractere vs formats compiles.
+
+Genere des millions de chaines "sorties OCR" synthetiques (plaques valides,
+lettres confondues, minuscules, espaces, longueurs fausses, bruit), verifie
+que les deux chemins donnent le meme resultat pour le format a 10 chiffres,
+puis compare les debits.
+
+Usage: python bench_plate_format.py [--strings 2000000] [--seed 0]
+"""
+import argparse
+import random
+import string
+import time
+
+from plate_format import BUILTIN_FORMATS, PlateFormat, compile_formats, normalize_plate
+
+dict_char_to_int = {'O': '0', 'I': '1', 'J': '3', 'A': '4', 'G': '6', 'S': '5'}
+
+
+def old_license_complies_format(text):
+    if len(text) != 10:
+        return False
+    for char in text:
+        if char.isdigit() or char in dict_char_to_int.keys():
+            continue
+        else:
+            return False
+    return True
+
+
+def old_format_license(text):
+    license_plate = ''
+    for j in range(len(text)):
+        if text[j] in dict_char_to_int.keys():
+            license_plate += dict_char_to_int[text[j]]
+        else:
+            license_plate += text[j]
+    return license_plate
+
+
+def old_normalize(text):
+    # Chemin d'origine de read_license_plate pour un candidat
+    text = text.upper().replace(' ', '')
+    if text and old_license_complies_format(text):
+        return old_format_license(text)
+    return None
+
+
+def synthetic_strings(count, seed):
+    rng = random.Random(seed)
+    confusable = ''.join(dict_char_to_int) + ''.join(dict_char_to_int).lower()
+    noise = string.ascii_letters + string.digits + ' '
+    strings = []
+    for _ in range(count):
+        kind = rng.random()
+        chars = [rng.choice(string.digits) for _ in range(10)]
+        if kind < 0.4:
+            pass
+        elif kind < 0.7:
+            for _ in range(rng.randint(1, 3)):
+                chars[rng.randrange(10)] = rng.choice(confusable)
+        elif kind < 0.8:
+            chars.insert(rng.randint(1, 9), ' ')
+        elif kind < 0.9:
+            chars = chars[:rng.randint(3, 12)]
+        else:
+            chars = [rng.choice(noise) for _ in range(rng.randint(1, 14))]
+        strings.append(''.join(chars))
+    return strings
+
+
+def run(func, strings):
+    start = time.perf_counter()
+    results = [func(text) for text in strings]
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--strings', type=int, default=2000000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    strings = synthetic_strings(args.strings, args.seed)
+    # Separateurs limites a l'espace pour comparer a l'identique avec l'ancien chemin
+    dz = PlateFormat('dz', BUILTIN_FORMATS['dz'], separators=' ')
+    multi = compile_formats(['dz', 'fr'])
+
+    old_results, old_time = run(old_normalize, strings)
+    new_results, new_time = run(dz.normalize, strings)
+    mismatches = sum(a != b for a, b in zip(old_results, new_results))
+    valid = sum(result is not None for result in new_results)
+    print(f"{len(strings)} chaines, {valid} plaques valides, {mismatches} differences ancien/nouveau")
+    print(f"{'chemin':>14} {'s':>8} {'M chaines/s':>12} {'ns/chaine':>10}")
+    rows = [('ancien', old_time), ('dz compile', new_time)]
+    _, multi_time = run(lambda text: normalize_plate(text, multi), strings)
+    rows.append(('dz+fr compile', multi_time))
+    for name, elapsed in rows:
+        print(f"{name:>14} {elapsed:>8.2f} {len(strings) / elapsed / 1e6:>12.2f} {elapsed / len(strings) * 1e9:>10.0f}")
+    print(f"acceleration dz: x{old_time / new_time:.1f}")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,65 @@
+"""Compare l'ancienne recherche de plaque (recup + parcours) avec l'index en memoire.
+
+Usage: python bench_plate_index.py [--sizes 10000 100000 1000000] [--lookups 20]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from DBHelper import BDDeManager
+
+
+def fill_db(db_manager, rows):
+    plates = [f"{random.randrange(10**10):010d}" for _ in range(rows)]
+    with db_manager.conn:
+        db_manager._insert_rows(db_manager.conn, [(plate, 1704067200000, None, None, None) for plate in plates])
+    return plates
+
+
+def old_lookup(db_manager, plate_text):
+    # Chemin d'origine de Ui_MainWindow.check_plate_in_db
+    data = db_manager.recup()
+    for row_data in data:
+        id, numbers, date_time = row_data
+        if numbers == plate_text:
+            return True
+    return False
+
+
+def time_lookups(lookup, db_manager, queries):
+    start = time.perf_counter()
+    for plate_text in queries:
+        lookup(db_manager, plate_text)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--lookups", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'old (ms)':>12} {'index (us)':>12} {'load (ms)':>10} {'speedup':>10}")
+    for rows in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_manager = BDDeManager(os.path.join(tmp, "bench.db"))
+            db_manager.create_table()
+            plates = fill_db(db_manager, rows)
+            # Moitie de plaques presentes, moitie absentes (pire cas pour le parcours)
+            queries = random.sample(plates, args.lookups // 2)
+            queries += [f"X{i:09d}" for i in range(args.lookups - len(queries))]
+
+            start = time.perf_counter()
+            db_manager.load_plates()
+            load_time = time.perf_counter() - start
+
+            old = time_lookups(old_lookup, db_manager, queries)
+            new = time_lookups(lambda db, plate: db.plate_exists(plate), db_manager, queries * 1000)
+            print(f"{rows:>10} {old * 1e3:>12.2f} {new * 1e6:>12.3f} {load_time * 1e3:>10.1f} {old / new:>10.0f}x")
+            db_manager.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Banc d'essai du demarrage: import -> premiere frame -> premiere plaque.
+
+Chaque mode tourne dans un processus neuf (imports et caches froids):
+
+    eager  ancien comportement: torch/easyocr/ultralytics importes d'emblee,
+           un lecteur EasyOCR au niveau module + un par grabber + YOLO,
+           le tout avant la premiere frame
+    lazy   registre partage: chargement unique en arriere-plan, la premiere
+           frame (flux brut) s'affiche pendant le chargement
+
+Sans ultralytics/easyocr ou sans best.pt, la premiere plaque est ignoree.
+
+    python bench_startup.py --runs 3
+    python bench_startup.py --source enregistrement.mp4
+"""
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def child(mode, model_path, source, max_frames):
+    start = time.perf_counter()
+    timings = {}
+    if mode == 'eager':
+        try:
+            # torch etait importe au niveau module par l'ancien main.py: son cout fait partie de la mesure
+            importlib.import_module('torch')
+            import easyocr
+            from ultralytics import YOLO
+        except ImportError as e:
+            return {'mode': mode, 'error': str(e)}
+    from recognition import PlateRecognizer
+    from mjpeg import frame_image
+    timings['import_s'] = time.perf_counter() - start
+
+    if source:
+        from capture import capture_file
+        frames = (frame for _, _, frame in capture_file(source))
+    else:
+        from synthetic import make_corpus
+        frames = (frame for frame, _ in make_corpus(max_frames))
+
+    if mode == 'eager':
+        try:
+            readers = [easyocr.Reader(['en'], gpu=False), easyocr.Reader(['en'])]
+            model, reader = YOLO(model_path), readers[1]
+        except Exception as e:
+            return {'mode': mode, 'error': str(e), **timings}
+        next(frames)
+        timings['first_frame_s'] = time.perf_counter() - start
+    else:
+        from models import registry
+        registry.configure(model_path=model_path)
+        registry.load_async()
+        # Le flux brut est affiche pendant le chargement
+        frame_image(next(frames))
+        timings['first_frame_s'] = time.perf_counter() - start
+        try:
+            model, reader = registry.get()
+        except RuntimeError as e:
+            return {'mode': mode, 'error': str(e), **timings}
+    timings['models_ready_s'] = time.perf_counter() - start
+
+    recognizer = PlateRecognizer(model, reader, tracking=False, motion_gate=False)
+    timings['first_plate_s'] = None
+    for frame in frames:
+        if recognizer.process_frame(frame):
+            timings['first_plate_s'] = time.perf_counter() - start
+            break
+    timings['peak_rss_mb'] = _peak_rss_mb()
+    return {'mode': mode, **timings}
+
+
+def _peak_rss_mb():
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024.0 * 1024.0) if sys.platform == 'darwin' else rss / 1024.0
+
+
+def run_child(mode, args):
+    command = [sys.executable, os.path.abspath(__file__), '--child', mode, '--model', args.model,
+               '--frames', str(args.frames)]
+    if args.source:
+        command += ['--source', args.source]
+    output = subprocess.run(command, stdout=subprocess.PIPE, check=True).stdout.decode()
+    # Derniere ligne: le JSON (les bibliotheques peuvent ecrire avant)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _format(value):
+    return f"{value:>10.2f}" if isinstance(value, (int, float)) else f"{'-':>10}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=1)
+    parser.add_argument('--model', default='best.pt')
+    parser.add_argument('--source', help="video a la place des frames synthetiques")
+    parser.add_argument('--frames', type=int, default=30, help="frames maximum pour trouver une plaque")
+    parser.add_argument('--json', help="ecrit les resultats dans ce fichier")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.model, args.source, args.frames)))
+        return 0
+
+    results = []
+    print(f"{'mode':>6} {'import s':>10} {'frame s':>10} {'models s':>10} {'plate s':>10} {'rss MB':>10}")
+    for _ in range(args.runs):
+        for mode in ('eager', 'lazy'):
+            result = run_child(mode, args)
+            results.append(result)
+            if 'error' in result:
+                print(f"{mode:>6} ignore: {result['error']}")
+                continue
+            print(f"{mode:>6}" + "".join(" " + _format(result.get(key)) for key in
+                                         ('import_s', 'first_frame_s', 'models_ready_s', 'first_plate_s',
+                                          'peak_rss_mb')))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
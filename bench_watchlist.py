@@ -0,0 +1,114 @@
+"""Recherche approchee dans une liste de surveillance de 100k plaques.
+
+Construit une liste de plaques a 10 chiffres aleatoires, puis interroge
+l'index avec des lectures OCR simulees: plaque exacte, confusions
+(O pour 0, S pour 5...), 1 ou 2 editions (substitution, insertion,
+suppression) et plaques absentes. Affiche le temps de construction, la
+taille de l'index, le temps par requete (p50/p99) et le taux de plaques
+retrouvees par categorie; un echantillon est verifie contre une recherche
+exhaustive (aucune plaque a distance <= k ne doit manquer).
+
+Usage: python bench_watchlist.py [--entries 100000] [--queries 2000] [--max-distance 2]
+"""
+import argparse
+import random
+import string
+import time
+
+from watchlist import FOLDS, Watchlist, plate_distance
+
+CONFUSIONS = {digit: [letter for letter, folded in FOLDS.items() if folded == digit] for digit in string.digits}
+
+
+def confuse(plate, rng, count):
+    chars = list(plate)
+    positions = [i for i, char in enumerate(chars) if CONFUSIONS[char]]
+    for i in rng.sample(positions, min(count, len(positions))):
+        chars[i] = rng.choice(CONFUSIONS[chars[i]])
+    return ''.join(chars)
+
+
+def edit(plate, rng, count):
+    chars = list(plate)
+    for _ in range(count):
+        op = rng.choice(('sub', 'ins', 'del'))
+        i = rng.randrange(len(chars))
+        if op == 'sub':
+            chars[i] = rng.choice(string.digits.replace(chars[i], ''))
+        elif op == 'ins':
+            chars.insert(i, rng.choice(string.digits))
+        elif len(chars) > 1:
+            del chars[i]
+    return ''.join(chars)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q / 100.0))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--max-distance', type=int, default=2)
+    parser.add_argument('--verify', type=int, default=30, help="requetes verifiees par recherche exhaustive")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    plates = list({''.join(rng.choice(string.digits) for _ in range(10)) for _ in range(args.entries)})
+    start = time.perf_counter()
+    watchlist = Watchlist(plates, max_distance=args.max_distance)
+    build_time = time.perf_counter() - start
+    print(f"{len(watchlist)} plaques, index construit en {build_time:.1f} s, "
+          f"{watchlist.index_bytes() / 1e6:.1f} Mo ({len(watchlist._keys)} cles)")
+
+    absent = set(plates)
+    categories = {
+        'exacte': lambda plate: plate,
+        'confusion x2': lambda plate: confuse(plate, rng, 2),
+        'confusion x4': lambda plate: confuse(plate, rng, 4),
+        '1 edition': lambda plate: edit(plate, rng, 1),
+        '2 editions': lambda plate: edit(plate, rng, 2),
+        '1 ed.+confusions': lambda plate: confuse(edit(plate, rng, 1), rng, 2),
+    }
+    print(f"{'lecture':>17} {'trouvees':>9} {'candidats':>10} {'p50 us':>8} {'p99 us':>8}")
+    all_times = []
+    for name, corrupt in categories.items():
+        times, found, returned = [], 0, 0
+        for _ in range(args.queries):
+            plate = rng.choice(plates)
+            query = corrupt(plate)
+            t0 = time.perf_counter()
+            matches = watchlist.match(query)
+            times.append(time.perf_counter() - t0)
+            returned += len(matches)
+            found += any(match.plate == plate for match in matches)
+        all_times.extend(times)
+        print(f"{name:>17} {found / args.queries:>8.1%} {returned / args.queries:>10.2f} "
+              f"{percentile(times, 50) * 1e6:>8.1f} {percentile(times, 99) * 1e6:>8.1f}")
+    times, false_hits = [], 0
+    for _ in range(args.queries):
+        query = ''.join(rng.choice(string.digits) for _ in range(10))
+        while query in absent:
+            query = ''.join(rng.choice(string.digits) for _ in range(10))
+        t0 = time.perf_counter()
+        false_hits += bool(watchlist.match(query))
+        times.append(time.perf_counter() - t0)
+    print(f"{'absente':>17} {false_hits / args.queries:>8.1%} {'':>10} "
+          f"{percentile(times, 50) * 1e6:>8.1f} {percentile(times, 99) * 1e6:>8.1f}")
+
+    # Complétude: l'index doit renvoyer toutes les plaques trouvées par un parcours exhaustif
+    missed = 0
+    for _ in range(args.verify):
+        query = confuse(edit(rng.choice(plates), rng, rng.randint(0, args.max_distance)), rng, 2)
+        expected = {plate for plate in plates if plate_distance(query, plate, args.max_distance) is not None}
+        got = {match.plate for match in watchlist.match(query, limit=len(plates))}
+        missed += len(expected - got)
+    print(f"verification exhaustive sur {args.verify} requetes: {missed} plaque(s) manquee(s)")
+    return 1 if missed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,254 @@
+"""Plusieurs cameras, un seul service de detection/OCR.
+
+Chaque camera a son thread de capture qui depose la frame la plus recente dans
+son emplacement (une file 'latest' de taille 1). Le service d'inference garde
+une seule copie des modeles; a chaque tour il prend au plus une frame par
+camera, en tourniquet pour rester equitable, lance YOLO sur le lot entier puis
+un seul passage OCR pour toutes les plaques du lot. Le suivi et la porte de
+mouvement restent propres a chaque camera.
+"""
+import queue
+import threading
+import time
+
+from capture import capture_ip_camera, capture_local_camera, capture_file
+from recording import replay_frames
+from metrics import metrics
+from mjpeg import frame_image
+from pipeline import BoundedQueue, FramePacket, DROP_LATEST
+from recognition import PlateRecognizer
+
+
+class CameraSource:
+    """Source d'une camera: 'libcamera', 'stream' (HTTP/RTSP via cv2.VideoCapture), 'file' ou 'replay'."""
+
+    def __init__(self, camera_id, kind='libcamera', url=None, decode_mode='full'):
+        self.camera_id = camera_id
+        self.kind = kind
+        self.url = url
+        self.decode_mode = decode_mode
+
+    @classmethod
+    def parse(cls, spec):
+        # "voie1=libcamera", "voie2=rtsp://...", "voie3=enregistrement.mp4", "voie4=replay:rue"
+        camera_id, _, url = spec.partition('=')
+        if not url or url == 'libcamera':
+            return cls(camera_id, 'libcamera')
+        if url.startswith('replay:'):
+            return cls(camera_id, 'replay', url[len('replay:'):])
+        if '://' in url:
+            return cls(camera_id, 'stream', url)
+        return cls(camera_id, 'file', url)
+
+    def frames(self, on_error=None, stop_event=None):
+        # Caméras en direct supervisées (reconnexion, métriques camera_<id>_reconnects/_frame_age...);
+        # stop_event les arrête même pendant une coupure
+        name = f'camera_{self.camera_id}'
+        if self.kind == 'libcamera':
+            return capture_local_camera(self.decode_mode, name=name, on_error=on_error, stop_event=stop_event)
+        if self.kind == 'stream':
+            return capture_ip_camera(self.url, name=name, on_error=on_error, stop_event=stop_event)
+        if self.kind == 'replay':
+            # Enregistrement (recording.py) rejoué en temps réel
+            return replay_frames(self.url, decode_mode=self.decode_mode)
+        return (frame for _, _, frame in capture_file(self.url))
+
+
+class InferenceService(threading.Thread):
+    def __init__(self, model, reader, on_result, max_batch=4, recognizer_options=None, controller=None,
+                 on_finished=None):
+        super().__init__(name='inference', daemon=True)
+        self.model = model
+        self.reader = reader
+        self.on_result = on_result
+        # on_finished(camera_id, events): plaques des pistes encore ouvertes quand une caméra s'arrête
+        self.on_finished = on_finished
+        self.max_batch = max_batch
+        self.recognizer_options = recognizer_options or {}
+        self.recognizers = {}
+        # QualityController commun: un niveau de qualité pour toutes les caméras (modèles partagés)
+        self.controller = controller
+        self.slots = {}
+        self._order = []
+        self._next = 0
+        self._lock = threading.Lock()
+        self._work = threading.Event()
+        self._stop_event = threading.Event()
+
+    def add_camera(self, camera_id):
+        # Etat (suivi, porte de mouvement) par camera, modeles partages
+        with self._lock:
+            if camera_id in self.recognizers:
+                raise ValueError(f"Camera deja ajoutee: {camera_id}")
+            recognizer = self.recognizers[camera_id] = PlateRecognizer(self.model, self.reader,
+                                                                       **self.recognizer_options)
+            self.slots[camera_id] = BoundedQueue(1, DROP_LATEST)
+            self._order.append(camera_id)
+        if self.controller is not None:
+            self.controller.attach(recognizer)
+
+    def remove_camera(self, camera_id):
+        with self._lock:
+            self._order.remove(camera_id)
+            self.slots.pop(camera_id).close()
+            recognizer = self.recognizers.pop(camera_id)
+        if self.controller is not None:
+            self.controller.detach(recognizer)
+        self._finish(camera_id, recognizer)
+
+    def _finish(self, camera_id, recognizer):
+        events = recognizer.finish(camera_id)
+        if events and self.on_finished is not None:
+            self.on_finished(camera_id, events)
+
+    def submit(self, camera_id, packet):
+        slot = self.slots.get(camera_id)
+        if slot is not None:
+            slot.put(packet)
+            self._work.set()
+
+    def _collect(self):
+        # Tourniquet: on commence a une camera differente a chaque tour
+        with self._lock:
+            order = self._order[self._next:] + self._order[:self._next]
+            if self._order:
+                self._next = (self._next + 1) % len(self._order)
+            slots = [(camera_id, self.slots[camera_id]) for camera_id in order]
+        batch = []
+        for camera_id, slot in slots:
+            if len(batch) >= self.max_batch:
+                break
+            try:
+                batch.append((camera_id, slot.get(timeout=0)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def run(self):
+        while not self._stop_event.is_set():
+            batch = self._collect()
+            if not batch:
+                self._work.wait(0.05)
+                self._work.clear()
+                continue
+            try:
+                self._process(batch)
+            except Exception as e:
+                print(f"Erreur du service d'inference: {e}")
+        with self._lock:
+            recognizers = list(self.recognizers.items())
+        for camera_id, recognizer in recognizers:
+            self._finish(camera_id, recognizer)
+
+    def _process(self, batch):
+        recognizers = [self.recognizers.get(camera_id) for camera_id, _ in batch]
+        batch = [(camera_id, packet, recognizer)
+                 for (camera_id, packet), recognizer in zip(batch, recognizers) if recognizer is not None]
+        if not batch:
+            return
+        shared = batch[0][2]
+
+        to_detect = [(packet, recognizer) for _, packet, recognizer in batch if recognizer.needs_detection(packet)]
+        if to_detect:
+            detections = shared.detect_batch([frame_image(packet.frame) for packet, _ in to_detect])
+            for (packet, recognizer), boxes in zip(to_detect, detections):
+                recognizer.apply_detections(packet, boxes)
+
+        # Un seul passage OCR pour les plaques de toutes les cameras du lot
+        requests = [recognizer.ocr_requests([packet])[0] for _, packet, recognizer in batch]
+        reads = shared.read_batch(requests)
+        for (camera_id, packet, recognizer), packet_reads in zip(batch, reads):
+            recognizer.apply_reads([packet], [packet_reads])
+            latency = time.monotonic() - packet.timestamp
+            metrics.inc(f'camera_{camera_id}_frames')
+            metrics.observe(f'camera_{camera_id}_latency', latency)
+            self.on_result(camera_id, packet, recognizer)
+            if self.controller is not None:
+                self.controller.observe(latency, self.backlog())
+
+    def backlog(self):
+        # Frames en attente dans les emplacements des caméras
+        return sum(slot.qsize() for slot in list(self.slots.values()))
+
+    def stop(self):
+        self._stop_event.set()
+        self._work.set()
+
+
+class CameraManager:
+    """Lance N sources de capture vers un InferenceService partage.
+
+    ``on_result(camera_id, packet, recognizer)`` est appele depuis le thread
+    d'inference, comme ``on_finished(camera_id, events)`` (pistes encore
+    ouvertes a l'arret ou a la fin d'une source fichier/rejeu, qui est alors
+    retiree); ``on_error(camera_id, exception)`` depuis le thread de capture.
+    Un identifiant de camera deja utilise leve ``ValueError``; celui d'une source
+    retiree est libere, ``on_removed(camera_id)`` (thread de capture) le signale
+    et la camera peut etre ajoutee de nouveau.
+    """
+
+    def __init__(self, sources, model, reader, on_result, on_error=None, max_batch=None, controller=None,
+                 on_finished=None, on_removed=None, **recognizer_options):
+        self.on_error = on_error
+        self.on_removed = on_removed
+        self.service = InferenceService(model, reader, on_result, max_batch or max(1, len(sources)),
+                                        recognizer_options, controller, on_finished)
+        self.sources = {}
+        self.threads = {}
+        self._started = False
+        self._stop_event = threading.Event()
+        for source in sources:
+            self.add_source(source)
+
+    def add_source(self, source):
+        # ValueError si l'identifiant est déjà pris (rien n'est modifié)
+        self.service.add_camera(source.camera_id)
+        self.sources[source.camera_id] = source
+        self.service.max_batch = max(self.service.max_batch, len(self.sources))
+        thread = threading.Thread(target=self._capture_loop, args=(source,),
+                                  name=f'capture-{source.camera_id}', daemon=True)
+        self.threads[source.camera_id] = thread
+        if self._started:
+            thread.start()
+
+    def _capture_loop(self, source):
+        on_error = (lambda e: self.on_error(source.camera_id, e)) if self.on_error else None
+        frames = source.frames(on_error, self._stop_event)
+        try:
+            for seq, frame in enumerate(frames):
+                if self._stop_event.is_set():
+                    break
+                self.service.submit(source.camera_id, FramePacket(seq, frame, time.monotonic()))
+        except Exception as e:
+            if self.on_error:
+                self.on_error(source.camera_id, e)
+        finally:
+            # Arrête le lecteur de la source (et son processus libcamera-vid)
+            frames.close()
+            if not self._stop_event.is_set():
+                # Source terminée (fichier, rejeu): sa dernière frame est lue puis la caméra est retirée
+                self._remove_source(source.camera_id)
+
+    def _remove_source(self, camera_id):
+        slot = self.service.slots.get(camera_id)
+        while slot is not None and slot.qsize() and not self._stop_event.is_set():
+            time.sleep(0.01)
+        self.sources.pop(camera_id, None)
+        self.threads.pop(camera_id, None)
+        self.service.remove_camera(camera_id)
+        if self.on_removed is not None:
+            self.on_removed(camera_id)
+
+    def start(self):
+        self._started = True
+        self.service.start()
+        # Copie: une source terminée se retire de self.threads depuis son propre thread
+        for thread in list(self.threads.values()):
+            thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self.service.stop()
+
+    def join(self):
+        self.service.join()
@@ -0,0 +1,344 @@
+"""Sources de frames sans dependance a Qt (camera locale, camera IP, fichiers)."""
+import os
+import queue
+import subprocess
+import threading
+import time
+
+import cv2
+
+from mjpeg import MJPEGParser, JpegFrame, decode_jpeg
+from metrics import metrics
+from pipeline import BoundedQueue, DROP_LATEST
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+LIBCAMERA_COMMAND = [
+    "libcamera-vid",
+    "--codec", "mjpeg",
+    "--width", "640",
+    "--height", "480",
+    "--framerate", "30",
+    "-o", "-",  # Output to stdout
+    "--timeout", "0"  # Capture indefinitely
+]
+
+
+class StreamSession:
+    """Connexion cv2.VideoCapture a une camera IP (HTTP/RTSP)."""
+
+    def __init__(self, stream_url, timeout=5.0):
+        # Délais d'ouverture/lecture du backend FFmpeg: un flux muet ne bloque pas read() indéfiniment
+        params = []
+        for name in ('CAP_PROP_OPEN_TIMEOUT_MSEC', 'CAP_PROP_READ_TIMEOUT_MSEC'):
+            if hasattr(cv2, name):
+                params += [getattr(cv2, name), int(timeout * 1000)]
+        self.cap = cv2.VideoCapture(stream_url, cv2.CAP_ANY, params) if params else cv2.VideoCapture(stream_url)
+        self.interrupted = False
+        # Sans délai de lecture (OpenCV < 4.5.2), un read() bloqué ne rend jamais la main: le
+        # superviseur abandonne alors la session au lieu d'attendre (voir CaptureSupervisor)
+        self.interruptible = hasattr(cv2, 'CAP_PROP_READ_TIMEOUT_MSEC')
+        if not self.cap.isOpened():
+            self.cap.release()
+            raise RuntimeError(f"Failed to open IP camera stream: {stream_url}")
+
+    def read(self):
+        if self.interrupted:
+            return None
+        ret, frame = self.cap.read()
+        if not ret:
+            raise RuntimeError("Failed to read frame from IP camera stream")
+        return frame
+
+    def interrupt(self):
+        # Appelé depuis un autre thread: release() n'est pas sûr pendant un read(), on attend son délai
+        self.interrupted = True
+
+    def close(self):
+        self.cap.release()
+
+
+class LibcameraSession:
+    """Processus libcamera-vid et son flux MJPEG; ``read`` rend les octets JPEG d'une frame."""
+
+    def __init__(self, command=LIBCAMERA_COMMAND):
+        # Tube non tamponné côté Python: les octets en transit se limitent au tube et au tampon du parseur
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=0)
+        self.parser = MJPEGParser(self.process.stdout)
+
+    def read(self):
+        jpeg_data = self.parser.next_frame()
+        if jpeg_data is None:
+            raise RuntimeError("libcamera-vid stream ended")
+        # Seule copie du chemin (une allocation de la taille du JPEG par frame): la frame passe au
+        # thread consommateur de CaptureSupervisor et à l'enregistreur pendant que ce thread lit déjà
+        # la suivante, qui réutilise le tampon du parseur et invaliderait la vue.
+        return bytes(jpeg_data)
+
+    def interrupt(self):
+        # Fin du tube côté lecteur: next_frame() rend la main
+        if self.process.poll() is None:
+            self.process.terminate()
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        # Toujours attendre le processus: pas de zombie à chaque redémarrage
+        self.process.wait()
+        self.process.stdout.close()
+
+
+class CaptureSupervisor:
+    """Lecture continue d'une source avec reconnexion, detection de blocage et frame la plus recente.
+
+    Un thread lit la source sans arret (le tube ou le socket ne se remplit
+    jamais derriere un consommateur lent) et ne garde que la derniere frame
+    lue; le consommateur (``frames``) recoit donc toujours la plus recente.
+    Quand la session echoue ou se termine, elle est fermee (processus
+    attendu) puis rouverte apres un delai qui double a chaque echec, jusqu'a
+    ``backoff_max``. Sans frame depuis ``stall_timeout`` secondes, la session
+    est interrompue et rouverte.
+
+    ``decode`` est applique cote consommateur, seulement aux frames
+    effectivement rendues. ``on_error(exception)`` est appele a chaque
+    deconnexion. Une session dont ``interrupt`` ne debloque pas la lecture
+    (``interruptible`` faux: camera IP sans delai de lecture du backend) est
+    abandonnee au blocage: son thread est laisse a son ``read`` et une
+    nouvelle session est ouverte dans un nouveau thread. ``recorder`` (``recording.StreamRecorder``) recoit toutes les
+    frames lues, avant tout saut, et est ferme a l'arret de la lecture.
+    ``stop_event`` (``threading.Event`` de l'appelant: pipeline, gestionnaire de
+    cameras) arrete la lecture et termine ``frames`` meme pendant une coupure,
+    quand aucune frame n'arrive. Metriques: ``<name>_reconnects``, ``<name>_stalls``,
+    ``<name>_abandoned``, ``<name>_dropped``, ``<name>_frame_age`` et la jauge ``<name>_connected``.
+    """
+
+    def __init__(self, open_session, decode=None, name='capture', on_error=None,
+                 backoff_initial=0.5, backoff_max=30.0, stall_timeout=5.0, max_retries=None, recorder=None,
+                 stop_event=None, poll_interval=0.2):
+        self.open_session = open_session
+        self.recorder = recorder
+        self.stop_event = stop_event
+        self.poll_interval = poll_interval
+        self.decode = decode
+        self.name = name
+        self.on_error = on_error
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.stall_timeout = stall_timeout
+        self.max_retries = max_retries
+        self.reconnects = 0
+        self.stalls = 0
+        self.last_error = None
+        self.abandoned = False
+        self._slot = BoundedQueue(1, DROP_LATEST)
+        self._session = None
+        self._last_frame = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # Incrémentée à chaque session abandonnée: un ancien thread de lecture qui se débloque s'arrête
+        self._generation = 0
+        self._thread = threading.Thread(target=self._read_loop, args=(0,), name=f'{name}-reader', daemon=True)
+
+    def stopping(self):
+        return self._stop.is_set() or (self.stop_event is not None and self.stop_event.is_set())
+
+    def _wait(self, delay):
+        # Délai de reconnexion, interrompu par stop() ou par l'événement d'arrêt de l'appelant
+        deadline = time.monotonic() + delay
+        while not self.stopping():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._stop.wait(min(remaining, self.poll_interval))
+
+    def _abandoned(self, generation):
+        return generation != self._generation
+
+    def _read_loop(self, generation):
+        delay = self.backoff_initial
+        failures = 0
+        while not self.stopping() and not self._abandoned(generation):
+            frames = 0
+            try:
+                session = self.open_session()
+            except Exception as e:
+                error = e
+            else:
+                with self._lock:
+                    if self._abandoned(generation):
+                        session.close()
+                        return
+                    self._session = session
+                self._last_frame = time.monotonic()
+                metrics.set_gauge(f'{self.name}_connected', 1)
+                error = None
+                try:
+                    while not self.stopping():
+                        with metrics.timer('capture'):
+                            frame = session.read()
+                        if frame is None or self._abandoned(generation):
+                            break
+                        frames += 1
+                        self._last_frame = time.monotonic()
+                        metrics.inc('frames_captured')
+                        if self.recorder is not None:
+                            self.recorder.write(frame, self._last_frame)
+                        dropped = self._slot.dropped
+                        self._slot.put((self._last_frame, frame))
+                        if self._slot.dropped != dropped:
+                            metrics.inc(f'{self.name}_dropped')
+                except Exception as e:
+                    error = e
+                finally:
+                    with self._lock:
+                        if self._session is session:
+                            self._session = None
+                    if not self._abandoned(generation):
+                        metrics.set_gauge(f'{self.name}_connected', 0)
+                    session.close()
+            if self.stopping() or self._abandoned(generation):
+                break
+            if frames:
+                # La session a fonctionné: on repart du délai initial
+                delay, failures = self.backoff_initial, 0
+            failures += 1
+            self.last_error = error or RuntimeError("capture interrupted")
+            if self.max_retries is not None and failures > self.max_retries:
+                self.abandoned = True
+                break
+            self.reconnects += 1
+            metrics.inc(f'{self.name}_reconnects')
+            if self.on_error:
+                self.on_error(RuntimeError(f"{self.last_error} (reconnecting in {delay:.1f} s)"))
+            self._wait(delay)
+            delay = min(delay * 2, self.backoff_max)
+        if self._abandoned(generation):
+            # Le thread de la session suivante garde la file et l'enregistreur
+            return
+        if self.recorder is not None:
+            self.recorder.close()
+        self._slot.close()
+
+    def _check_stall(self):
+        with self._lock:
+            session = self._session
+        if session is not None and time.monotonic() - self._last_frame > self.stall_timeout:
+            self.stalls += 1
+            metrics.inc(f'{self.name}_stalls')
+            self._last_frame = time.monotonic()
+            session.interrupt()
+            if not getattr(session, 'interruptible', True):
+                self._abandon(session)
+
+    def _abandon(self, session):
+        # read() bloqué sans délai: le thread reste sur l'ancienne session, une nouvelle est ouverte à côté
+        with self._lock:
+            if self._session is not session:
+                return
+            self._session = None
+            self._generation += 1
+            self._thread = threading.Thread(target=self._read_loop, args=(self._generation,),
+                                            name=f'{self.name}-reader', daemon=True)
+        metrics.inc(f'{self.name}_abandoned')
+        metrics.set_gauge(f'{self.name}_connected', 0)
+        self.reconnects += 1
+        metrics.inc(f'{self.name}_reconnects')
+        if self.on_error:
+            self.on_error(RuntimeError(f"{self.name}: stalled read abandoned (reconnecting)"))
+        self._thread.start()
+
+    def frames(self):
+        if not self._thread.is_alive() and not self._stop.is_set():
+            self._thread.start()
+        try:
+            while not self.stopping():
+                try:
+                    timestamp, frame = self._slot.get(timeout=min(self.poll_interval, self.stall_timeout))
+                except queue.Empty:
+                    if self._slot.closed:
+                        break
+                    self._check_stall()
+                    continue
+                metrics.observe(f'{self.name}_frame_age', time.monotonic() - timestamp)
+                if self.decode is not None:
+                    with metrics.timer('decode'):
+                        frame = self.decode(frame)
+                    if frame is None:
+                        continue
+                yield frame
+        finally:
+            self.stop()
+        if self.abandoned:
+            raise RuntimeError(f"Capture abandoned after {self.max_retries} retries: {self.last_error}")
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            session = self._session
+        if session is not None:
+            session.interrupt()
+        # Réveille un consommateur en attente de frame
+        self._slot.close()
+
+
+def decode_libcamera_frame(jpeg_data, decode_mode='full'):
+    if decode_mode == 'full':
+        return decode_jpeg(jpeg_data, cv2.IMREAD_COLOR)
+    frame = JpegFrame(jpeg_data, decode_mode)
+    return frame if frame.image is not None else None
+
+
+def capture_ip_camera(stream_url, timeout=5.0, **supervisor_options):
+    supervisor = CaptureSupervisor(lambda: StreamSession(stream_url, timeout), stall_timeout=timeout,
+                                   **supervisor_options)
+    return supervisor.frames()
+
+
+def capture_local_camera(decode_mode='full', command=LIBCAMERA_COMMAND, **supervisor_options):
+    # libcamera-vid est relancé (et attendu) quand il meurt ou cesse d'envoyer des frames
+    supervisor = CaptureSupervisor(lambda: LibcameraSession(command),
+                                   decode=lambda jpeg_data: decode_libcamera_frame(jpeg_data, decode_mode),
+                                   **supervisor_options)
+    return supervisor.frames()
+
+
+def capture_file(source):
+    """Frames d'une video ou d'une URL RTSP/HTTP: ``(index, timestamp en s, frame)``.
+
+    Contrairement a la camera IP en direct, la fin du flux termine simplement le generateur.
+    """
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise RuntimeError(f"Failed to open video source: {source}")
+    index = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                return
+            yield index, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, frame
+            index += 1
+    finally:
+        cap.release()
+
+
+def list_images(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def capture_images(paths):
+    """Frames d'une liste d'images: ``(index, 0.0, image)``; les fichiers illisibles sont ignores."""
+    for index, path in enumerate(paths):
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            print(f"Image illisible: {path}")
+            continue
+        yield index, 0.0, image
@@ -0,0 +1,69 @@
+"""Fenetre de deduplication des passages, entre la reconnaissance et la base/les alertes.
+
+Une voiture arretee devant la camera produit la meme plaque frame apres frame.
+``SightingCache.seen`` ne renvoie True que pour un nouveau passage: une plaque
+(par camera) revue moins de ``ttl`` secondes apres sa derniere observation ne
+fait qu'incrementer son compteur et repousser sa date de derniere observation.
+
+L'ordre d'un OrderedDict sert a la fois de LRU et d'echeancier: chaque
+observation deplace l'entree en fin, donc les plus anciennes sont en tete et
+l'expiration comme l'eviction (taille bornee) se font en O(1) amorti.
+"""
+import collections
+import threading
+import time
+
+from metrics import metrics
+
+
+class Sighting:
+    __slots__ = ('first_seen', 'last_seen', 'count')
+
+    def __init__(self, now):
+        self.first_seen = now
+        self.last_seen = now
+        self.count = 1
+
+
+class SightingCache:
+    def __init__(self, ttl=30.0, max_size=4096, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self.suppressed = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def seen(self, plate_text, camera_id=None, now=None):
+        """True pour un nouveau passage, False pour une repetition dans la fenetre."""
+        now = self.clock() if now is None else now
+        key = (plate_text, camera_id)
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.last_seen = now
+                entry.count += 1
+                self._entries.move_to_end(key)
+                self.suppressed += 1
+                metrics.inc('dedup_suppressed')
+                return False
+            self._entries[key] = Sighting(now)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            return True
+
+    def _expire(self, now):
+        entries = self._entries
+        while entries:
+            key, entry = next(iter(entries.items()))
+            if now - entry.last_seen < self.ttl:
+                break
+            del entries[key]
+
+    def get(self, plate_text, camera_id=None):
+        with self._lock:
+            return self._entries.get((plate_text, camera_id))
+
+    def __len__(self):
+        return len(self._entries)
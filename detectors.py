@@ -0,0 +1,221 @@
+"""Backends du detecteur de plaques.
+
+Chaque backend expose ``detect_batch(images) -> [[(xmin, ymin, xmax, ymax, confiance), ...], ...]``
+(une liste de boites par image, coordonnees en pixels de l'image d'entree).
+
+    ultralytics  YOLO("best.pt").predict, PyTorch FP32 (comportement historique)
+    onnx         modele exporte en ONNX sur onnxruntime CPU, FP32 ou quantifie INT8
+
+Preparation d'un modele ONNX (une fois, sur une machine avec ultralytics):
+
+    python detectors.py export best.pt --imgsz 640            # -> best.onnx
+    python detectors.py export best.pt --dynamic              # taille d'entree variable (controleur de qualite)
+    python detectors.py quantize best.onnx --mode dynamic     # -> best.int8.onnx
+    python detectors.py quantize best.onnx --mode static --calibration images/
+"""
+import argparse
+import os
+import sys
+
+import cv2
+import numpy as np
+
+BACKENDS = ('ultralytics', 'onnx')
+
+
+def scaled_input_size(size, scale):
+    # Multiple de 32 (pas maximal du reseau YOLO)
+    return max(32, int(size * scale) // 32 * 32)
+
+
+class UltralyticsDetector:
+    def __init__(self, model, input_size=640):
+        # Accepte un chemin (best.pt) ou un modele YOLO deja charge
+        if isinstance(model, str):
+            from ultralytics import YOLO
+            model = YOLO(model)
+        self.model = model
+        self.base_input_size = input_size
+        # None: taille d'entree par defaut du modele
+        self.input_size = None
+
+    def set_input_scale(self, scale):
+        self.input_size = None if scale >= 1.0 else scaled_input_size(self.base_input_size, scale)
+
+    def detect_batch(self, images):
+        options = {'imgsz': self.input_size} if self.input_size else {}
+        results = self.model.predict(images, show=False, **options)
+        detections = []
+        for result in results:
+            boxes = []
+            for box in result.boxes:
+                xmin, ymin, xmax, ymax = map(int, box.xyxy[0])
+                confidence = float(box.conf[0])
+                boxes.append((xmin, ymin, xmax, ymax, confidence))
+            detections.append(boxes)
+        return detections
+
+
+def letterbox(image, size):
+    """Redimensionne en gardant le ratio et complete a ``size`` x ``size`` (gris 114, comme Ultralytics).
+
+    Renvoie (image, echelle, (pad_x, pad_y)).
+    """
+    h, w = image.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(image, (new_w, new_h),
+                                                                   interpolation=cv2.INTER_LINEAR)
+    return canvas, scale, (pad_x, pad_y)
+
+
+def to_blob(image):
+    # BGR uint8 HWC -> RGB float32 NCHW [0, 1]
+    return np.ascontiguousarray(image[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+class OnnxDetector:
+    def __init__(self, model_path, input_size=640, threads=None, conf_threshold=0.25, iou_threshold=0.45):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        # Un modele exporte a taille fixe impose sa taille d'entree
+        shape = self.session.get_inputs()[0].shape
+        self.dynamic = not isinstance(shape[2], int)
+        self.input_size = input_size if self.dynamic else shape[2]
+        self.base_input_size = self.input_size
+        self._fixed_warned = False
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+
+    def set_input_scale(self, scale):
+        # Seul un modele exporte avec dynamic=True accepte une autre taille d'entree: sinon ce
+        # reglage du niveau de qualite est saute (les autres s'appliquent)
+        if self.dynamic:
+            self.input_size = scaled_input_size(self.base_input_size, scale)
+        elif scale < 1.0 and not self._fixed_warned:
+            self._fixed_warned = True
+            print(f"Modele ONNX a taille d'entree fixe ({self.input_size}): la taille d'entree n'est pas reduite "
+                  f"(exporter avec 'detectors.py export --dynamic')")
+
+    def detect_batch(self, images):
+        return [self.detect(image) for image in images]
+
+    def detect(self, image):
+        padded, scale, (pad_x, pad_y) = letterbox(image, self.input_size)
+        output = self.session.run(None, {self.input_name: to_blob(padded)})[0]
+        # Sortie YOLOv8/v9: (1, 4 + classes, N) avec cx, cy, w, h dans l'espace d'entree
+        predictions = output[0].T
+        scores = predictions[:, 4:].max(axis=1)
+        keep = scores >= self.conf_threshold
+        predictions, scores = predictions[keep], scores[keep]
+        if not len(scores):
+            return []
+        cx, cy, bw, bh = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+        xywh = np.stack([cx - bw / 2, cy - bh / 2, bw, bh], axis=1)
+        indices = cv2.dnn.NMSBoxes(xywh.tolist(), scores.tolist(), self.conf_threshold, self.iou_threshold)
+        h, w = image.shape[:2]
+        boxes = []
+        for i in np.array(indices).reshape(-1):
+            x, y, bw, bh = xywh[i]
+            xmin = int(np.clip((x - pad_x) / scale, 0, w - 1))
+            ymin = int(np.clip((y - pad_y) / scale, 0, h - 1))
+            xmax = int(np.clip((x + bw - pad_x) / scale, 0, w - 1))
+            ymax = int(np.clip((y + bh - pad_y) / scale, 0, h - 1))
+            boxes.append((xmin, ymin, xmax, ymax, float(scores[i])))
+        return boxes
+
+
+def load_detector(backend='ultralytics', model_path='best.pt', input_size=640, threads=None):
+    if backend == 'ultralytics':
+        return UltralyticsDetector(model_path, input_size=input_size)
+    if backend == 'onnx':
+        return OnnxDetector(model_path, input_size=input_size, threads=threads)
+    raise ValueError(f"Backend de detection inconnu: {backend} (attendu: {', '.join(BACKENDS)})")
+
+
+def export_onnx(model_path, input_size=640, simplify=True, dynamic=False):
+    """Exporte ``best.pt`` en ONNX; renvoie le chemin du .onnx.
+
+    Taille d'entree fixe par defaut; avec ``dynamic`` le modele accepte d'autres
+    tailles, ce que le controleur de qualite utilise pour reduire l'entree.
+    """
+    from ultralytics import YOLO
+    return YOLO(model_path).export(format='onnx', imgsz=input_size, simplify=simplify, dynamic=dynamic)
+
+
+class _CalibrationReader:
+    # Fournit des images pretraitees a la quantification statique
+    def __init__(self, paths, input_name, input_size):
+        self.paths = iter(paths)
+        self.input_name = input_name
+        self.input_size = input_size
+
+    def get_next(self):
+        for path in self.paths:
+            image = cv2.imread(path, cv2.IMREAD_COLOR)
+            if image is not None:
+                return {self.input_name: to_blob(letterbox(image, self.input_size)[0])}
+        return None
+
+
+def quantize_onnx(model_path, output_path=None, mode='dynamic', calibration_paths=None, input_size=640):
+    """Quantification INT8: 'dynamic' (poids seulement) ou 'static' (poids + activations, calibration)."""
+    from onnxruntime import quantization
+
+    output_path = output_path or os.path.splitext(model_path)[0] + '.int8.onnx'
+    if mode == 'dynamic':
+        quantization.quantize_dynamic(model_path, output_path, weight_type=quantization.QuantType.QUInt8)
+    elif mode == 'static':
+        if not calibration_paths:
+            raise ValueError("La quantification statique demande des images de calibration")
+        import onnxruntime as ort
+        session_input = ort.InferenceSession(model_path, providers=['CPUExecutionProvider']).get_inputs()[0]
+        # Modele a taille d'entree variable: calibration a input_size
+        size = session_input.shape[2] if isinstance(session_input.shape[2], int) else input_size
+        reader = _CalibrationReader(calibration_paths, session_input.name, size)
+        quantization.quantize_static(model_path, output_path, reader,
+                                     quant_format=quantization.QuantFormat.QDQ,
+                                     activation_type=quantization.QuantType.QUInt8,
+                                     weight_type=quantization.QuantType.QInt8,
+                                     per_channel=True)
+    else:
+        raise ValueError(f"Mode de quantification inconnu: {mode}")
+    return output_path
+
+
+def main(argv=None):
+    from capture import list_images
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help="exporte un modele Ultralytics en ONNX")
+    export.add_argument('model')
+    export.add_argument('--imgsz', type=int, default=640)
+    export.add_argument('--dynamic', action='store_true', help="taille d'entree variable")
+    quantize = commands.add_parser('quantize', help="quantifie un modele ONNX en INT8")
+    quantize.add_argument('model')
+    quantize.add_argument('-o', '--output')
+    quantize.add_argument('--mode', choices=('dynamic', 'static'), default='dynamic')
+    quantize.add_argument('--calibration', help="dossier d'images pour la quantification statique")
+    quantize.add_argument('--calibration-images', type=int, default=100)
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        print(export_onnx(args.model, args.imgsz, dynamic=args.dynamic))
+    else:
+        paths = list_images(args.calibration)[:args.calibration_images] if args.calibration else None
+        print(quantize_onnx(args.model, args.output, args.mode, paths))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
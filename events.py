@@ -0,0 +1,352 @@
+"""Bus d'evenements de plaques et sinks enfichables (base, JSONL, webhook, TCP, interface).
+
+La reconnaissance publie des ``PlateEvent`` (plaque, confiance, camera,
+horodatage, boite) sur l'``EventBus``; ``publish`` ne fait que deposer
+l'evenement dans la file de chaque sink et rend la main. Chaque sink a son
+thread, une file bornee (``BoundedQueue``: politique 'latest' par defaut, la
+plus ancienne est jetee quand la file deborde) et ecrit par lots de
+``batch_size`` evenements ou toutes les ``flush_interval_ms``: un sink lent ou
+en panne perd des evenements (compteur ``sink_<nom>_dropped``) mais ne bloque
+jamais la reconnaissance. Avec la politique 'block', en revanche, un sink
+plein fait attendre l'editeur.
+
+Une fenetre de deduplication (``SightingCache``) peut etre placee devant le
+bus: un meme passage n'est alors publie qu'une fois pour tous les sinks.
+"""
+import http.client
+import json
+import os
+import queue
+import socket
+import threading
+import urllib.parse
+
+from DBHelper import BDDeManager, now_ms
+from metrics import metrics
+from pipeline import BoundedQueue, DROP_LATEST, DROP_BLOCK
+
+
+class PlateEvent:
+    __slots__ = ('plate', 'confidence', 'camera_id', 'timestamp_ms', 'bbox', 'track_id', 'early')
+
+    def __init__(self, plate, confidence=None, camera_id=None, timestamp_ms=None, bbox=None, track_id=None,
+                 early=False):
+        self.plate = plate
+        self.confidence = confidence
+        self.camera_id = camera_id
+        self.timestamp_ms = timestamp_ms if timestamp_ms is not None else now_ms()
+        # (xmin, ymin, xmax, ymax) en pixels de la frame pleine résolution, quel que soit le decode_mode
+        self.bbox = bbox
+        self.track_id = track_id
+        # Première lecture d'une piste encore dans le champ: seuls les sinks early_events la reçoivent
+        self.early = early
+
+    def to_dict(self):
+        return {
+            'plate': self.plate,
+            'confidence': self.confidence,
+            'camera_id': self.camera_id,
+            'timestamp_ms': self.timestamp_ms,
+            'bbox': list(self.bbox) if self.bbox is not None else None,
+        }
+
+    def __repr__(self):
+        return f"PlateEvent({self.plate!r}, camera={self.camera_id!r}, confidence={self.confidence})"
+
+
+def encode_events(events):
+    # Une ligne JSON par événement (JSONL): plate, confidence, camera_id, timestamp_ms,
+    # bbox [xmin, ymin, xmax, ymax] en pixels pleine résolution
+    return ''.join(json.dumps(event.to_dict(), separators=(',', ':')) + '\n' for event in events).encode()
+
+
+class Sink:
+    """Sink asynchrone: les sous-classes implementent ``write_batch`` (et au besoin ``open``/``close_sink``).
+
+    ``write_batch`` tourne dans le thread du sink; une exception fait perdre le
+    lot en cours (compteur ``sink_<nom>_errors``) sans arreter le sink.
+    Les evenements ``early`` (premiere lecture d'une piste) ne sont transmis
+    qu'aux sinks dont ``early_events`` est vrai.
+    """
+
+    early_events = False
+
+    def __init__(self, name, buffer_size=1000, batch_size=50, flush_interval_ms=200, drop_policy=DROP_LATEST):
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.queue = BoundedQueue(buffer_size, drop_policy)
+        self.written = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name=f'sink-{name}', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def offer(self, event):
+        if event.early and not self.early_events:
+            return
+        dropped = self.queue.dropped
+        self.queue.put(event)
+        if self.queue.dropped != dropped:
+            metrics.inc(f'sink_{self.name}_dropped')
+        elif self.queue.closed and self.queue.drop_policy == DROP_BLOCK:
+            # Un sink bloquant ne perd rien en marche: un événement refusé après l'arrêt est une erreur
+            self.errors += 1
+            metrics.inc(f'sink_{self.name}_errors')
+
+    def _run(self):
+        try:
+            self.open()
+        except Exception as e:
+            print(f"Erreur d'ouverture du sink {self.name}: {e}")
+        while True:
+            try:
+                batch = self.queue.get_batch(self.batch_size, self.flush_interval)
+            except queue.Empty:
+                # File fermée et vidée
+                break
+            try:
+                with metrics.timer(f'sink_{self.name}'):
+                    self.write_batch(batch)
+            except Exception as e:
+                self.errors += 1
+                metrics.inc(f'sink_{self.name}_errors')
+                print(f"Erreur du sink {self.name}: {e}")
+                continue
+            self.written += len(batch)
+            metrics.inc(f'sink_{self.name}_written', len(batch))
+        try:
+            self.close_sink()
+        except Exception as e:
+            print(f"Erreur de fermeture du sink {self.name}: {e}")
+
+    def open(self):
+        pass
+
+    def write_batch(self, events):
+        raise NotImplementedError
+
+    def close_sink(self):
+        pass
+
+    def close(self, timeout=5.0):
+        # Les événements déjà en file sont écrits avant l'arrêt (dans la limite de timeout)
+        self.queue.close()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            'queued': self.queue.qsize(),
+            'dropped': self.queue.dropped,
+            'written': self.written,
+            'errors': self.errors,
+        }
+
+
+class SQLiteSink(Sink):
+    """Passages dans la base (plates/sightings) via un BDDeManager en mode write-behind.
+
+    ``db`` est un BDDeManager write-behind deja ouvert, ou le chemin d'une base:
+    le sink possede alors son BDDeManager (``owns_db``), l'ouvre et le ferme dans
+    son thread; les lignes encore dans la file d'ecriture sont ecrites a l'arret.
+    """
+
+    def __init__(self, db, name='sqlite', buffer_size=10000, **options):
+        super().__init__(name, buffer_size=buffer_size, **options)
+        self.owns_db = isinstance(db, str)
+        if self.owns_db:
+            self.db_path, self.db_manager = db, None
+        else:
+            # La connexion d'un BDDeManager synchrone appartient au thread qui l'a créé
+            if not db.write_behind:
+                raise ValueError("SQLiteSink requires a write-behind BDDeManager")
+            self.db_path, self.db_manager = db.db_name, db
+
+    def open(self):
+        if self.owns_db:
+            # Créé dans le thread du sink: la connexion SQLite y est aussi fermée
+            self.db_manager = BDDeManager(self.db_path, write_behind=True)
+            self.db_manager.create_table()
+
+    def write_batch(self, events):
+        for event in events:
+            self.db_manager.insertion(event.plate, event.camera_id, event.confidence,
+                                      timestamp_ms=event.timestamp_ms)
+
+    def close_sink(self):
+        if self.owns_db and self.db_manager is not None:
+            self.db_manager.close_connection()
+
+
+class JsonlSink(Sink):
+    """Fichier JSONL avec rotation: ``path`` -> ``path.1`` ... ``path.<backup_count>`` au-dela de max_bytes."""
+
+    def __init__(self, path, name='jsonl', max_bytes=10 * 1024 * 1024, backup_count=5, **options):
+        super().__init__(name, **options)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._file = None
+
+    def open(self):
+        self._file = open(self.path, 'ab')
+
+    def _rotate(self):
+        self._file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, 'ab')
+        metrics.inc(f'sink_{self.name}_rotations')
+
+    def write_batch(self, events):
+        data = encode_events(events)
+        if self._file.tell() and self._file.tell() + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+
+    def close_sink(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class WebhookSink(Sink):
+    """POST JSON d'un lot (``{"events": [...]}``) vers une URL HTTP, connexion gardee ouverte."""
+
+    def __init__(self, url, name='webhook', timeout=2.0, headers=None, **options):
+        super().__init__(name, **options)
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme not in ('http', 'https'):
+            raise ValueError(f"Unsupported webhook URL: {url}")
+        self.url = url
+        self.scheme = parsed.scheme
+        self.netloc = parsed.netloc
+        self.target = (parsed.path or '/') + (f"?{parsed.query}" if parsed.query else '')
+        self.timeout = timeout
+        self.headers = {'Content-Type': 'application/json', **(headers or {})}
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            self._conn = cls(self.netloc, timeout=self.timeout)
+        return self._conn
+
+    def write_batch(self, events):
+        body = json.dumps({'events': [event.to_dict() for event in events]}).encode()
+        conn = self._connection()
+        try:
+            conn.request('POST', self.target, body, self.headers)
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            # Connexion fermée par le serveur ou injoignable: recréée au lot suivant
+            self.close_sink()
+            raise
+        if response.status >= 300:
+            raise RuntimeError(f"{self.url} answered {response.status}")
+
+    def close_sink(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class TcpSink(Sink):
+    """Evenements JSONL sur une connexion TCP (barriere, collecteur de logs), reconnectee au besoin."""
+
+    def __init__(self, host, port, name='tcp', timeout=2.0, **options):
+        super().__init__(name, **options)
+        self.address = (host, port)
+        self.timeout = timeout
+        self._sock = None
+
+    def write_batch(self, events):
+        if self._sock is None:
+            self._sock = socket.create_connection(self.address, timeout=self.timeout)
+        try:
+            self._sock.sendall(encode_events(events))
+        except OSError:
+            self.close_sink()
+            raise
+
+    def close_sink(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class CallbackSink(Sink):
+    """Lot d'evenements passe a ``callback(events)`` (par ex. l'emit d'un signal Qt vers l'interface)."""
+
+    def __init__(self, callback, name='callback', **options):
+        super().__init__(name, **options)
+        self.callback = callback
+
+    def write_batch(self, events):
+        self.callback(events)
+
+
+class EventBus:
+    def __init__(self, dedup=None):
+        # SightingCache optionnel: les répétitions d'un passage ne sont pas publiées
+        self.dedup = dedup
+        self.sinks = []
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink):
+        with self._lock:
+            self.sinks = self.sinks + [sink]
+        sink.start()
+        return sink
+
+    def remove_sink(self, sink):
+        with self._lock:
+            self.sinks = [current for current in self.sinks if current is not sink]
+        sink.close()
+
+    def publish(self, events):
+        sinks = self.sinks
+        for event in events:
+            if event.early:
+                # Hors déduplication: le passage est compté par l'événement final de la piste
+                metrics.inc('events_early')
+            elif self.dedup is not None and not self.dedup.seen(event.plate, event.camera_id):
+                continue
+            else:
+                metrics.inc('events_published')
+            for sink in sinks:
+                sink.offer(event)
+
+    def stats(self):
+        return {sink.name: sink.stats() for sink in self.sinks}
+
+    def close(self, timeout=5.0):
+        with self._lock:
+            sinks, self.sinks = self.sinks, []
+        for sink in sinks:
+            sink.close(timeout)
+
+
+def parse_sink(spec):
+    """Sink depuis la ligne de commande: ``jsonl:events.jsonl``, ``sqlite:passages.db``,
+    ``http://hote/chemin`` ou ``tcp:hote:port``."""
+    if spec.startswith(('http://', 'https://')):
+        return WebhookSink(spec)
+    kind, _, target = spec.partition(':')
+    if kind == 'jsonl' and target:
+        return JsonlSink(target)
+    if kind == 'sqlite' and target:
+        return SQLiteSink(target)
+    if kind == 'tcp' and target:
+        host, _, port = target.rpartition(':')
+        return TcpSink(host or '127.0.0.1', int(port))
+    raise ValueError(f"Unknown event sink: {spec}")
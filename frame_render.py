@@ -0,0 +1,104 @@
+"""Rendu des frames pour l'affichage, hors du thread de l'interface.
+
+``FrameRenderer`` met la frame a la taille du label (une seule fois, dans le
+thread du grabber) dans un tampon pre-alloue, et l'enveloppe dans une QImage
+``Format_BGR888`` (Qt >= 5.14, pas de conversion de couleur). Le thread de
+l'interface n'a plus qu'a faire ``QPixmap.fromImage`` d'une image deja a la
+bonne taille, puis a rendre le tampon avec ``release``.
+
+Le debit est plafonne a ``max_fps`` (frequence de l'ecran): une frame qui
+arrive trop tot, ou alors que tous les tampons sont encore a l'affichage
+(l'interface ne suit pas), n'est pas rendue. Les tampons ne sont reutilises
+qu'apres ``release``: une QImage en attente dans la file des signaux ne voit
+jamais son contenu ecrase.
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+from PyQt5 import QtGui
+
+from metrics import metrics
+
+# Qt < 5.14: pas de Format_BGR888, on convertit en RGB dans le tampon (sans allocation)
+BGR888 = getattr(QtGui.QImage, 'Format_BGR888', None)
+
+
+class FrameRenderer:
+    def __init__(self, size=(640, 480), max_fps=30.0, buffers=3, stale_after=1.0):
+        self.size = size
+        self.max_fps = max_fps
+        self.buffer_count = buffers
+        # Tampon jamais rendu (signal perdu, grabber remplacé): récupéré après stale_after secondes
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._last = 0.0
+        self._in_flight = {}
+        self._allocate(size)
+
+    def _allocate(self, size):
+        width, height = size
+        self._buffers = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(self.buffer_count)]
+        self._free = list(self._buffers)
+        self._allocated_size = size
+
+    def set_target_size(self, width, height):
+        # Appelé depuis l'interface quand le label change de taille
+        if width > 0 and height > 0:
+            self.size = (width, height)
+
+    def acquire(self):
+        """Tampon libre pour la prochaine frame, ou None si elle ne doit pas etre affichee."""
+        now = time.monotonic()
+        with self._lock:
+            if self.max_fps and now - self._last < 1.0 / self.max_fps:
+                metrics.inc('frames_not_displayed')
+                return None
+            if self.size != self._allocated_size:
+                self._allocate(self.size)
+            if not self._free:
+                self._reclaim(now)
+            if not self._free:
+                metrics.inc('frames_not_displayed')
+                return None
+            self._last = now
+            return self._free.pop()
+
+    def _reclaim(self, now):
+        for key, (buffer, sent) in list(self._in_flight.items()):
+            if now - sent > self.stale_after:
+                del self._in_flight[key]
+                self._recycle(buffer)
+
+    def _recycle(self, buffer):
+        # Les tampons d'une ancienne taille sont simplement abandonnés
+        if any(buffer is current for current in self._buffers):
+            self._free.append(buffer)
+
+    def render(self, image, buffer):
+        height, width = buffer.shape[:2]
+        try:
+            if image.shape[:2] == (height, width):
+                np.copyto(buffer, image)
+            else:
+                interpolation = cv2.INTER_AREA if image.shape[1] > width else cv2.INTER_LINEAR
+                cv2.resize(image, (width, height), dst=buffer, interpolation=interpolation)
+            if BGR888 is None:
+                cv2.cvtColor(buffer, cv2.COLOR_BGR2RGB, dst=buffer)
+        except Exception:
+            with self._lock:
+                self._recycle(buffer)
+            raise
+        qimage = QtGui.QImage(buffer.data, width, height, 3 * width,
+                              BGR888 if BGR888 is not None else QtGui.QImage.Format_RGB888)
+        with self._lock:
+            self._in_flight[qimage.cacheKey()] = (buffer, time.monotonic())
+        return qimage
+
+    def release(self, qimage):
+        # Appelé par l'interface une fois la QPixmap créée: le tampon peut resservir
+        with self._lock:
+            entry = self._in_flight.pop(qimage.cacheKey(), None)
+            if entry is not None:
+                self._recycle(entry[0])
@@ -1,34 +1,34 @@
 import cv2
-import subprocess
-import numpy as np
 from PyQt5 import QtCore, QtGui, QtWidgets
 #from PyQt5.QtCore import QThread, pyqtSignal, QImage
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QLineEdit, QPushButton
-from PyQt5.QtGui import QPixmap, QImage
-import torch
-import easyocr
+from PyQt5.QtGui import QPixmap
 from PyQt5.QtCore import pyqtSignal
-from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QVBoxLayout, QWidget
-from PyQt5.QtGui import QImage, QPixmap
 from PyQt5.QtCore import QTimer
 import os
-from ultralytics import YOLO
+import queue
+import threading
+import time
 from DBHelper import BDDeManager
 from datetime import datetime
-
-
-# Initialiser le lecteur OCR
-reader = easyocr.Reader(['en'], gpu=False)
-
-# Dictionnaire de mappage pour la conversion des caractères
-dict_char_to_int = {
-    'O': '0',
-    'I': '1',
-    'J': '3',
-    'A': '4',
-    'G': '6',
-    'S': '5'
-}
+from pipeline import Pipeline, BoundedQueue, DROP_LATEST, DROP_BLOCK
+from mjpeg import frame_image
+from capture import capture_ip_camera, capture_local_camera
+from metrics import metrics, MetricsServer, SamplingProfiler
+from camera_manager import CameraManager, CameraSource
+from models import registry
+from digit_reader import load_digit_reader
+from plate_format import set_plate_formats
+from plate_table import PlateTableModel
+from dedup import SightingCache
+from notifications import NotificationBanner
+from frame_render import FrameRenderer
+from events import EventBus, SQLiteSink, parse_sink
+from watchlist import Watchlist, WatchlistSink
+from recording import StreamRecorder, replay_frames
+from quality import QualityController
+import math
+from recognition import PlateRecognizer
 
 # Ajout de chemins vers les plugins de Qt
 os.environ['QT_QPA_PLATFORM_PLUGIN_PATH'] = '/usr/lib/aarch64-linux-gnu/qt5/plugins/platforms'
@@ -36,143 +36,299 @@ os.environ['QT_QPA_PLATFORM'] = 'xcb'
 
 
 class FrameGrabber(QtCore.QThread):
-    signal = QtCore.pyqtSignal(QtGui.QImage, list)
+    signal = QtCore.pyqtSignal(QtGui.QImage)
     alertSignal = QtCore.pyqtSignal(str)
 
-    def __init__(self, use_ip_camera=False, ip_address=None, port_number=None, stream_url=None, parent=None):
+    def __init__(self, use_ip_camera=False, ip_address=None, port_number=None, stream_url=None, parent=None,
+                 pipelined=True, ocr_workers=2, queue_size=2, drop_policy=DROP_LATEST,
+                 batch_ocr=True, ocr_batch_size=1, ocr_batch_window_ms=0, tracking=True,
+                 motion_gate=True, motion_roi=None, idle_stride=15, decode_mode='full', fast_reader=None,
+                 display_size=(640, 480), display_fps=30.0, event_bus=None,
+                 record=None, replay=None, replay_speed=1.0, replay_loop=False, controller=None):
         super(FrameGrabber, self).__init__(parent)
         self.use_ip_camera = use_ip_camera
         self.ip_address = ip_address
         self.port_number = port_number
         self.stream_url = stream_url
-        self.detected_plates = set()
-
-        # Initialize YOLOv9 model from Ultralytics
-        self.model = YOLO("best.pt")
-        # Initialize EasyOCR reader
-        self.reader = easyocr.Reader(['en'])
+        # Pipeline multi-threads (capture / détection / OCR / rendu)
+        self.pipelined = pipelined
+        self.ocr_workers = ocr_workers
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        self.pipeline = None
+        # OCR groupé sur plusieurs frames (ocr_batch_size > 1)
+        self.ocr_batch_size = ocr_batch_size
+        self.ocr_batch_window_ms = ocr_batch_window_ms
+        # Décodage caméra locale: 'full' (défaut), ou 'reduced2'/'reduced4'/'reduced8' (YOLO en basse
+        # résolution, crops des plaques en pleine résolution): utile seulement sur un flux large où peu
+        # de frames ont une plaque à lire (voir mjpeg.JpegFrame)
+        self.decode_mode = decode_mode
+        # Enregistrement du flux brut de la caméra (record), ou relecture d'un enregistrement à la place
+        # de la caméra (replay; replay_speed 1 temps réel, 0 sans attente)
+        self.record = record
+        self.replay = replay
+        self.replay_speed = replay_speed
+        self.replay_loop = replay_loop
+        # stop(): termine la capture même pendant une coupure de la caméra (aucune frame ne reviendrait)
+        self._stop_event = threading.Event()
+        # Affichage: mise à l'échelle dans ce thread, plafonné à la fréquence de l'écran
+        self.renderer = FrameRenderer(display_size, display_fps)
+        # Plaques reconnues publiées sur le bus d'événements (interface, base, webhook...)
+        self.event_bus = event_bus
+        # QualityController: baisse la qualité de la reconnaissance quand la latence dépasse son budget
+        self.controller = controller
+
+        # Modèles YOLO/EasyOCR partagés (registre), chargés en arrière-plan au premier run()
+        self.recognizer_options = dict(
+            batch_ocr=batch_ocr,
+            tracking=tracking,
+            motion_gate=motion_gate,
+            motion_roi=motion_roi,
+            idle_stride=idle_stride,
+            fast_reader=fast_reader,
+        )
+        self.recognizer = None
 
     def capture_video(self):
-        if self.use_ip_camera and self.stream_url:
+        if self.replay:
+            yield from replay_frames(self.replay, self.replay_speed, self.replay_loop, self.decode_mode)
+        elif self.use_ip_camera and self.stream_url:
             yield from self._capture_ip_camera()
         else:
             yield from self._capture_local_camera()
 
+    def _recorder(self, source):
+        return StreamRecorder(self.record, source=source) if self.record else None
+
+    # Capture supervisée: reconnexion avec délai croissant, chaque coupure signalée dans le bandeau
     def _capture_ip_camera(self):
-        cap = cv2.VideoCapture(self.stream_url)
-        if not cap.isOpened():
-            raise RuntimeError(f"Failed to open IP camera stream: {self.stream_url}")
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                raise RuntimeError("Failed to read frame from IP camera stream")
-            yield frame
+        return capture_ip_camera(self.stream_url, on_error=self._capture_error,
+                                 recorder=self._recorder(self.stream_url), stop_event=self._stop_event)
 
     def _capture_local_camera(self):
-        command = [
-            "libcamera-vid",
-            "--codec", "mjpeg",
-            "--width", "640",
-            "--height", "480",
-            "--framerate", "30",
-            "-o", "-",  # Output to stdout
-            "--timeout", "0"  # Capture indefinitely
-        ]
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=10**8)
-        if process:
-            stream = process.stdout
-            buffer = b''
-            while True:
-                buffer += stream.read(4096)
-                start_marker = buffer.find(b'\xff\xd8')
-                end_marker = buffer.find(b'\xff\xd9')
-                if start_marker != -1 and end_marker != -1:
-                    jpeg_data = buffer[start_marker:end_marker+2]
-                    buffer = buffer[end_marker+2:]
-                    frame = cv2.imdecode(np.frombuffer(jpeg_data, dtype=np.uint8), cv2.IMREAD_COLOR)
-                    if frame is not None:
-                        yield frame
+        return capture_local_camera(self.decode_mode, on_error=self._capture_error,
+                                    recorder=self._recorder('libcamera'), stop_event=self._stop_event)
+
+    def _capture_error(self, error):
+        self.alertSignal.emit(str(error))
+
+    def load_recognizer(self):
+        if self.recognizer is None:
+            model, reader = registry.get()
+            self.recognizer = PlateRecognizer(model, reader, **self.recognizer_options)
+        return self.recognizer
+
+    def _preview_until_loaded(self, frames):
+        # Flux brut affiché pendant le chargement des modèles
+        registry.load_async()
+        for frame in frames:
+            self._emit_frame(frame)
+            if not registry.loading():
+                return
 
     def run(self):
+        frames = self.capture_video()
         try:
-            for frame in self.capture_video():
-                ocr_results = self.process_frame(frame)
-                qImg = self.convert_to_qimage(frame)
-                self.signal.emit(qImg, ocr_results)
+            # Rejeu: aucune frame ne doit passer en simple aperçu, on attend les modèles avant de lire
+            if not registry.ready() and not self.replay:
+                self._preview_until_loaded(frames)
+            self.load_recognizer()
+        except RuntimeError as e:
+            self.alertSignal.emit(str(e))
+            return
+        if self._stop_event.is_set():
+            # Arrêté pendant le chargement des modèles
+            return
+        if self.controller is not None:
+            self.controller.attach(self.recognizer)
+        try:
+            if self.pipelined:
+                self.run_pipeline(frames)
+            else:
+                self._run_sequential(frames)
+        finally:
+            if self.controller is not None:
+                self.controller.detach(self.recognizer)
+            # Véhicules encore suivis à l'arrêt: leur plaque est publiée (et enregistrée) quand même
+            self._publish(self.recognizer.finish())
+
+    def _run_sequential(self, frames):
+        try:
+            for frame in frames:
+                start = time.monotonic()
+                packet = self.recognizer.process(frame)
+                self._publish(self.recognizer.plate_records(packet, early=True))
+                self._emit_frame(frame, lambda image: self.recognizer.annotate(image, packet.boxes, packet.plates))
+                if self.controller is not None:
+                    self.controller.observe(time.monotonic() - start)
         except RuntimeError as e:
             self.alertSignal.emit(str(e))
 
+    def run_pipeline(self, frames=None):
+        self.pipeline = Pipeline(
+            frames if frames is not None else self.capture_video(),
+            detect=self.recognizer.detect_packet,
+            recognize=self._ocr_batch_stage if self.ocr_batch_size > 1 else self._ocr_stage,
+            render=self._render_stage,
+            ocr_workers=self.ocr_workers,
+            queue_size=self.queue_size,
+            drop_policy=self.drop_policy,
+            ocr_batch_size=self.ocr_batch_size,
+            ocr_batch_window_ms=self.ocr_batch_window_ms,
+            on_error=self._pipeline_error,
+            controller=self.controller,
+            # Frame jetée avant l'OCR: ses pistes récupèrent la lecture réservée
+            on_ocr_drop=self.recognizer.release_packet,
+        )
+        self.pipeline.start()
+        self.pipeline.join()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.pipeline is not None:
+            self.pipeline.stop()
+
+    def pipeline_stats(self):
+        # Débit et latence par étape, None en mode séquentiel
+        return self.pipeline.stats() if self.pipeline is not None else None
+
+    def _pipeline_error(self, error):
+        self.alertSignal.emit(str(error))
+
+    def _ocr_stage(self, packet):
+        self.recognizer.read_packets([packet])
+        return packet
+
+    def _ocr_batch_stage(self, packets):
+        # Un seul passage de reconnaissance pour les plaques de toutes les frames du lot
+        self.recognizer.read_packets(packets)
+        return packets
+
+    def _render_stage(self, packet):
+        self._publish(self.recognizer.plate_records(packet, early=True))
+        self._emit_frame(packet.frame, lambda image: self.recognizer.annotate(image, packet.boxes, packet.plates))
+
+    def _publish(self, events):
+        if events and self.event_bus is not None:
+            self.event_bus.publish(events)
+
+    def _emit_frame(self, frame, draw=None):
+        # Frame non affichée (débit de l'écran atteint ou interface en retard): ni décodage ni conversion
+        buffer = self.renderer.acquire()
+        if buffer is None:
+            return
+        image = frame_image(frame)
+        if draw is not None:
+            draw(image)
+        self.signal.emit(self.renderer.render(image, buffer))
+
     def process_frame(self, frame):
-        results = self.model.predict(frame, show=False)
-        label = 'licence plate'
-        ocr_results = []
-        for box in results[0].boxes:
-            xmin, ymin, xmax, ymax = map(int, box.xyxy[0])
-            confidence = float(box.conf[0])
-            plate_region = frame[ymin:ymax, xmin:xmax]
-            plate_text = self.getOCR(plate_region)
-            self.detected_plates.add(plate_text)
-            ocr_results.append(plate_text.strip())
-            self.draw_label(frame, xmin, ymin, xmax, ymax, plate_text, confidence)
-        return ocr_results
+        return self.load_recognizer().process_frame(frame)
 
     def convert_to_qimage(self, frame):
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = image.shape
-        bytesPerLine = ch * w
-        return QtGui.QImage(image.data, w, h, bytesPerLine, QtGui.QImage.Format_RGB888)
-
-    def draw_label(self, frame, xmin, ymin, xmax, ymax, plate_text, confidence):
-        cv2.rectangle(frame, (xmin, ymin), (xmax, ymax), (255, 0, 0), 2)
-        text = f"{plate_text} License plate {confidence:.2f}"
-        cv2.putText(frame, text, (xmin, ymin - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
-
-    def getOCR(self, image):
-        preprocessed_image = preprocess_image(image)
-        plate_text, _ = read_license_plate(preprocessed_image, self.reader)
-        return plate_text if plate_text else ""
-
-def preprocess_image(image):
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    gray = cv2.resize(gray, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
-    gray = cv2.medianBlur(gray, 5)
-    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    return binary
-
-def read_license_plate(license_plate_crop, reader):
-    detections = reader.readtext(license_plate_crop)
-    best_text = None
-    max_score = 0
-    for detection in detections:
-        bbox, text, score = detection
-        if score > max_score:
-            max_score = score
-            best_text = text.upper().replace(' ', '')
-    if best_text and license_complies_format(best_text):
-        return format_license(best_text), max_score
-    else:
-        return None, None
-
-def license_complies_format(text):
-    if len(text) != 10:
-        return False
-    for char in text:
-        if char.isdigit() or char in dict_char_to_int.keys():
-            continue
-        else:
-            return False
-    return True
-
-def format_license(text):
-    license_plate = ''
-    for j in range(len(text)):
-        if text[j] in dict_char_to_int.keys():
-            license_plate += dict_char_to_int[text[j]]
-        else:
-            license_plate += text[j]
-    return license_plate
+        return convert_to_qimage(frame)
 
 
+def convert_to_qimage(frame):
+    # Conversion ponctuelle (hors flux vidéo, qui passe par FrameRenderer): copy() détache
+    # l'image du tableau NumPy, qui peut être libéré avant l'affichage
+    image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    h, w, ch = image.shape
+    bytesPerLine = ch * w
+    return QtGui.QImage(image.data, w, h, bytesPerLine, QtGui.QImage.Format_RGB888).copy()
+
+
+class MultiCameraGrabber(QtCore.QThread):
+    # (camera_id, image)
+    signal = QtCore.pyqtSignal(str, QtGui.QImage)
+    alertSignal = QtCore.pyqtSignal(str)
+    # Source terminée (fichier, rejeu) et retirée: son identifiant est de nouveau libre
+    cameraRemoved = QtCore.pyqtSignal(str)
+
+    def __init__(self, sources, parent=None, max_batch=None, display_fps=30.0, event_bus=None,
+                 **recognizer_options):
+        super(MultiCameraGrabber, self).__init__(parent)
+        self.sources = list(sources)
+        self.max_batch = max_batch
+        self.recognizer_options = recognizer_options
+        # Un FrameRenderer par caméra (taille de sa vue dans la grille)
+        self.display_fps = display_fps
+        self.renderers = {}
+        self.event_bus = event_bus
+        # Créé dans run(), une fois les modèles du registre chargés
+        self.manager = None
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def add_source(self, source):
+        with self._lock:
+            if self.manager is None:
+                self.sources.append(source)
+                return
+        self.manager.add_source(source)
+
+    def run(self):
+        try:
+            model, reader = registry.get()
+        except RuntimeError as e:
+            self.alertSignal.emit(str(e))
+            return
+        with self._lock:
+            if self._stopped:
+                return
+            # Une seule copie des modèles pour toutes les caméras
+            self.manager = CameraManager(
+                self.sources,
+                model,
+                reader,
+                on_result=self._on_result,
+                on_error=self._on_error,
+                on_finished=self._on_finished,
+                on_removed=self._on_removed,
+                max_batch=self.max_batch,
+                **self.recognizer_options,
+            )
+        self.manager.start()
+        self.manager.join()
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            if self.manager is not None:
+                self.manager.stop()
+
+    def renderer_for(self, camera_id):
+        with self._lock:
+            renderer = self.renderers.get(camera_id)
+            if renderer is None:
+                renderer = self.renderers[camera_id] = FrameRenderer(max_fps=self.display_fps)
+            return renderer
+
+    def _on_result(self, camera_id, packet, recognizer):
+        events = recognizer.plate_records(packet, camera_id, early=True)
+        if events and self.event_bus is not None:
+            self.event_bus.publish(events)
+        renderer = self.renderer_for(camera_id)
+        buffer = renderer.acquire()
+        if buffer is None:
+            return
+        image = frame_image(packet.frame)
+        recognizer.annotate(image, packet.boxes, packet.plates)
+        self.signal.emit(camera_id, renderer.render(image, buffer))
+
+    def _on_finished(self, camera_id, events):
+        # Pistes encore ouvertes quand la caméra (ou le service) s'arrête
+        if self.event_bus is not None:
+            self.event_bus.publish(events)
+
+    def _on_error(self, camera_id, error):
+        self.alertSignal.emit(f"{camera_id}: {error}")
+
+    def _on_removed(self, camera_id):
+        with self._lock:
+            self.renderers.pop(camera_id, None)
+        self.cameraRemoved.emit(camera_id)
+
         
 class AddPlateDialog(QDialog):
     def __init__(self, parent=None):
@@ -202,50 +358,131 @@ class AddPlateDialog(QDialog):
             QtWidgets.QMessageBox.warning(self, "Erreur", "Veuillez entrer un numéro de plaque valide.")
 
 
+class AutoAddSink(SQLiteSink):
+    """Sink 'db' de l'interface: décide, pour chaque passage, plaque connue ou ajout automatique.
+
+    Les plaques inconnues sont écrites en base quand ``auto_add()`` est vrai; chaque
+    décision ``(événement, connue, ajoutée)`` part ensuite dans ``display`` (file
+    'latest' vidée par l'interface). Le sink bloque quand sa file est pleine, aucun
+    passage n'est perdu; l'affichage, lui, perd les plus anciens s'il prend du retard.
+    """
+
+    def __init__(self, db_manager, auto_add, display, on_display, **options):
+        super().__init__(db_manager, name='db', drop_policy=DROP_BLOCK, **options)
+        self.auto_add = auto_add
+        self.display = display
+        self.on_display = on_display
+
+    def write_batch(self, events):
+        for event in events:
+            known = self.db_manager.plate_exists(event.plate)
+            added = not known and self.auto_add()
+            if added:
+                self.db_manager.insertion(event.plate, event.camera_id, event.confidence,
+                                          timestamp_ms=event.timestamp_ms)
+            if known or added:
+                self.display.put((event, known))
+        self.on_display()
+
+
 class Ui_MainWindow(QtWidgets.QMainWindow):
    
     # Déclaration du signal personnalisé avec une liste de paramètres en fonction de vos besoins
     plateDetectedInDB = pyqtSignal(str, str)
-
-    def __init__(self, MainWindow):
+    # Nouvelles décisions du sink 'db' dans plateDisplay (plaque connue ou ajoutée)
+    plateEvents = pyqtSignal()
+    # Alerte liste de surveillance (message), émise depuis le thread du sink 'watchlist'
+    watchlistHit = pyqtSignal(str)
+    # Message du contrôleur de qualité (texte, niveau du bandeau), émis depuis le thread du pipeline
+    qualityMessage = pyqtSignal(str, str)
+
+    def __init__(self, MainWindow, show_metrics=False, cameras=None, recognizer_options=None, dedup_seconds=30.0,
+                 display_fps=None, event_sinks=(), watchlist=None, source_options=None):
         super().__init__()
         self.MainWindow = MainWindow
         self.setupUi(self.MainWindow)
-        self.grabber = FrameGrabber()
-        self.grabber.signal.connect(self.updateFrame)
-        self.grabber.start()
-        self.db_manager = BDDeManager()  # Initialisation de la bdd
-        # Initialize row counter
-        self.current_row = 0
+        # Affichage des métriques par étape dans la barre d'état (rafraîchi chaque seconde),
+        # précédé de l'état "chargement des modèles" tant que le registre n'est pas prêt
+        self.show_metrics = show_metrics
+        self.metricsTimer = QTimer()
+        self.metricsTimer.timeout.connect(self.updateMetricsOverlay)
+        self.metricsTimer.start(1000)
+        registry.load_async()
+        self.label.setAlignment(QtCore.Qt.AlignCenter)
+        self.label.setText("Chargement des modèles...")
+        self.statusbar.showMessage("Chargement des modèles...")
+        self.db_manager = BDDeManager(write_behind=True)  # Initialisation de la bdd (écritures en arrière-plan)
         self.db_manager.create_table()  # creation de table
-        # chargement de la data
-        self.load_data_from_db()
+        # chargement de la data (première page seulement, le reste à la demande)
+        self.plateModel = PlateTableModel(self.db_manager)
+        self.tableView.setModel(self.plateModel)
+        # Fenêtre de déduplication devant le bus: une plaque revue dans les dedup_seconds n'est pas republiée
+        self.sightingCache = SightingCache(ttl=dedup_seconds)
+        # Bus d'événements: l'interface est un sink parmi d'autres (JSONL, webhook, TCP, base...).
+        # Le sink 'db' (bloquant) enregistre les passages hors du thread de l'interface; l'affichage
+        # (file 'gui') perd les plus anciens quand l'interface est en retard, sans freiner la reconnaissance
+        self.eventBus = EventBus(dedup=self.sightingCache)
+        self.plateDisplay = BoundedQueue(200, DROP_LATEST, on_drop=lambda _: metrics.inc('sink_gui_dropped'))
+        self.plateEvents.connect(self.handlePlates)
+        self.eventBus.add_sink(AutoAddSink(self.db_manager, lambda: self.autoAddEnabled, self.plateDisplay,
+                                           self.plateEvents.emit, batch_size=20, flush_interval_ms=50))
+        for sink in event_sinks:
+            self.eventBus.add_sink(sink)
+        # Liste de surveillance: recherche approchée (confusions OCR, 1-2 erreurs) de chaque passage
+        self.watchlistHit.connect(self.showWatchlistAlert)
+        if watchlist is not None:
+            self.eventBus.add_sink(WatchlistSink(watchlist, self.onWatchlistMatch))
+        # Plusieurs caméras (liste de CameraSource): grille de vues et service d'inférence partagé
+        self.cameraLabels = {}
+        self.recognizer_options = recognizer_options or {}
+        controller = self.recognizer_options.get('controller')
+        if controller is not None:
+            # Changements de niveau et erreurs du journal d'audit dans le bandeau de notifications
+            self.qualityMessage.connect(self.notifications.notify)
+            controller.on_change = lambda message: self.qualityMessage.emit(message, 'info')
+            controller.on_error = lambda message: self.qualityMessage.emit(message, 'error')
+        # Grabbers remplacés dont run() n'est pas encore terminé (gardés en vie jusqu'à finished)
+        self.retiredGrabbers = []
+        # Rendu plafonné à la fréquence de rafraîchissement de l'écran: les frames en trop ne sont pas converties
+        self.display_fps = display_fps or QtWidgets.QApplication.primaryScreen().refreshRate() or 30.0
+        if cameras:
+            self.label.hide()
+            self.grabber = MultiCameraGrabber(cameras, display_fps=self.display_fps, event_bus=self.eventBus,
+                                              **self.recognizer_options)
+            self.grabber.signal.connect(self.updateCameraFrame)
+            self.grabber.cameraRemoved.connect(self.removeCameraView)
+            for source in cameras:
+                self.addCameraView(source.camera_id)
+        else:
+            # source_options (enregistrement, relecture) ne valent que pour la caméra de départ:
+            # addCamera ne les transmet pas à la caméra ajoutée
+            self.grabber = FrameGrabber(display_size=(self.label.width(), self.label.height()),
+                                        display_fps=self.display_fps, event_bus=self.eventBus,
+                                        **self.recognizer_options, **(source_options or {}))
+            self.grabber.signal.connect(self.updateFrame)
+        self.grabber.alertSignal.connect(self.showAlertMessage)
+        self.grabber.start()
 
     def load_data_from_db(self):
-        data = self.db_manager.recup()
-        if data:
-            self.populate_table(data)
-
-    def populate_table(self, data):
-        self.tableWidget.setRowCount(len(data))
-        for row_index, row_data in enumerate(data):
-            if len(row_data) == 3:
-                id, numbers, date_time = row_data
-                plate_text = numbers
-                # Affichage de plate_text dans le tableau
-                self.tableWidget.setItem(row_index, 0, QtWidgets.QTableWidgetItem(plate_text))
-                # Affichage de date_time dans le tableau
-                self.tableWidget.setItem(row_index, 1, QtWidgets.QTableWidgetItem(date_time))
-            else:
-                print(f"Unexpected data format in row {row_index}: {row_data}")
+        self.db_manager.flush()
+        self.plateModel.reload()
 
 
 
     def closeEvent(self, event):
-        # fermuture de la connexion de la bdd
+        # Vide les sinks du bus, puis fermuture de la connexion de la bdd
+        self.shutdown()
         self.db_manager.close_connection()
         event.accept()
 
+    def shutdown(self, timeout_ms=5000):
+        # Arrêt de la capture d'abord: les pistes encore ouvertes sont publiées sur le bus
+        self.grabber.stop()
+        self.grabber.wait(timeout_ms)
+        self.eventBus.close()
+        # Dernières décisions du sink 'db' (déjà en base) affichées avant de quitter
+        QtWidgets.QApplication.processEvents()
+
     def setupUi(self, MainWindow):
         MainWindow.setObjectName("MainWindow")
         MainWindow.resize(840, 480)
@@ -255,14 +492,27 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
         self.label = QtWidgets.QLabel(self.centralwidget)
         self.label.setGeometry(QtCore.QRect(0, 0, 640, 480))
         self.label.setObjectName("label")
-        
-        self.tableWidget = QtWidgets.QTableWidget(self.centralwidget)
-        self.tableWidget.setGeometry(QtCore.QRect(640, 0, 200, 450))
-        self.tableWidget.setObjectName("tableWidget")
-        self.tableWidget.setColumnCount(2)
-        self.tableWidget.setRowCount(15)
-        self.tableWidget.setHorizontalHeaderLabels(['plate', 'time'])
-        self.tableWidget.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+
+        # Grille des vues caméras (mode multi-caméras)
+        self.cameraGrid = QtWidgets.QWidget(self.centralwidget)
+        self.cameraGrid.setGeometry(QtCore.QRect(0, 0, 640, 480))
+        self.cameraGrid.setObjectName("cameraGrid")
+        self.cameraGridLayout = QtWidgets.QGridLayout(self.cameraGrid)
+        self.cameraGridLayout.setContentsMargins(0, 0, 0, 0)
+        self.cameraGridLayout.setSpacing(2)
+
+        # Bandeau de notifications non modal, au-dessus de la vidéo
+        self.notifications = NotificationBanner(self.centralwidget)
+        self.notifications.setGeometry(QtCore.QRect(0, 0, 640, 28))
+        
+        # Vue virtualisée: le modèle (PlateTableModel) est branché une fois la base ouverte;
+        # les modifications de la colonne 'plate' passent par setData
+        self.tableView = QtWidgets.QTableView(self.centralwidget)
+        self.tableView.setGeometry(QtCore.QRect(640, 0, 200, 450))
+        self.tableView.setObjectName("tableView")
+        self.tableView.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.tableView.verticalHeader().setDefaultSectionSize(22)
+        self.tableView.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
         
         self.addPlateButton = QtWidgets.QPushButton(self.centralwidget)
         self.addPlateButton.setGeometry(QtCore.QRect(640, 400, 200, 25))
@@ -295,9 +545,6 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
         #self.changeCameraButton.clicked.connect(self.changeToIPCamera)
         self.autoAdd.clicked.connect(self.toggleAutoAdd)
 
-        # Connect the itemChanged signal to a slot for handling changes
-        self.tableWidget.itemChanged.connect(self.handleItemChanged)
-
         self.retranslateUi(MainWindow)
         QtCore.QMetaObject.connectSlotsByName(MainWindow)
 
@@ -321,28 +568,23 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
     #         self.grabber.start()
 
     def showAlertMessage(self, message):
-        # Méthode pour afficher l'alerte dans votre interface utilisateur
-        QtWidgets.QMessageBox.warning(self, "Alert", message)
+        # Alerte non modale: bandeau au-dessus de la vidéo, sans bloquer le thread de l'interface
+        self.notifications.notify(message, 'error')
     
         
-    def handleItemChanged(self, item):
-        row = item.row()
-        column = item.column()
-        new_text = item.text()
-        
-        if column == 0:  # Only handle changes in the 'plate' column
-            # Update the database with the new plate text
-            old_plate_text = self.tableWidget.item(row, 0).text()
-            self.db_manager.update_plate(old_plate_text, new_text)
-            
+    def onWatchlistMatch(self, event, matches):
+        best = matches[0]
+        reason = f" ({best.label})" if best.label else ""
+        camera = f" caméra {event.camera_id}" if event.camera_id else ""
+        self.watchlistHit.emit(f"Liste de surveillance: {event.plate} ≈ {best.plate}{reason}{camera}")
+
+    def showWatchlistAlert(self, message):
+        self.notifications.notify(message, 'error')
 
     def removeSelectedPlate(self):
-        selected_row = self.tableWidget.currentRow()
+        selected_row = self.tableView.currentIndex().row()
         if selected_row >= 0:
-            plate_text_item = self.tableWidget.item(selected_row, 0)
-            plate_text = plate_text_item.text()
-            self.db_manager.delete_plate(plate_text)
-            self.tableWidget.removeRow(selected_row)
+            self.plateModel.remove_plate(self.plateModel.plate_at(selected_row))
 
         
     
@@ -406,81 +648,117 @@ class Ui_MainWindow(QtWidgets.QMainWindow):
         
         plate_text = f"{serial}{year}{wilaya}"
         
-        # Ajoutez la nouvelle plaque à la table et à la base de données
-        self.db_manager.insertion(plate_text)
+        # Ajoutez la nouvelle plaque à la table puis à la base de données (prepend d'abord: au-delà de
+        # max_recent il relit la base, qui ne doit pas déjà contenir cette ligne)
         current_time = QtCore.QDateTime.currentDateTime()
         time_str = current_time.toString(QtCore.Qt.DefaultLocaleLongDate)
-        
-        new_row = 0
-        if self.current_row >= self.tableWidget.rowCount():
-            self.tableWidget.removeRow(self.tableWidget.rowCount() - 1)
-            self.current_row -= 1
-        
-        for row in range(self.current_row, 0, -1):
-            for col in range(self.tableWidget.columnCount()):
-                item = self.tableWidget.item(row - 1, col)
-                if item:
-                    self.tableWidget.setItem(row, col, QtWidgets.QTableWidgetItem(item.text()))
-                else:
-                    self.tableWidget.setItem(row, col, QtWidgets.QTableWidgetItem(""))
-        
-        self.tableWidget.setItem(new_row, 0, QtWidgets.QTableWidgetItem(plate_text))
-        self.tableWidget.setItem(new_row, 1, QtWidgets.QTableWidgetItem(time_str))
-        
-        if self.current_row < self.tableWidget.rowCount() - 1:
-            self.current_row += 1
+        self.plateModel.prepend(plate_text, time_str)
+        self.db_manager.insertion(plate_text)
 
         QtWidgets.QMessageBox.information(self, "Success", "License plate added successfully.")
 
 
 
         
-    def check_plate_in_db(self, plate_text):
-        # Vérifie si la plaque spécifiée existe dans la base de données
-        data = self.db_manager.recup()
-        for row_data in data:
-            id, numbers, date_time = row_data
-            if numbers == plate_text:
-                return True
-        return False
-
-    @QtCore.pyqtSlot(QtGui.QImage, list)
-    def updateFrame(self, image, ocr_results):
-        self.label.setPixmap(QPixmap.fromImage(image))
-        # Update table with new OCR results
-        for plate_text in ocr_results:
-            if plate_text:
-                # verifier si la plaque est detecter dans la base de donnes 
-                if self.check_plate_in_db(plate_text):
-                    now = datetime.now()
-                    date_time = now.strftime("%Y-%m-%d %H:%M:%S")
-                    self.plateDetectedInDB.emit(plate_text, date_time)
-                elif self.autoAddEnabled:
-                    new_row = 0
-                    if self.current_row >= self.tableWidget.rowCount():
-                        self.tableWidget.removeRow(self.tableWidget.rowCount() - 1)
-                        self.current_row -= 1
-                    for row in range(self.current_row, 0, -1):
-                        for col in range(self.tableWidget.columnCount()):
-                            item = self.tableWidget.item(row - 1, col)
-                            if item:
-                                self.tableWidget.setItem(row, col, QtWidgets.QTableWidgetItem(item.text()))
-                            else:
-                                self.tableWidget.setItem(row, col, QtWidgets.QTableWidgetItem(""))
-                    self.tableWidget.setItem(new_row, 0, QtWidgets.QTableWidgetItem(plate_text))
-                    current_time = QtCore.QDateTime.currentDateTime()
-                    time_str = current_time.toString(QtCore.Qt.DefaultLocaleLongDate)
-                    self.tableWidget.setItem(new_row, 1, QtWidgets.QTableWidgetItem(time_str))
-                    if self.current_row < self.tableWidget.rowCount() - 1:
-                        self.current_row += 1
-                    self.db_manager.insertion(plate_text)
+    def addCameraView(self, camera_id):
+        label = QtWidgets.QLabel(self.cameraGrid)
+        label.setScaledContents(True)
+        label.setToolTip(camera_id)
+        self.cameraLabels[camera_id] = label
+        # Réorganise la grille: ceil(sqrt(n)) colonnes
+        columns = math.ceil(math.sqrt(len(self.cameraLabels)))
+        for index, view in enumerate(self.cameraLabels.values()):
+            self.cameraGridLayout.addWidget(view, index // columns, index % columns)
+
+    def removeCameraView(self, camera_id):
+        # Source retirée par le gestionnaire: la vue disparaît et l'identifiant peut être réutilisé
+        label = self.cameraLabels.pop(camera_id, None)
+        if label is None:
+            return
+        self.cameraGridLayout.removeWidget(label)
+        label.deleteLater()
+        columns = math.ceil(math.sqrt(len(self.cameraLabels))) if self.cameraLabels else 1
+        for index, view in enumerate(self.cameraLabels.values()):
+            self.cameraGridLayout.addWidget(view, index // columns, index % columns)
+
+    def addCamera(self, source):
+        if isinstance(self.grabber, MultiCameraGrabber):
+            if source.camera_id in self.cameraLabels:
+                self.showAlertMessage(f"Camera deja ajoutee: {source.camera_id}")
+                return
+            self.addCameraView(source.camera_id)
+            self.grabber.add_source(source)
+            return
+        # Mode caméra unique: la nouvelle caméra remplace l'actuelle
+        self.retireGrabber(self.grabber)
+        self.grabber = FrameGrabber(use_ip_camera=True, stream_url=source.url,
+                                    display_size=(self.label.width(), self.label.height()),
+                                    display_fps=self.display_fps, event_bus=self.eventBus,
+                                    **self.recognizer_options)
+        self.grabber.signal.connect(self.updateFrame)
+        self.grabber.alertSignal.connect(self.showAlertMessage)
+        self.grabber.start()
+
+    def retireGrabber(self, grabber, timeout_ms=2000):
+        # Plus aucune frame ni alerte de l'ancienne caméra; sa capture s'arrête même pendant une coupure
+        grabber.signal.disconnect()
+        grabber.alertSignal.disconnect()
+        grabber.stop()
+        if not grabber.wait(timeout_ms):
+            # Encore bloqué (chargement des modèles): un QThread détruit en cours d'exécution fait planter Qt
+            self.retiredGrabbers.append(grabber)
+            grabber.finished.connect(lambda: self.retiredGrabbers.remove(grabber))
+
+    def updateMetricsOverlay(self):
+        if registry.loading():
+            self.statusbar.showMessage("Chargement des modèles...")
+        elif self.show_metrics:
+            self.statusbar.showMessage(metrics.summary_line())
+        else:
+            self.statusbar.clearMessage()
+
+    @QtCore.pyqtSlot(QtGui.QImage)
+    def updateFrame(self, image):
+        with metrics.timer('gui_update'):
+            self.showFrame(self.label, image, self.grabber.renderer)
+
+    @QtCore.pyqtSlot(str, QtGui.QImage)
+    def updateCameraFrame(self, camera_id, image):
+        with metrics.timer('gui_update'):
+            label = self.cameraLabels.get(camera_id)
+            if label is not None:
+                self.showFrame(label, image, self.grabber.renderer_for(camera_id))
+
+    def showFrame(self, label, image, renderer):
+        # L'image est déjà à la taille du label: simple échange de pixmap, puis le tampon est rendu
+        label.setPixmap(QPixmap.fromImage(image))
+        renderer.release(image)
+        if image.width() != label.width() or image.height() != label.height():
+            renderer.set_target_size(label.width(), label.height())
+
+    @QtCore.pyqtSlot(list)
+    def handlePlates(self):
+        # Décisions du sink 'db' (passages déjà dédupliqués par le bus et, si ajoutés, déjà en base)
+        while True:
+            try:
+                event, known = self.plateDisplay.get(timeout=0)
+            except queue.Empty:
+                return
+            plate_text = event.plate
+            if known:
+                date_time = datetime.fromtimestamp(event.timestamp_ms / 1000.0).strftime("%Y-%m-%d %H:%M:%S")
+                self.plateDetectedInDB.emit(plate_text, date_time)
+            else:
+                current_time = QtCore.QDateTime.fromMSecsSinceEpoch(event.timestamp_ms)
+                time_str = current_time.toString(QtCore.Qt.DefaultLocaleLongDate)
+                self.plateModel.prepend(plate_text, time_str)
 
 
     def handle_plate_detected_in_db(self, plate_text, date_time):
             
         # voire si la plaque est détectée dans la base de données
-        QtWidgets.QMessageBox.warning(self, "Plaque déjà enregistrée",
-            f"La plaque d'immatriculation {plate_text} a été détectée précédemment à la date {date_time}.")
+        self.notifications.notify(
+            f"Plaque déjà enregistrée: {plate_text} détectée précédemment à la date {date_time}.", 'warning')
    
     def retranslateUi(self, MainWindow):
         _translate = QtCore.QCoreApplication.translate
@@ -527,11 +805,8 @@ class IPConfigDialog(QtWidgets.QDialog):
         port_number = self.portLineEdit.text()
         stream_url = f"http://{ip_address}:{port_number}{self.streamLineEdit.text()}"
         
-        # Instancier FrameGrabber avec la caméra IP configurée
-        self.parent().frame_grabber = FrameGrabber(use_ip_camera=True, ip_address=ip_address, port_number=port_number, stream_url=stream_url)
-        
-        # Connecter le signal d'alerte à une méthode dans l'interface utilisateur principale
-        self.parent().frame_grabber.alertSignal.connect(self.parent().showAlertMessage)
+        # Ajoute la caméra IP configurée (grille en multi-caméras, sinon remplace la caméra actuelle)
+        self.parent().addCamera(CameraSource(f"{ip_address}:{port_number}", 'stream', stream_url))
 
         # Fermer la boîte de dialogue
         self.accept()
@@ -541,8 +816,80 @@ class IPConfigDialog(QtWidgets.QDialog):
         
 if __name__ == "__main__":
     import sys
+    import argparse
     app = QtWidgets.QApplication(sys.argv)
+    # --camera voie1=libcamera --camera voie2=rtsp://... : une vue par caméra, modèles partagés
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--camera', action='append', default=[])
+    # --backend onnx --model best.int8.onnx --threads 4: détecteur onnxruntime (quantifié) au lieu de PyTorch
+    parser.add_argument('--backend', choices=('ultralytics', 'onnx'), default='ultralytics')
+    parser.add_argument('--model', default='best.pt')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--threads', type=int)
+    # --fast-ocr [--digit-templates digits.npz]: lecteur de chiffres rapide, EasyOCR en secours
+    parser.add_argument('--fast-ocr', action='store_true')
+    parser.add_argument('--digit-templates')
+    # --plate-format dz,fr (ou nom=GABARIT, D chiffre / L lettre / A les deux): formats compilés au démarrage
+    parser.add_argument('--plate-format', default='dz')
+    # Une plaque revue dans cette fenêtre (secondes) n'est ni réécrite ni réalertée
+    parser.add_argument('--dedup-seconds', type=float, default=30.0)
+    # Plafond d'affichage (images/s), par défaut la fréquence de rafraîchissement de l'écran
+    parser.add_argument('--display-fps', type=float)
+    # --event-sink jsonl:passages.jsonl --event-sink http://127.0.0.1:8080/plates --event-sink tcp:barriere:9000
+    # (ou sqlite:passages.db): chaque passage publié sur le bus est aussi envoyé à ces sinks
+    parser.add_argument('--event-sink', action='append', default=[])
+    # --record rue: enregistre le flux brut (rue.mjpeg + rue.idx); --replay rue: le rejoue à la place de la
+    # caméra, --replay-speed 1 temps réel, 4 accéléré, 0 sans attente (aucune frame jetée)
+    parser.add_argument('--record')
+    parser.add_argument('--replay')
+    parser.add_argument('--replay-speed', type=float, default=1.0)
+    parser.add_argument('--replay-loop', action='store_true')
+    # --watchlist surveillance.txt ("plaque[,motif]" par ligne): alerte sur les plaques proches
+    parser.add_argument('--watchlist')
+    parser.add_argument('--watchlist-distance', type=int, default=2)
+    # --latency-budget-ms 300: qualité adaptée (taille YOLO, pas de détection, plaques lues, prétraitement)
+    # pour tenir le budget; chaque changement de niveau est ajouté à --quality-log (JSONL)
+    parser.add_argument('--latency-budget-ms', type=float)
+    parser.add_argument('--quality-log', default='quality_audit.jsonl')
+    # --show-metrics: p50 par étape et débit dans la barre d'état. Les métriques sont toujours collectées
+    # (compteurs de pertes et d'erreurs compris); seuls l'affichage et l'export (ANPR_METRICS_PORT) sont optionnels
+    parser.add_argument('--show-metrics', action='store_true')
+    args, _ = parser.parse_known_args(sys.argv[1:])
+    set_plate_formats(args.plate_format)
+    registry.configure(model_path=args.model, backend=args.backend, input_size=args.imgsz, threads=args.threads)
     MainWindow = QtWidgets.QMainWindow()
-    ui = Ui_MainWindow(MainWindow)
+    recognizer_options = {}
+    if args.fast_ocr:
+        recognizer_options['fast_reader'] = load_digit_reader(args.digit_templates)
+    # Caméra unique de départ seulement (en multi-caméras: --camera voie=replay:rue)
+    source_options = {}
+    if args.record and not args.camera:
+        source_options['record'] = args.record
+    if args.replay and not args.camera:
+        source_options.update(replay=args.replay, replay_speed=args.replay_speed, replay_loop=args.replay_loop)
+        if args.replay_speed == 0:
+            # Relecture déterministe: aucune frame jetée, et un seul worker OCR pour garder l'ordre des lectures
+            source_options.update(drop_policy=DROP_BLOCK, ocr_workers=1)
+    if args.latency_budget_ms:
+        recognizer_options['controller'] = QualityController(args.latency_budget_ms, audit_path=args.quality_log)
+    ui = Ui_MainWindow(MainWindow, show_metrics=args.show_metrics, cameras=[CameraSource.parse(spec) for spec in args.camera],
+                       recognizer_options=recognizer_options, source_options=source_options,
+                       dedup_seconds=args.dedup_seconds,
+                       display_fps=args.display_fps, event_sinks=[parse_sink(spec) for spec in args.event_sink],
+                       watchlist=Watchlist.load(args.watchlist, max_distance=args.watchlist_distance)
+                       if args.watchlist else None)
+    # Vide la file d'écriture avant de quitter
+    app.aboutToQuit.connect(ui.shutdown)
+    app.aboutToQuit.connect(ui.db_manager.close_connection)
+    # ANPR_METRICS_PORT=9109: métriques Prometheus sur http://127.0.0.1:9109/metrics
+    if os.environ.get('ANPR_METRICS_PORT'):
+        metrics_server = MetricsServer(metrics, int(os.environ['ANPR_METRICS_PORT']))
+        metrics_server.start()
+    # ANPR_PROFILE=profile: échantillonnage des piles, un fichier profile_<étape>.txt par étape à la sortie
+    if os.environ.get('ANPR_PROFILE'):
+        profiler = SamplingProfiler()
+        profiler.start()
+        app.aboutToQuit.connect(profiler.stop)
+        app.aboutToQuit.connect(lambda: profiler.dump(os.environ['ANPR_PROFILE']))
     MainWindow.show()
     sys.exit(app.exec_())
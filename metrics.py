@@ -0,0 +1,249 @@
+"""Instrumentation legere: chronometres, compteurs et jauges par etape.
+
+Un registre global ``metrics`` est partage par la capture, la detection, l'OCR,
+la base de donnees et l'interface. Les durees sont gardees dans des
+histogrammes glissants (les N dernieres valeurs) pour les percentiles, plus un
+total cumule pour Prometheus. Le cout d'une mesure est de l'ordre de la
+microseconde, on peut donc la laisser active en production.
+
+    with metrics.timer('detect'):
+        ...
+    metrics.inc('frames_captured')
+
+``MetricsServer`` expose les memes donnees au format texte Prometheus sur
+http://127.0.0.1:<port>/metrics; ``SamplingProfiler`` echantillonne les piles
+des threads (un fichier par etape, format "collapsed" pour flamegraph).
+"""
+import collections
+import http.server
+import re
+import sys
+import threading
+import time
+
+
+class Histogram:
+    def __init__(self, window=512):
+        self.values = collections.deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.last_time = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            self.values.append(value)
+            self.count += 1
+            self.total += value
+            self.last_time = time.monotonic()
+
+    def snapshot(self):
+        with self.lock:
+            values = sorted(self.values)
+            count, total = self.count, self.total
+        if not values:
+            return {'count': count, 'sum': total, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+        last = len(values) - 1
+        return {
+            'count': count,
+            'sum': total,
+            'p50': values[int(last * 0.50)],
+            'p95': values[int(last * 0.95)],
+            'p99': values[int(last * 0.99)],
+            'max': values[-1],
+        }
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    def __init__(self, window=512):
+        self.window = window
+        self.enabled = True
+        self.histograms = {}
+        self.counters = collections.Counter()
+        self.gauges = {}
+        self._rates = {}
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram(self.window))
+        return histogram
+
+    def timer(self, name):
+        # Désactivé: contexte vide, ni horloge ni histogramme
+        return _Timer(self.histogram(name)) if self.enabled else _NULL_TIMER
+
+    def observe(self, name, seconds):
+        if self.enabled:
+            self.histogram(name).observe(seconds)
+
+    def inc(self, name, value=1):
+        if self.enabled:
+            # += sur un Counter n'est pas atomique (lecture puis écriture) entre threads
+            with self._lock:
+                self.counters[name] += value
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def _counters(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def rate(self, name):
+        """Nombre d'evenements par seconde du compteur depuis le dernier appel."""
+        now = time.monotonic()
+        value = self.counters.get(name, 0)
+        last_value, last_time = self._rates.get(name, (0, self.started))
+        self._rates[name] = (value, now)
+        return (value - last_value) / (now - last_time) if now > last_time else 0.0
+
+    def snapshot(self):
+        return {
+            'timers': {name: h.snapshot() for name, h in list(self.histograms.items())},
+            'counters': self._counters(),
+            'gauges': dict(self.gauges),
+        }
+
+    def summary_line(self, names=('capture', 'decode', 'detect', 'ocr', 'db_insert', 'gui_update')):
+        # Ligne courte pour la barre d'etat: p50 de chaque etape en ms + debit de capture
+        parts = [f"{self.rate('frames_captured'):.0f} fps"]
+        for name in names:
+            histogram = self.histograms.get(name)
+            if histogram is not None and histogram.count:
+                parts.append(f"{name} {histogram.snapshot()['p50'] * 1e3:.1f} ms")
+        return " | ".join(parts)
+
+    def prometheus_text(self, prefix='anpr'):
+        lines = []
+        for name, stats in sorted(self.snapshot()['timers'].items()):
+            metric = f"{prefix}_{_metric_name(name)}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for quantile in ('p50', 'p95', 'p99'):
+                lines.append(f'{metric}{{quantile="0.{quantile[1:]}"}} {stats[quantile]:.6f}')
+            lines.append(f"{metric}_sum {stats['sum']:.6f}")
+            lines.append(f"{metric}_count {stats['count']}")
+        for name, value in sorted(self._counters().items()):
+            metric = f"{prefix}_{_metric_name(name)}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for name, value in sorted(self.gauges.items()):
+            metric = f"{prefix}_{_metric_name(name)}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+class MetricsServer(threading.Thread):
+    """Serveur HTTP local (thread daemon) qui sert ``/metrics`` au format Prometheus."""
+
+    def __init__(self, registry, port=9109, host='127.0.0.1'):
+        super().__init__(name='metrics-server', daemon=True)
+        registry_ref = registry
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry_ref.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.port = self.httpd.server_address[1]
+
+    def run(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class SamplingProfiler(threading.Thread):
+    """Profileur par echantillonnage (opt-in), regroupe par etape (nom du thread).
+
+    Toutes les ``interval`` secondes, la pile de chaque thread est relevee;
+    ``dump`` ecrit un fichier par etape au format "collapsed" (pile;pile;... N).
+    """
+
+    def __init__(self, interval=0.005):
+        super().__init__(name='sampling-profiler', daemon=True)
+        self.interval = interval
+        self.samples = collections.defaultdict(collections.Counter)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                # 'ocr-0', 'ocr-1' -> 'ocr'
+                stage = re.sub(r'-\d+$', '', names.get(ident, str(ident)))
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[stage][";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+
+    def dump(self, prefix='profile'):
+        paths = []
+        for stage, stacks in self.samples.items():
+            path = f"{prefix}_{_metric_name(stage)}.txt"
+            with open(path, 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            paths.append(path)
+        return paths
+
+
+# Registre global partage par tous les modules
+metrics = Metrics()
@@ -0,0 +1,176 @@
+"""Demultiplexeur MJPEG sans copie pour le flux stdout de libcamera-vid.
+
+Les octets sont lus par ``readinto`` dans un tampon preallouable reutilise; les
+marqueurs SOI/EOI sont cherches de facon incrementale (jamais deux fois sur les
+memes octets). Chaque frame est rendue sous forme de ``memoryview`` sur le
+tampon: elle n'est valide que jusqu'a la demande de la frame suivante. Un
+appelant qui garde la frame plus longtemps (``LibcameraSession``, dont les
+frames changent de thread) la copie une fois; le decoupage lui-meme n'alloue
+rien, contrairement a l'ancienne boucle qui recopiait le tampon a chaque bloc.
+"""
+import cv2
+import numpy as np
+
+SOI = b'\xff\xd8'
+EOI = b'\xff\xd9'
+
+
+class MJPEGParser:
+    def __init__(self, stream, chunk_size=65536, capacity=1 << 22, max_capacity=1 << 25):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        # Plafond du tampon: une frame sans EOI (flux corrompu) est abandonnée au lieu de tout accumuler
+        self.max_capacity = max_capacity
+        self.buffer = bytearray(max(capacity, 2 * chunk_size))
+        self.view = memoryview(self.buffer)
+        # Lecture sans attendre que le bloc soit plein quand le flux le permet
+        self._readinto = getattr(stream, 'readinto1', None) or stream.readinto
+        self.start = 0      # debut des octets non consommes
+        self.end = 0        # fin des octets valides
+        self.scan = 0       # reprise de la recherche de marqueur
+        self.soi = -1       # position du SOI de la frame en cours
+        self.frames_parsed = 0
+        self.bytes_read = 0
+        self.garbage_bytes = 0
+
+    def _make_room(self):
+        if self.end + self.chunk_size <= len(self.buffer):
+            return
+        if self.start > 0:
+            # Compactage: on ramene les octets non consommes au debut du tampon
+            size = self.end - self.start
+            self.view[0:size] = self.view[self.start:self.end]
+            self.scan -= self.start
+            if self.soi >= 0:
+                self.soi -= self.start
+            self.start, self.end = 0, size
+        if self.end + self.chunk_size > len(self.buffer) and 2 * len(self.buffer) > self.max_capacity:
+            self.garbage_bytes += self.end
+            self.start = self.end = self.scan = 0
+            self.soi = -1
+        if self.end + self.chunk_size > len(self.buffer):
+            # Frame plus grande que le tampon: nouveau tampon (les vues deja rendues restent valides)
+            buffer = bytearray(2 * len(self.buffer))
+            buffer[:self.end] = self.view[:self.end]
+            self.buffer = buffer
+            self.view = memoryview(buffer)
+
+    def _fill(self):
+        self._make_room()
+        n = self._readinto(self.view[self.end:self.end + self.chunk_size])
+        if not n:
+            return False
+        self.end += n
+        self.bytes_read += n
+        return True
+
+    def next_frame(self):
+        """Renvoie la prochaine frame JPEG (memoryview) ou None en fin de flux."""
+        while True:
+            if self.soi < 0:
+                soi = self.buffer.find(SOI, self.scan, self.end)
+                if soi < 0:
+                    # Octets parasites (ou EOI sans SOI): on les jette, sauf un 0xFF final possible
+                    keep = 1 if self.end > self.start and self.buffer[self.end - 1] == 0xFF else 0
+                    self.garbage_bytes += self.end - keep - self.start
+                    self.start = self.scan = self.end - keep
+                else:
+                    self.garbage_bytes += soi - self.start
+                    self.start = self.soi = soi
+                    self.scan = soi + 2
+                    continue
+            else:
+                eoi = self.buffer.find(EOI, self.scan, self.end)
+                limit = eoi if eoi >= 0 else self.end
+                restart = self.buffer.find(SOI, self.scan, limit)
+                if restart >= 0:
+                    # Frame tronquee: un nouveau SOI arrive avant l'EOI
+                    self.garbage_bytes += restart - self.soi
+                    self.start = self.soi = restart
+                    self.scan = restart + 2
+                    continue
+                if eoi >= 0:
+                    frame = self.view[self.soi:eoi + 2]
+                    self.start = self.scan = eoi + 2
+                    self.soi = -1
+                    self.frames_parsed += 1
+                    return frame
+                # Le marqueur peut etre coupe entre deux lectures: on garde le dernier octet
+                self.scan = max(self.scan, self.end - 1)
+            if not self._fill():
+                return None
+
+    def __iter__(self):
+        while True:
+            frame = self.next_frame()
+            if frame is None:
+                return
+            yield frame
+
+
+# Mode de decodage -> (drapeau OpenCV, facteur de reduction). 'full' est le mode par defaut partout;
+# les modes reduits sont a choisir explicitement (voir JpegFrame et bench_decode.py).
+DECODE_MODES = {
+    'full': (cv2.IMREAD_COLOR, 1),
+    'reduced2': (cv2.IMREAD_REDUCED_COLOR_2, 2),
+    'reduced4': (cv2.IMREAD_REDUCED_COLOR_4, 4),
+    'reduced8': (cv2.IMREAD_REDUCED_COLOR_8, 8),
+}
+
+
+def decode_jpeg(data, flags=cv2.IMREAD_COLOR):
+    # np.frombuffer sur la memoryview: aucune copie avant imdecode
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+
+
+class JpegFrame:
+    """Frame decodee en resolution reduite pour la detection.
+
+    ``image`` sert a YOLO et a l'affichage; la pleine resolution n'est decodee
+    (une seule fois) que si une plaque doit etre lue, via ``crop``.
+
+    Le gain n'existe que si peu de frames ont une plaque a lire (suivi actif) et
+    que le flux est grand. Mesures bench_decode.py (flux synthetique), ms par frame
+    full / reduced2: 640x480 1.63 / 1.21 sans plaque, 1.65 / 1.66 avec une plaque
+    sur 5; 1920x1080 8.9 / 5.9 sans plaque, 8.7 / 8.4 avec une sur 5, 9.5 / 17.3
+    avec une plaque a chaque frame (double decodage).
+    """
+
+    def __init__(self, data, mode):
+        flags, self.scale = DECODE_MODES[mode]
+        # Copie des octets compresses si data est une vue du parseur (invalidee a la frame suivante);
+        # sans effet sur les bytes deja copies par LibcameraSession
+        self.data = bytes(data)
+        self.image = decode_jpeg(self.data, flags)
+        self._full = None
+
+    def full_resolution(self):
+        if self._full is None:
+            self._full = decode_jpeg(self.data, cv2.IMREAD_COLOR)
+        return self._full
+
+    def crop(self, xmin, ymin, xmax, ymax):
+        # Boite en coordonnees de l'image reduite -> crop en pleine resolution
+        if self.scale == 1:
+            return self.image[ymin:ymax, xmin:xmax]
+        full = self.full_resolution()
+        h, w = full.shape[:2]
+        s = self.scale
+        return full[max(0, ymin * s):min(h, ymax * s), max(0, xmin * s):min(w, xmax * s)]
+
+
+def frame_image(frame):
+    """Image a detecter/afficher pour une frame (ndarray ou JpegFrame)."""
+    return frame.image if isinstance(frame, JpegFrame) else frame
+
+
+def frame_scale(frame):
+    """Facteur entre l'image de detection et la pleine resolution (1 pour un ndarray)."""
+    return frame.scale if isinstance(frame, JpegFrame) else 1
+
+
+def crop_region(frame, xmin, ymin, xmax, ymax):
+    """Crop de plaque a la meilleure resolution disponible."""
+    if isinstance(frame, JpegFrame):
+        return frame.crop(xmin, ymin, xmax, ymax)
+    return frame[ymin:ymax, xmin:xmax]
@@ -0,0 +1,92 @@
+"""Registre des modeles (detecteur + EasyOCR) charges une seule fois par processus.
+
+Le chargement se fait a la demande, sur un thread d'arriere-plan: la fenetre
+s'affiche tout de suite et le flux brut peut deja defiler pendant que les
+poids se chargent. Tous les grabbers (et le service multi-cameras) partagent
+la meme instance.
+
+    registry.load_async()            # demarre le chargement, ne bloque pas
+    model, reader = registry.get()   # attend la fin du chargement
+
+Le detecteur est le backend choisi par ``configure(backend=...)``: 'ultralytics'
+(best.pt, PyTorch) ou 'onnx' (best.onnx / best.int8.onnx sur onnxruntime).
+"""
+import threading
+import time
+
+from metrics import metrics
+
+
+class ModelRegistry:
+    def __init__(self, model_path='best.pt', languages=('en',), gpu=False, backend='ultralytics',
+                 input_size=640, threads=None):
+        self.model_path = model_path
+        self.languages = list(languages)
+        self.gpu = gpu
+        self.backend = backend
+        self.input_size = input_size
+        self.threads = threads
+        self.load_time = None
+        self._models = None
+        self._error = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+
+    def configure(self, model_path=None, languages=None, gpu=None, backend=None, input_size=None, threads=None):
+        # A appeler avant le premier chargement
+        with self._lock:
+            if self._thread is not None:
+                raise RuntimeError("Les modeles sont deja en cours de chargement")
+            if model_path is not None:
+                self.model_path = model_path
+            if languages is not None:
+                self.languages = list(languages)
+            if gpu is not None:
+                self.gpu = gpu
+            if backend is not None:
+                self.backend = backend
+            if input_size is not None:
+                self.input_size = input_size
+            if threads is not None:
+                self.threads = threads
+
+    def load_async(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, name='model-loader', daemon=True)
+                self._thread.start()
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            # Imports lourds (torch) differes jusqu'ici
+            import easyocr
+            from detectors import load_detector
+            with metrics.timer('model_load'):
+                detector = load_detector(self.backend, self.model_path, self.input_size, self.threads)
+                self._models = (detector, easyocr.Reader(self.languages, gpu=self.gpu))
+        except Exception as e:
+            self._error = e
+            print(f"Erreur lors du chargement des modeles: {e}")
+        self.load_time = time.perf_counter() - start
+        self._loaded.set()
+
+    def ready(self):
+        return self._loaded.is_set() and self._error is None
+
+    def loading(self):
+        return self._thread is not None and not self._loaded.is_set()
+
+    def get(self, timeout=None):
+        """Renvoie ``(model, reader)``; lance le chargement si besoin et attend sa fin."""
+        self.load_async()
+        if not self._loaded.wait(timeout):
+            raise TimeoutError("Les modeles ne sont pas encore charges")
+        if self._error is not None:
+            raise RuntimeError(f"Echec du chargement des modeles: {self._error}")
+        return self._models
+
+
+# Registre global partage par tous les grabbers du processus
+registry = ModelRegistry()
@@ -0,0 +1,81 @@
+"""Porte de mouvement devant la detection YOLO.
+
+Une difference avec un fond moyen, calculee sur une petite image en niveaux de
+gris, decide si la frame merite une detection. Tant qu'il y a du mouvement
+dans la ROI, chaque frame est detectee; au repos, seule une frame sur
+``idle_stride`` l'est (pour les vehicules arretes).
+"""
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    def __init__(self, roi=None, width=160, pixel_threshold=25, min_changed=0.005,
+                 learning_rate=0.05, idle_stride=15, active_hold=30):
+        # roi: (x0, y0, x1, y1) en fractions de l'image, None pour toute l'image
+        self.roi = roi
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.learning_rate = learning_rate
+        self.idle_stride = idle_stride
+        self.active_hold = active_hold
+        self.background = None
+        self.hold = 0
+        self.idle_count = 0
+        self.frames = 0
+        self.detections = 0
+        self.last_changed = 0.0
+
+    @property
+    def active(self):
+        return self.hold > 0
+
+    def _small_gray(self, frame):
+        h, w = frame.shape[:2]
+        height = max(1, int(h * self.width / float(w)))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            small = small[int(y0 * height):int(y1 * height), int(x0 * self.width):int(x1 * self.width)]
+        return small
+
+    def motion_ratio(self, frame):
+        """Fraction des pixels de la ROI qui ont change par rapport au fond."""
+        small = self._small_gray(frame)
+        if self.background is None or self.background.shape != small.shape:
+            self.background = small.astype(np.float32)
+            return 1.0
+        diff = cv2.absdiff(small, cv2.convertScaleAbs(self.background))
+        changed = float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+        cv2.accumulateWeighted(small, self.background, self.learning_rate)
+        return changed
+
+    def should_detect(self, frame):
+        self.frames += 1
+        self.last_changed = self.motion_ratio(frame)
+        if self.last_changed >= self.min_changed:
+            self.hold = self.active_hold
+        elif self.hold > 0:
+            self.hold -= 1
+
+        if self.active:
+            detect = True
+        else:
+            self.idle_count += 1
+            detect = self.idle_count >= self.idle_stride
+        if detect:
+            self.idle_count = 0
+            self.detections += 1
+        return detect
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'detections': self.detections,
+            'active': self.active,
+            'motion_ratio': self.last_changed,
+        }
@@ -0,0 +1,46 @@
+"""Bandeau de notifications non modal (remplace les QMessageBox des alertes).
+
+Les messages passent par une file bornee et s'affichent l'un apres l'autre
+au-dessus de la video, sans bloquer le thread de l'interface. Quand la file
+s'allonge, chaque message reste affiche moins longtemps; au-dela de
+``max_pending`` les plus anciens sont abandonnes.
+"""
+import collections
+
+from PyQt5 import QtCore, QtWidgets
+
+STYLES = {
+    'info': "background-color: rgba(30, 30, 30, 200); color: white; padding: 4px;",
+    'warning': "background-color: rgba(200, 120, 0, 220); color: white; padding: 4px;",
+    'error': "background-color: rgba(180, 30, 30, 220); color: white; padding: 4px;",
+}
+
+
+class NotificationBanner(QtWidgets.QLabel):
+    def __init__(self, parent=None, duration_ms=3000, max_pending=50):
+        super().__init__(parent)
+        self.duration_ms = duration_ms
+        self.pending = collections.deque(maxlen=max_pending)
+        self.setWordWrap(True)
+        self.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
+        self.hide()
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._show_next)
+
+    def notify(self, message, level='info'):
+        self.pending.append((message, level))
+        if not self._timer.isActive():
+            self._show_next()
+
+    def _show_next(self):
+        if not self.pending:
+            self.hide()
+            return
+        message, level = self.pending.popleft()
+        waiting = len(self.pending)
+        self.setText(f"{message}  (+{waiting})" if waiting else message)
+        self.setStyleSheet(STYLES.get(level, STYLES['info']))
+        self.show()
+        self.raise_()
+        self._timer.start(max(500, self.duration_ms // (1 + waiting)))
@@ -0,0 +1,290 @@
+"""Pipeline multi-etapes: capture -> detection -> OCR (pool) -> rendu.
+
+Les etapes tournent dans leurs propres threads et communiquent par des files
+bornees. Avec la politique 'latest', une etape lente fait tomber les frames
+les plus anciennes au lieu d'accumuler de la latence; avec 'block', le
+producteur attend que la file se libere.
+"""
+import collections
+import queue
+import threading
+import time
+
+DROP_LATEST = 'latest'
+DROP_BLOCK = 'block'
+
+
+class BoundedQueue:
+    def __init__(self, maxsize=2, drop_policy=DROP_LATEST, on_drop=None):
+        if drop_policy not in (DROP_LATEST, DROP_BLOCK):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.maxsize = maxsize
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        # on_drop(item): appelé hors verrou pour chaque élément jeté par la politique 'latest'
+        self.on_drop = on_drop
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item):
+        dropped = None
+        with self._cond:
+            if self.drop_policy == DROP_BLOCK:
+                while len(self._items) >= self.maxsize and not self._closed:
+                    self._cond.wait()
+            elif len(self._items) >= self.maxsize:
+                # Garde la frame la plus recente, jette la plus ancienne
+                dropped = self._items.popleft()
+                self.dropped += 1
+            if not self._closed:
+                self._items.append(item)
+                self._cond.notify_all()
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                raise queue.Empty
+            if not self._items:
+                raise queue.Empty
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def get_batch(self, max_items, window, timeout=None):
+        # Attend un premier element puis regroupe jusqu'a max_items ou pendant window secondes
+        batch = [self.get(timeout)]
+        deadline = time.monotonic() + window
+        while len(batch) < max_items:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 and not self.qsize():
+                break
+            try:
+                batch.append(self.get(max(remaining, 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+class StageStats:
+    def __init__(self, name, window=100):
+        self.name = name
+        self.processed = 0
+        self.errors = 0
+        self._latencies = collections.deque(maxlen=window)
+        self._timestamps = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency, count=1):
+        with self._lock:
+            self.processed += count
+            self._latencies.append(latency)
+            self._timestamps.append(time.monotonic())
+
+    def snapshot(self):
+        with self._lock:
+            latencies = list(self._latencies)
+            timestamps = list(self._timestamps)
+            processed = self.processed
+        fps = 0.0
+        if len(timestamps) > 1 and timestamps[-1] > timestamps[0]:
+            fps = (len(timestamps) - 1) / (timestamps[-1] - timestamps[0])
+        avg = sum(latencies) / len(latencies) if latencies else 0.0
+        return {
+            'processed': processed,
+            'errors': self.errors,
+            'fps': fps,
+            'avg_latency_ms': avg * 1000.0,
+            'max_latency_ms': max(latencies) * 1000.0 if latencies else 0.0,
+        }
+
+
+class FramePacket:
+    __slots__ = ('seq', 'frame', 'timestamp', 'boxes', 'tracks', 'plates', 'scores')
+
+    def __init__(self, seq, frame, timestamp):
+        self.seq = seq
+        self.frame = frame
+        self.timestamp = timestamp
+        self.boxes = []
+        self.tracks = []
+        self.plates = []
+        self.scores = []
+
+
+class Stage(threading.Thread):
+    """Thread d'etape. Avec ``batch_size`` > 1, ``func`` recoit et renvoie une liste de paquets."""
+
+    def __init__(self, name, func, inbox, outbox, stats, on_error=None, batch_size=1, batch_window=0.0,
+                 on_drop=None):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stats = stats
+        self.on_error = on_error
+        # on_drop(packet): paquets perdus sur une erreur de func
+        self.on_drop = on_drop
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+
+    def run(self):
+        while True:
+            try:
+                if self.batch_size > 1:
+                    packet = self.inbox.get_batch(self.batch_size, self.batch_window, timeout=0.5)
+                else:
+                    packet = self.inbox.get(timeout=0.5)
+            except queue.Empty:
+                if self.inbox.closed:
+                    break
+                continue
+            start = time.perf_counter()
+            try:
+                result = self.func(packet)
+            except Exception as e:
+                self.stats.errors += 1
+                if self.on_error:
+                    self.on_error(e)
+                if self.on_drop:
+                    for item in (packet if self.batch_size > 1 else [packet]):
+                        self.on_drop(item)
+                continue
+            self.stats.record(time.perf_counter() - start, len(packet) if self.batch_size > 1 else 1)
+            if self.outbox is None or result is None:
+                continue
+            if self.batch_size > 1:
+                for item in result:
+                    self.outbox.put(item)
+            else:
+                self.outbox.put(result)
+
+
+class Pipeline:
+    """Relie une source de frames a trois fonctions d'etape.
+
+    ``detect``, ``recognize`` et ``render`` recoivent un FramePacket et le
+    renvoient (ou None pour l'abandonner). ``recognize`` tourne sur
+    ``ocr_workers`` threads en parallele; avec ``ocr_batch_size`` > 1 il recoit
+    une liste de paquets regroupes sur ``ocr_batch_window_ms``. Un
+    ``controller`` (quality.QualityController) recoit la latence de bout en
+    bout et la profondeur des files de chaque frame rendue. ``on_ocr_drop(packet)``
+    est appele pour chaque paquet detecte qui n'atteint pas ``recognize`` (file
+    OCR pleine) ou dont ``recognize`` echoue.
+    """
+
+    def __init__(self, source, detect, recognize, render, ocr_workers=2, queue_size=2,
+                 drop_policy=DROP_LATEST, on_error=None, ocr_batch_size=1, ocr_batch_window_ms=0, controller=None,
+                 on_ocr_drop=None):
+        self.source = source
+        self.on_error = on_error
+        self.controller = controller
+        self.detect_queue = BoundedQueue(queue_size, drop_policy)
+        self.ocr_queue = BoundedQueue(max(queue_size, ocr_batch_size), drop_policy, on_ocr_drop)
+        self.render_queue = BoundedQueue(max(queue_size, ocr_batch_size), drop_policy)
+        self.stage_stats = {name: StageStats(name) for name in ('capture', 'detect', 'ocr', 'render')}
+        self.e2e_stats = StageStats('end_to_end')
+        self._last_rendered = -1
+        self._render_lock = threading.Lock()
+        self._render = render
+        self._stop = threading.Event()
+
+        self._capture_thread = threading.Thread(target=self._capture_loop, name='capture', daemon=True)
+        self.stages = [Stage('detect', detect, self.detect_queue, self.ocr_queue,
+                             self.stage_stats['detect'], on_error)]
+        for i in range(ocr_workers):
+            self.stages.append(Stage(f'ocr-{i}', recognize, self.ocr_queue, self.render_queue,
+                                     self.stage_stats['ocr'], on_error, batch_size=ocr_batch_size,
+                                     batch_window=ocr_batch_window_ms / 1000.0, on_drop=on_ocr_drop))
+        self.stages.append(Stage('render', self._render_packet, self.render_queue, None,
+                                 self.stage_stats['render'], on_error))
+
+    def _capture_loop(self):
+        seq = 0
+        last = time.perf_counter()
+        try:
+            for frame in self.source:
+                if self._stop.is_set():
+                    break
+                now = time.perf_counter()
+                self.stage_stats['capture'].record(now - last)
+                last = now
+                self.detect_queue.put(FramePacket(seq, frame, time.monotonic()))
+                seq += 1
+        except Exception as e:
+            if self.on_error:
+                self.on_error(e)
+        finally:
+            # Générateur de capture: libère la caméra (et son processus) dès l'arrêt
+            close = getattr(self.source, 'close', None)
+            if close is not None:
+                close()
+            if self._stop.is_set():
+                self.stop()
+            else:
+                self._drain()
+
+    def _drain(self):
+        # Fin de la source: les frames en cours traversent toutes les étapes (relecture déterministe);
+        # chaque file n'est fermée qu'une fois les étapes qui l'alimentent terminées
+        self.detect_queue.close()
+        for stages, outbox in ((self.stages[:1], self.ocr_queue), (self.stages[1:-1], self.render_queue)):
+            for stage in stages:
+                stage.join()
+            outbox.close()
+
+    def _render_packet(self, packet):
+        # Le pool OCR peut reordonner les frames: on ignore celles plus anciennes que la derniere affichee
+        with self._render_lock:
+            if packet.seq < self._last_rendered:
+                return None
+            self._last_rendered = packet.seq
+        self._render(packet)
+        latency = time.monotonic() - packet.timestamp
+        self.e2e_stats.record(latency)
+        if self.controller is not None:
+            self.controller.observe(latency, self.backlog())
+        return None
+
+    def backlog(self):
+        # Frames en attente de détection ou d'OCR
+        return self.detect_queue.qsize() + self.ocr_queue.qsize()
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        self._capture_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for q in (self.detect_queue, self.ocr_queue, self.render_queue):
+            q.close()
+
+    def join(self):
+        self._capture_thread.join()
+        for stage in self.stages:
+            stage.join()
+
+    def stats(self):
+        stats = {name: s.snapshot() for name, s in self.stage_stats.items()}
+        stats['capture']['dropped'] = 0
+        stats['detect']['dropped'] = self.detect_queue.dropped
+        stats['ocr']['dropped'] = self.ocr_queue.dropped
+        stats['render']['dropped'] = self.render_queue.dropped
+        stats['end_to_end'] = self.e2e_stats.snapshot()
+        return stats
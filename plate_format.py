@@ -0,0 +1,136 @@
+"""Formats de plaques, compiles une fois au demarrage.
+
+Un format est un gabarit: 'D' chiffre, 'L' lettre, 'A' l'un ou l'autre.
+A la compilation on prepare une table de traduction d'octets (majuscules,
+suppression des separateurs et, pour un gabarit homogene, correction des
+caracteres confondus) et une expression reguliere; la normalisation d'un
+candidat OCR se fait alors en un ``bytes.translate`` et un ``fullmatch``,
+sans boucle Python par caractere. Pour les gabarits mixtes, la correction
+depend de la position (O -> 0 sur un chiffre, 0 -> O sur une lettre).
+
+    set_plate_formats(['dz', 'fr'])          # ou 'nom=GABARIT' pour un format sur mesure
+    normalize_plate("O1234 56789")           # -> '0123456789'
+    best_plate(reader.readtext(image))       # -> (plaque, score) sur tous les candidats
+"""
+import re
+import string
+
+# Lettres que l'OCR confond avec des chiffres, et l'inverse
+DIGIT_CONFUSABLES = {'O': '0', 'I': '1', 'J': '3', 'A': '4', 'G': '6', 'S': '5'}
+LETTER_CONFUSABLES = {'0': 'O', '1': 'I', '3': 'J', '4': 'A', '6': 'G', '5': 'S', '8': 'B', '2': 'Z'}
+
+BUILTIN_FORMATS = {
+    # Algerie: 5 chiffres de serie + 3 (categorie/annee) + 2 (wilaya)
+    'dz': 'DDDDDDDDDD',
+    # France (SIV): AA-123-AA
+    'fr': 'LLDDDLL',
+}
+
+_CLASSES = {'D': '[0-9]', 'L': '[A-Z]', 'A': '[A-Z0-9]'}
+
+
+class PlateFormat:
+    def __init__(self, name, template, separators=' -.', digit_confusables=None, letter_confusables=None):
+        if not template or set(template) - set(_CLASSES):
+            raise ValueError(f"Gabarit de plaque invalide: {template!r} (attendu: D, L, A)")
+        self.name = name
+        self.template = template
+        self.length = len(template)
+        digit_confusables = DIGIT_CONFUSABLES if digit_confusables is None else digit_confusables
+        letter_confusables = LETTER_CONFUSABLES if letter_confusables is None else letter_confusables
+        self.pattern = re.compile("".join(_CLASSES[c] for c in template).encode())
+        self._digits_only = set(template) == {'D'}
+
+        # Tables d'octets (256 entrees): majuscules, puis corrections; les separateurs sont supprimes
+        upper = bytearray(range(256))
+        for lower in string.ascii_lowercase:
+            upper[ord(lower)] = ord(lower.upper())
+        self._delete = separators.encode('ascii')
+        if set(template) in ({'D'}, {'L'}):
+            # Gabarit homogene: la correction ne depend pas de la position, une seule table
+            confusables = digit_confusables if self._digits_only else letter_confusables
+            self._table = bytes(self._with_confusables(upper, confusables))
+            self._positions = None
+        else:
+            # Gabarit mixte: O -> 0 sur une position chiffre, 0 -> O sur une position lettre
+            self._table = bytes(upper)
+            positions = {'D': digit_confusables, 'L': letter_confusables, 'A': {}}
+            self._positions = [bytes(self._with_confusables(bytearray(range(256)), positions[c]))
+                               for c in template]
+
+    @staticmethod
+    def _with_confusables(table, confusables):
+        for wrong, right in confusables.items():
+            table[ord(wrong)] = ord(right)
+            table[ord(wrong.lower())] = ord(right)
+        return table
+
+    def normalize(self, text):
+        """Texte OCR -> plaque normalisee, ou None si le texte ne respecte pas le format."""
+        # Cas le plus frequent: deja exactement au format
+        if self._digits_only and len(text) == self.length and text.isascii() and text.isdigit():
+            return text
+        if not text.isascii():
+            return None
+        data = text.encode('ascii').translate(self._table, self._delete)
+        if len(data) != self.length:
+            return None
+        if self._positions is not None:
+            data = bytes([table[char] for table, char in zip(self._positions, data)])
+        return data.decode('ascii') if self.pattern.fullmatch(data) else None
+
+    def __repr__(self):
+        return f"PlateFormat({self.name!r}, {self.template!r})"
+
+
+def compile_formats(specs):
+    """'dz', 'fr' ou 'nom=GABARIT' -> liste de PlateFormat (dans l'ordre de priorite)."""
+    formats = []
+    for spec in specs:
+        name, _, template = spec.partition('=')
+        if not template:
+            if name not in BUILTIN_FORMATS:
+                raise ValueError(f"Format de plaque inconnu: {name} (connus: {', '.join(BUILTIN_FORMATS)})")
+            template = BUILTIN_FORMATS[name]
+        formats.append(PlateFormat(name, template))
+    return formats
+
+
+active_formats = compile_formats(['dz'])
+
+
+def set_plate_formats(specs):
+    # A appeler au demarrage (et dans chaque processus de travail)
+    global active_formats
+    if isinstance(specs, str):
+        specs = [spec for spec in specs.split(',') if spec]
+    active_formats = compile_formats(specs)
+    return active_formats
+
+
+def normalize_plate(text, formats=None):
+    for plate_format in formats or active_formats:
+        plate = plate_format.normalize(text)
+        if plate is not None:
+            return plate
+    return None
+
+
+def best_plate(detections, formats=None):
+    """Meilleure plaque valide parmi tous les candidats EasyOCR ``(bbox, texte, score)``.
+
+    Chaque candidat est essaye, ainsi que la concatenation des fragments de
+    gauche a droite (EasyOCR coupe souvent la plaque en plusieurs mots).
+    Renvoie (plaque, score) ou (None, None).
+    """
+    best, best_score = None, None
+    for _, text, score in detections:
+        plate = normalize_plate(text, formats)
+        if plate is not None and (best_score is None or score > best_score):
+            best, best_score = plate, score
+    if best is None and len(detections) > 1:
+        ordered = sorted(detections, key=lambda detection: detection[0][0][0])
+        plate = normalize_plate("".join(text for _, text, _ in ordered), formats)
+        if plate is not None:
+            best, best_score = plate, min(score for _, _, score in ordered)
+    return best, best_score
@@ -0,0 +1,147 @@
+"""Modele Qt de la table des plaques, pagine sur SQLite (plus recentes en premier).
+
+La table annonce toutes les lignes (``count_sightings`` au chargement) mais
+n'en garde en memoire qu'une fenetre de ``max_pages`` pages: ``data`` lit a la
+demande la page de la ligne affichee (pagination par cle, ``id < dernier id``
+de la page precedente, ou ``OFFSET`` pour un saut direct) et la page la plus
+eloignee de celle-ci est oubliee au-dela de la fenetre. Les nouvelles
+detections sont ajoutees en tete en O(1) avec ``beginInsertRows``.
+
+Stockage: ``_recent`` (detections de la session, la plus recente a la fin) et
+``_pages`` (numero de page -> lignes lues en base, id <= ``_max_id``); la
+ligne r est ``_recent[-1 - r]`` puis la ligne ``r - len(_recent)`` des
+passages en base. Au-dela de ``max_recent`` detections, ``_recent`` est
+verse dans la partie paginee (``_fold_recent``): ces lignes, deja ecrites,
+sont relues en base comme les autres et la memoire reste bornee.
+"""
+from PyQt5 import QtCore
+
+COLUMNS = ('plate', 'time')
+
+
+class PlateTableModel(QtCore.QAbstractTableModel):
+    def __init__(self, db_manager, page_size=200, max_pages=10, max_recent=None, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.page_size = page_size
+        # Fenêtre de pages gardées en mémoire autour de la zone affichée
+        self.max_pages = max_pages
+        # Détections de la session gardées en mémoire avant d'être relues par pages (une page par défaut)
+        self.max_recent = max_recent if max_recent is not None else page_size
+        self._recent = []
+        self._pages = {}
+        self._older_count = 0
+        self._max_id = 0
+        self.reload()
+
+    def reload(self):
+        self.beginResetModel()
+        self._recent = []
+        self._pages = {}
+        # Les passages écrits après ce point arrivent par prepend (ou au prochain reload)
+        self._older_count, self._max_id = self.db_manager.count_sightings()
+        self.endResetModel()
+
+    def _fold_recent(self):
+        # Les détections de la session sont en base (count_sightings vide la file d'écriture):
+        # la partie paginée est étendue aux len(_recent) passages suivant _max_id, les lignes
+        # affichées ne bougent pas. Les passages plus récents (écrits par le sink 'db' mais pas
+        # encore ajoutés par prepend) restent au-delà de _max_id et arriveront par prepend.
+        recent = len(self._recent)
+        count, max_id = self.db_manager.count_sightings()
+        if count < recent + self._older_count:
+            # Écriture perdue ou lignes supprimées: les positions ne correspondent plus, on relit tout
+            self.reload()
+            return
+        if count > recent + self._older_count:
+            max_id = self.db_manager.nth_sighting_id(self._max_id, recent)
+            if max_id is None:
+                self.reload()
+                return
+            count = recent + self._older_count
+        self._recent = []
+        self._pages = {}
+        self._older_count, self._max_id = count, max_id
+        # Même ligne, format de date de la base
+        self.dataChanged.emit(self.index(0, 0), self.index(self.rowCount() - 1, len(COLUMNS) - 1))
+
+    def _page(self, number):
+        rows = self._pages.get(number)
+        if rows is not None:
+            return rows
+        previous = self._pages.get(number - 1)
+        if previous:
+            # Défilement continu: pagination par clé depuis la page précédente
+            fetched = self.db_manager.fetch_page(previous[-1][0], self.page_size)
+        else:
+            fetched = self.db_manager.fetch_page(self._max_id + 1, self.page_size, number * self.page_size)
+        rows = self._pages[number] = [list(row) for row in fetched]
+        while len(self._pages) > self.max_pages:
+            del self._pages[max(self._pages, key=lambda page: abs(page - number))]
+        return rows
+
+    def _row(self, row):
+        recent = len(self._recent)
+        if row < recent:
+            return self._recent[recent - 1 - row]
+        number, offset = divmod(row - recent, self.page_size)
+        rows = self._page(number)
+        # Ligne supprimée en base depuis le chargement: cellule vide jusqu'au prochain reload
+        return rows[offset] if offset < len(rows) else [None, "", ""]
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._recent) + self._older_count
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or role not in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+            return None
+        # [id, plaque, date]
+        return self._row(index.row())[index.column() + 1]
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and index.column() == 0:
+            flags |= QtCore.Qt.ItemIsEditable
+        return flags
+
+    def prepend(self, plate_text, time_str):
+        # Nouvelle détection en tête de table, sans recopier les lignes existantes; la ligne peut
+        # être écrite en base avant ou après (sink 'db'), mais dans l'ordre des appels à prepend
+        if len(self._recent) >= self.max_recent:
+            self._fold_recent()
+        self.beginInsertRows(QtCore.QModelIndex(), 0, 0)
+        self._recent.append([None, plate_text, time_str])
+        self.endInsertRows()
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if not index.isValid() or index.column() != 0 or role != QtCore.Qt.EditRole:
+            return False
+        old_plate, new_plate = self._row(index.row())[1], value.strip()
+        if not new_plate or new_plate == old_plate:
+            return False
+        # La base renomme toutes les lignes de cette plaque: on fait de même pour les lignes en mémoire,
+        # les pages oubliées seront relues renommées
+        self.db_manager.update_plate(old_plate, new_plate)
+        for rows in [self._recent] + list(self._pages.values()):
+            for row in rows:
+                if row[1] == old_plate:
+                    row[1] = new_plate
+        self.dataChanged.emit(self.index(0, 0), self.index(self.rowCount() - 1, 0))
+        return True
+
+    def plate_at(self, row):
+        return self._row(row)[1]
+
+    def remove_plate(self, plate_text):
+        # delete_plate supprime toutes les lignes de la plaque: la table est relue (compte et pages);
+        # les détections de la session, déjà en base, y sont reprises
+        self.db_manager.delete_plate(plate_text)
+        self.reload()
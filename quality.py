@@ -0,0 +1,239 @@
+"""Controleur adaptatif qualite / latence de la reconnaissance.
+
+Le controleur recoit, pour chaque frame rendue, sa latence de bout en bout
+(capture -> rendu) et la profondeur des files du pipeline, et pour chaque
+vehicule le delai entre la premiere detection de sa piste et la publication
+de son evenement de plaque (``observe_event``, premiere lecture valide).
+Toutes les ``interval_s`` il compare au budget (par ex. un evenement de
+plaque en moins de 300 ms) le plus grand des deux percentiles ``percentile``:
+celui des frames de la fenetre et, des qu'il y en a ``min_events`` sur
+``event_window_s``, celui des evenements de plaque:
+
+- au-dessus du budget, ou proche du budget avec des files qui se remplissent,
+  il descend d'un niveau de qualite;
+- nettement en dessous (``upgrade_ratio`` du budget) pendant ``upgrade_hold_s``,
+  il remonte d'un niveau. Une remontee annulee aussitot double ce delai
+  (jusqu'a ``max_upgrade_hold_s``), ce qui evite les oscillations.
+
+Un niveau (``QualityLevel``) regle la taille d'entree du detecteur, le pas de
+detection (YOLO une frame sur N), le nombre de plaques lues par frame et le
+pretraitement de l'OCR; il est applique a chaque ``PlateRecognizer`` attache.
+Chaque decision est gardee (``decisions``), passee en message a ``on_change``
+(barre d'etat, console) et ajoutee en JSONL a ``audit_path`` pour l'audit; une
+erreur d'ecriture du journal va a ``on_error``:
+
+    controller = QualityController(budget_ms=300, audit_path='qualite.jsonl')
+    controller.attach(recognizer)
+    controller.observe(latency_s, backlog)     # depuis l'etape de rendu
+    controller.observe_event(delay_s)          # depuis PlateRecognizer, a chaque premiere lecture
+"""
+import collections
+import json
+import threading
+import time
+
+from metrics import metrics
+
+
+class QualityLevel:
+    __slots__ = ('name', 'input_scale', 'detect_stride', 'max_plates', 'preprocess')
+
+    def __init__(self, name, input_scale=1.0, detect_stride=1, max_plates=None, preprocess='full'):
+        self.name = name
+        # Fraction de la taille d'entree configuree du detecteur (640 -> 512 -> 416 -> 320)
+        self.input_scale = input_scale
+        self.detect_stride = detect_stride
+        # None: toutes les plaques de la frame passent par l'OCR
+        self.max_plates = max_plates
+        # Niveau de preprocess_image: 'full', 'light' ou 'fast'
+        self.preprocess = preprocess
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return (f"QualityLevel({self.name!r}, scale={self.input_scale}, stride={self.detect_stride}, "
+                f"max_plates={self.max_plates}, preprocess={self.preprocess!r})")
+
+
+# De la meilleure qualite a la plus rapide; le niveau 0 est le comportement sans controleur
+DEFAULT_LEVELS = (
+    QualityLevel('max'),
+    QualityLevel('high', max_plates=4),
+    QualityLevel('medium', input_scale=0.8, max_plates=3, preprocess='light'),
+    QualityLevel('low', input_scale=0.65, detect_stride=2, max_plates=2, preprocess='light'),
+    QualityLevel('min', input_scale=0.5, detect_stride=3, max_plates=1, preprocess='fast'),
+)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q / 100.0))]
+
+
+class QualityController:
+    def __init__(self, budget_ms=300.0, levels=DEFAULT_LEVELS, level=0, percentile=95, window_s=3.0,
+                 interval_s=1.0, min_samples=10, warn_ratio=0.8, max_backlog=1.5, upgrade_ratio=0.6,
+                 upgrade_hold_s=10.0, max_upgrade_hold_s=120.0, audit_path=None, on_change=None, on_error=None,
+                 event_window_s=30.0, min_events=3):
+        self.budget = budget_ms / 1000.0
+        self.levels = tuple(levels)
+        self.level = level
+        self.percentile = percentile
+        self.window = window_s
+        self.interval = interval_s
+        self.min_samples = min_samples
+        # Les événements de plaque sont rares (un par véhicule): fenêtre plus longue que celle des frames
+        self.event_window = event_window_s
+        self.min_events = min_events
+        # Entre warn_ratio * budget et le budget, des files pleines suffisent à dégrader
+        self.warn_ratio = warn_ratio
+        self.max_backlog = max_backlog
+        self.upgrade_ratio = upgrade_ratio
+        self.upgrade_hold = self.base_upgrade_hold = upgrade_hold_s
+        self.max_upgrade_hold = max_upgrade_hold_s
+        self.audit_path = audit_path
+        self.on_change = on_change
+        self.on_error = on_error
+        self.targets = []
+        self.decisions = collections.deque(maxlen=200)
+        self._samples = collections.deque()
+        self._events = collections.deque()
+        self._last_eval = self._last_change = time.monotonic()
+        self._last_direction = None
+        self._lock = threading.Lock()
+        metrics.set_gauge('quality_level', self.level)
+
+    @property
+    def current(self):
+        return self.levels[self.level]
+
+    def attach(self, recognizer):
+        # Un recognizer ajouté en cours de route (nouvelle caméra) prend le niveau courant
+        with self._lock:
+            self.targets.append(recognizer)
+            level = self.current
+        recognizer.controller = self
+        recognizer.set_quality(level)
+
+    def detach(self, recognizer):
+        with self._lock:
+            self.targets = [target for target in self.targets if target is not recognizer]
+        recognizer.controller = None
+
+    def observe(self, latency, backlog=0):
+        """Latence de bout en bout d'une frame (secondes) et nombre de frames en attente dans les files."""
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, latency, backlog))
+            while self._samples[0][0] < now - self.window:
+                self._samples.popleft()
+            if now - self._last_eval < self.interval:
+                return None
+            self._last_eval = now
+            decision = self._evaluate(now)
+            if decision is None:
+                return None
+            targets, level = self.targets, self.current
+        for target in targets:
+            target.set_quality(level)
+        self._record(decision)
+        return decision
+
+    def observe_event(self, delay):
+        """Delai (secondes) entre la premiere detection d'une piste et la publication de son evenement."""
+        now = time.monotonic()
+        with self._lock:
+            self._events.append((now, delay))
+            while self._events[0][0] < now - self.event_window:
+                self._events.popleft()
+
+    def _evaluate(self, now):
+        # Très en retard, les frames se font rares: une fenêtre complète après le dernier changement suffit
+        if len(self._samples) < self.min_samples and now - self._last_change < self.window:
+            return None
+        latencies = [latency for _, latency, _ in self._samples]
+        p_latency = p_frame = percentile(latencies, self.percentile)
+        measure = f"p{self.percentile} frame"
+        while self._events and self._events[0][0] < now - self.event_window:
+            self._events.popleft()
+        delays = [delay for _, delay in self._events]
+        p_event = percentile(delays, self.percentile) if len(delays) >= self.min_events else None
+        if p_event is not None and p_event > p_latency:
+            p_latency, measure = p_event, f"p{self.percentile} plaque"
+        backlog = sum(depth for _, _, depth in self._samples) / len(self._samples)
+        held = now - self._last_change
+        if self._last_direction == 'up' and held >= self.upgrade_hold:
+            # Remontée tenue: le délai revient à sa valeur de base
+            self.upgrade_hold = self.base_upgrade_hold
+        p_ms, budget_ms = p_latency * 1000.0, self.budget * 1000.0
+        if p_latency > self.budget:
+            direction, reason = 'down', f"{measure} {p_ms:.0f} ms > budget {budget_ms:.0f} ms"
+        elif p_latency > self.warn_ratio * self.budget and backlog >= self.max_backlog:
+            direction, reason = 'down', (f"files pleines ({backlog:.1f} frames), {measure} "
+                                         f"{p_ms:.0f} ms proche du budget {budget_ms:.0f} ms")
+        elif p_latency < self.upgrade_ratio * self.budget and held >= self.upgrade_hold:
+            direction, reason = 'up', (f"{measure} {p_ms:.0f} ms < {self.upgrade_ratio:.0%} du budget "
+                                       f"depuis {held:.0f} s")
+        else:
+            return None
+        previous = self.level
+        if direction == 'down':
+            if self.level == len(self.levels) - 1:
+                return None
+            if self._last_direction == 'up' and held < self.upgrade_hold:
+                # La remontée précédente a fait sortir du budget: on attendra plus longtemps la prochaine
+                self.upgrade_hold = min(2 * self.upgrade_hold, self.max_upgrade_hold)
+            self.level += 1
+        else:
+            if self.level == 0:
+                return None
+            self.level -= 1
+        self._last_direction = direction
+        self._last_change = now
+        # Les mesures suivantes doivent refléter le nouveau niveau
+        self._samples.clear()
+        self._events.clear()
+        return {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'direction': direction,
+            'from': self.levels[previous].name,
+            'to': self.current.name,
+            'level': self.current.to_dict(),
+            'reason': reason,
+            f'p{self.percentile}_ms': round(p_ms, 1),
+            f'frame_p{self.percentile}_ms': round(p_frame * 1000.0, 1),
+            f'event_p{self.percentile}_ms': round(p_event * 1000.0, 1) if p_event is not None else None,
+            'events': len(delays),
+            'p50_ms': round(percentile(latencies, 50) * 1000.0, 1),
+            'backlog': round(backlog, 2),
+            'samples': len(latencies),
+            'budget_ms': budget_ms,
+            'upgrade_hold_s': self.upgrade_hold,
+        }
+
+    def _record(self, decision):
+        self.decisions.append(decision)
+        metrics.set_gauge('quality_level', self.level)
+        metrics.inc('quality_degraded' if decision['direction'] == 'down' else 'quality_upgraded')
+        if self.on_change is not None:
+            self.on_change(f"Qualite {decision['from']} -> {decision['to']}: {decision['reason']}")
+        if self.audit_path:
+            try:
+                with open(self.audit_path, 'a') as f:
+                    f.write(json.dumps(decision) + '\n')
+            except OSError as e:
+                if self.on_error is not None:
+                    self.on_error(f"Erreur du journal de qualite {self.audit_path}: {e}")
+
+    def stats(self):
+        with self._lock:
+            latencies = [latency for _, latency, _ in self._samples]
+            delays = [delay for _, delay in self._events]
+        return {
+            'level': self.current.name,
+            'budget_ms': self.budget * 1000.0,
+            f'p{self.percentile}_ms': percentile(latencies, self.percentile) * 1000.0 if latencies else 0.0,
+            f'event_p{self.percentile}_ms': percentile(delays, self.percentile) * 1000.0 if delays else 0.0,
+            'changes': len(self.decisions),
+        }
@@ -0,0 +1,345 @@
+"""Cœur de la reconnaissance de plaques, sans dépendance à Qt.
+
+PlateRecognizer regroupe la détection YOLO, le suivi, la porte de mouvement et
+l'OCR; il est partagé par FrameGrabber (interface) et par le mode batch (anpr.py).
+"""
+import time
+from contextlib import nullcontext
+
+import cv2
+import numpy as np
+
+from pipeline import FramePacket
+from tracker import PlateTracker
+from motion import MotionGate
+from mjpeg import frame_image, frame_scale, crop_region
+from metrics import metrics
+from detectors import UltralyticsDetector
+from plate_format import normalize_plate, best_plate
+from events import PlateEvent
+
+
+class PlateRecognizer:
+    def __init__(self, model, reader, batch_ocr=True, tracking=True, motion_gate=True, motion_roi=None,
+                 idle_stride=15, fast_reader=None, detect_stride=1, max_ocr_plates=None, preprocess='full'):
+        self.model = model
+        # Backend de détection: un modèle YOLO Ultralytics ou tout objet exposant detect_batch (ONNX, ...)
+        self.detector = model if hasattr(model, 'detect_batch') else UltralyticsDetector(model)
+        self.reader = reader
+        # OCR groupé: toutes les plaques d'une frame (ou de plusieurs frames) en une passe du réseau d'EasyOCR
+        self.batch_ocr = batch_ocr
+        # Lecteur rapide des plaques à 10 chiffres (DigitTemplateReader), EasyOCR seulement en secours
+        self.fast_reader = fast_reader
+        # Suivi des plaques: OCR une fois par véhicule et un seul événement par piste
+        self.tracker = PlateTracker() if tracking else None
+        # Porte de mouvement: YOLO ne tourne que s'il y a du changement (ou une frame sur idle_stride au repos)
+        self.motion_gate = MotionGate(roi=motion_roi, idle_stride=idle_stride) if motion_gate else None
+        # Réglages de qualité (voir quality.QualityController): YOLO une frame sur detect_stride,
+        # au plus max_ocr_plates plaques lues par frame, niveau de prétraitement de l'OCR
+        self.detect_stride = detect_stride
+        self.max_ocr_plates = max_ocr_plates
+        self.preprocess = preprocess
+        # QualityController attaché: reçoit le délai première détection -> événement de plaque
+        self.controller = None
+        self._stride_count = 0
+        self._last_boxes = []
+        self._last_tracks = []
+        # Facteur de decode_mode des dernières frames: boîtes des événements en pleine résolution
+        self._scale = 1
+
+    def set_quality(self, level):
+        """Applique un QualityLevel: taille d'entree du detecteur, pas de detection, plaques lues, pretraitement."""
+        self.detect_stride = level.detect_stride
+        self.max_ocr_plates = level.max_plates
+        self.preprocess = level.preprocess
+        set_input_scale = getattr(self.detector, 'set_input_scale', None)
+        if set_input_scale is not None:
+            set_input_scale(level.input_scale)
+
+    def needs_detection(self, packet):
+        """Porte de mouvement: renvoie False (et réutilise les dernières boîtes) si la frame est sautée."""
+        skip = self.motion_gate is not None and not self.motion_gate.should_detect(frame_image(packet.frame))
+        if skip:
+            metrics.inc('detect_skipped')
+        elif self.detect_stride > 1:
+            # Pipeline en retard: YOLO une frame sur detect_stride, même en mouvement
+            self._stride_count += 1
+            skip = self._stride_count % self.detect_stride != 0
+            if skip:
+                metrics.inc('detect_strided')
+        if skip:
+            # Scène immobile (ou frame sautée): on réaffiche les dernières boîtes sans relancer YOLO ni l'OCR
+            packet.boxes = self._last_boxes
+            packet.tracks = [(track_id, False) for track_id, _ in self._last_tracks]
+            if self.tracker is not None:
+                self.tracker.skip_frame()
+            return False
+        return True
+
+    def apply_detections(self, packet, boxes):
+        packet.boxes = boxes
+        self._scale = frame_scale(packet.frame)
+        if self.tracker is not None:
+            # Le plafond max_ocr_plates est appliqué par le tracker, avant qu'il compte la tentative
+            deferred = self.tracker.deferred
+            packet.tracks = self.tracker.update(packet.boxes, frame_image(packet.frame),
+                                                max_ocr=self.max_ocr_plates, seq=packet.seq)
+            if self.tracker.deferred > deferred:
+                metrics.inc('ocr_deferred', self.tracker.deferred - deferred)
+        self._last_boxes = packet.boxes
+        self._last_tracks = packet.tracks
+
+    def detect_packet(self, packet):
+        if self.needs_detection(packet):
+            self.apply_detections(packet, self.detect(frame_image(packet.frame)))
+        return packet
+
+    def ocr_requests(self, packets):
+        """(frame, boxes) à lire pour chaque paquet; avec le suivi, seules les pistes qui en ont besoin."""
+        frames_boxes = []
+        for packet in packets:
+            boxes = packet.boxes
+            if self.tracker is not None:
+                # max_ocr_plates déjà appliqué par PlateTracker.update (apply_detections)
+                boxes = [box for box, (_, needs_ocr) in zip(packet.boxes, packet.tracks) if needs_ocr]
+            elif self.max_ocr_plates is not None and len(boxes) > self.max_ocr_plates:
+                # Sans suivi: les max_ocr_plates boîtes les plus sûres seulement
+                packet.boxes = boxes = sorted(boxes, key=lambda box: box[4], reverse=True)[:self.max_ocr_plates]
+            frames_boxes.append((packet.frame, boxes))
+        return frames_boxes
+
+    def apply_reads(self, packets, reads):
+        for packet, packet_reads in zip(packets, reads):
+            if self.tracker is None:
+                packet.plates = [plate_text for plate_text, _ in packet_reads]
+                packet.scores = [score for _, score in packet_reads]
+                continue
+            pending = iter(packet_reads)
+            for track_id, needs_ocr in packet.tracks:
+                if needs_ocr:
+                    plate_text, score = next(pending)
+                    self.tracker.add_read(track_id, plate_text, score, packet.seq)
+            votes = [self.tracker.plate(track_id) for track_id, _ in packet.tracks]
+            packet.plates = [plate_text for plate_text, _ in votes]
+            packet.scores = [score for _, score in votes]
+
+    def release_packet(self, packet):
+        """Paquet détecté mais jeté avant l'OCR (file pleine, erreur): ses lectures réservées sont rendues."""
+        if self.tracker is None:
+            return
+        for track_id, needs_ocr in packet.tracks:
+            if needs_ocr:
+                self.tracker.release(track_id, packet.seq)
+
+    def read_packets(self, packets):
+        # Avec le suivi, seules les pistes nouvelles ou avec un meilleur crop passent par l'OCR
+        self.apply_reads(packets, self.read_batch(self.ocr_requests(packets)))
+
+    def read_batch(self, frames_boxes):
+        # frames_boxes: liste de (frame, boxes); renvoie une liste de (plaque, score) par frame
+        crops = [crop_region(frame, xmin, ymin, xmax, ymax)
+                 for frame, boxes in frames_boxes
+                 for xmin, ymin, xmax, ymax, _ in boxes]
+        if crops:
+            metrics.inc('ocr_crops', len(crops))
+        # Frames sans plaque à lire (suivi, porte de mouvement): pas d'échantillon à ~0 ms dans l'histogramme 'ocr'
+        with metrics.timer('ocr') if crops else nullcontext():
+            if self.fast_reader is not None:
+                results = read_license_plates_fast(crops, self.reader, self.fast_reader, self.batch_ocr,
+                                                   self.preprocess)
+            elif self.batch_ocr:
+                results = read_license_plates_batch(crops, self.reader, preprocess=self.preprocess)
+            else:
+                results = [read_license_plate(preprocess_image(crop, self.preprocess), self.reader)
+                           for crop in crops]
+        reads = []
+        index = 0
+        for _, boxes in frames_boxes:
+            reads.append([(plate_text or "", score or 0.0) for plate_text, score in results[index:index + len(boxes)]])
+            index += len(boxes)
+        return reads
+
+    def plate_events(self, packet):
+        return [event.plate for event in self.plate_records(packet)]
+
+    def plate_records(self, packet, camera_id=None, early=False):
+        """PlateEvent de la frame (plaque, confiance, caméra, horodatage, boîte) pour l'EventBus.
+
+        La boîte est en pixels de la pleine résolution, même si la détection a tourné
+        sur une image réduite (``decode_mode``).
+
+        Avec ``early``, les premieres lectures des pistes encore ouvertes sont ajoutees
+        (``PlateEvent.early``), pour les alertes de la liste de surveillance.
+        """
+        # Avec le suivi, une plaque n'est émise qu'une fois, quand sa piste se termine
+        scale = self._scale
+        if self.tracker is not None:
+            first_reads = self.tracker.pop_first_reads()
+            events = []
+            if early:
+                now = time.monotonic()
+                for track_id, plate_text, confidence, box, first_seen in first_reads:
+                    events.append(PlateEvent(plate_text, confidence, camera_id, bbox=_bbox(box, scale),
+                                             track_id=track_id, early=True))
+                    # Délai de bout en bout vu du véhicule: première détection de la piste -> événement publié
+                    metrics.observe('plate_event_latency', now - first_seen)
+                    if self.controller is not None:
+                        self.controller.observe_event(now - first_seen)
+            return events + [PlateEvent(plate_text, confidence, camera_id, bbox=_bbox(box, scale), track_id=track_id)
+                             for track_id, plate_text, confidence, box in self.tracker.pop_finished()]
+        return [PlateEvent(plate_text.strip(), score, camera_id, bbox=_bbox(box, scale))
+                for plate_text, score, box in zip(packet.plates, packet.scores, packet.boxes) if plate_text]
+
+    def finish(self, camera_id=None):
+        """PlateEvent des pistes encore ouvertes, a l'arret de la capture (vehicules encore dans le champ)."""
+        if self.tracker is None:
+            return []
+        self.tracker.finish_all()
+        return self.plate_records(None, camera_id)
+
+    def detect(self, frame):
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, images):
+        # Un seul appel YOLO pour plusieurs images (par ex. une frame par caméra)
+        with metrics.timer('detect'):
+            return self.detector.detect_batch(images)
+
+    def annotate(self, frame, boxes, plates):
+        for (xmin, ymin, xmax, ymax, confidence), plate_text in zip(boxes, plates):
+            self.draw_label(frame, xmin, ymin, xmax, ymax, plate_text, confidence)
+
+    def process(self, frame, seq=0, timestamp=0.0):
+        # Détection + OCR d'une frame, sans dessin; renvoie le FramePacket rempli
+        packet = FramePacket(seq, frame, timestamp)
+        self.detect_packet(packet)
+        self.read_packets([packet])
+        return packet
+
+    def process_frame(self, frame):
+        packet = self.process(frame)
+        self.annotate(frame_image(frame), packet.boxes, packet.plates)
+        return self.plate_events(packet)
+
+    def draw_label(self, frame, xmin, ymin, xmax, ymax, plate_text, confidence):
+        cv2.rectangle(frame, (xmin, ymin), (xmax, ymax), (255, 0, 0), 2)
+        text = f"{plate_text} License plate {confidence:.2f}"
+        cv2.putText(frame, text, (xmin, ymin - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
+
+
+def _bbox(box, scale=1):
+    # Boîte de l'image de détection -> pixels de la pleine résolution
+    return tuple(int(value) * scale for value in box[:4]) if box is not None else None
+
+
+# 'full': agrandissement x2 + flou médian 5 (meilleure lecture), 'light': flou médian 3 sans agrandissement
+# (4x moins de pixels), 'fast': binarisation seule
+PREPROCESS_LEVELS = ('full', 'light', 'fast')
+
+
+def preprocess_image(image, level='full'):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if level == 'full':
+        gray = cv2.resize(gray, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+        gray = cv2.medianBlur(gray, 5)
+    elif level == 'light':
+        gray = cv2.medianBlur(gray, 3)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary
+
+def read_license_plate(license_plate_crop, reader):
+    # Tous les candidats EasyOCR sont normalisés (formats compilés), pas seulement le meilleur score
+    return best_plate(reader.readtext(license_plate_crop))
+
+def read_license_plates_batch(license_plate_crops, reader, padding=8, preprocess='full'):
+    # YOLO a déjà localisé les plaques: on saute la détection de texte d'EasyOCR, les crops
+    # prétraités sont empilés puis lus en une passe du réseau de reconnaissance (recognize_binaries)
+    binaries = []
+    for index, crop in enumerate(license_plate_crops):
+        if crop is not None and crop.size > 0:
+            binaries.append((index, preprocess_image(crop, preprocess)))
+    return recognize_binaries(binaries, reader, len(license_plate_crops), padding)
+
+def recognize_binaries(binaries, reader, count, padding=8):
+    # binaries: liste de (index, plaque binarisée); renvoie count résultats (plaque, score)
+    results = [(None, None)] * count
+    if not binaries:
+        return results
+
+    width = max(binary.shape[1] for _, binary in binaries) + 2 * padding
+    height = sum(binary.shape[0] + padding for _, binary in binaries) + padding
+    canvas = np.zeros((height, width), dtype=np.uint8)
+    horizontal_list = []
+    rows = {}
+    y = padding
+    for index, binary in binaries:
+        h, w = binary.shape
+        canvas[y:y + h, padding:padding + w] = binary
+        # Format EasyOCR: [x_min, x_max, y_min, y_max]
+        horizontal_list.append([padding, padding + w, y, y + h])
+        rows[y] = index
+        y += h + padding
+
+    detections = _recognize_padded(reader, canvas, horizontal_list)
+    if detections is None:
+        detections = reader.recognize(canvas, horizontal_list=horizontal_list, free_list=[],
+                                      batch_size=len(horizontal_list), detail=1, paragraph=False)
+    for bbox, text, score in detections:
+        # EasyOCR peut réordonner les boîtes: on les retrouve par leur ordonnée de départ
+        index = rows.get(int(bbox[0][1]))
+        if index is None:
+            continue
+        plate_text = normalize_plate(text)
+        if plate_text is not None:
+            results[index] = (plate_text, score)
+    return results
+
+def _recognize_padded(reader, canvas, horizontal_list):
+    # Sur CPU, reader.recognize lit les boîtes une par une (une passe du réseau par plaque).
+    # On appelle directement son chemin multi-boîtes: crops ramenés à la hauteur du modèle,
+    # complétés à une largeur commune, une seule passe pour tout le lot (deux si certaines
+    # lectures sont peu sûres: seconde passe contrastée d'EasyOCR). None si le lecteur n'est
+    # pas un easyocr.Reader compatible: l'appelant repasse par reader.recognize.
+    try:
+        from easyocr import easyocr as easyocr_module
+        from easyocr.recognition import get_text
+        from easyocr.utils import get_image_list
+    except ImportError:
+        return None
+    if not all(hasattr(reader, name) for name in ('character', 'lang_char', 'recognizer', 'converter', 'device')):
+        return None
+    height = getattr(easyocr_module, 'imgH', 64)
+    image_list, max_width = get_image_list(horizontal_list, [], canvas, model_height=height)
+    if not image_list:
+        return []
+    # Mêmes réglages que reader.recognize par défaut (décodeur glouton, contrast_ths, adjust_contrast, filter_ths)
+    ignore_char = ''.join(set(reader.character) - set(reader.lang_char))
+    return get_text(reader.character, height, int(max_width), reader.recognizer, reader.converter, image_list,
+                    ignore_char, 'greedy', 5, len(image_list), 0.1, 0.5, 0.003, 0, reader.device)
+
+def read_license_plates_fast(license_plate_crops, reader, fast_reader, batch_ocr=True, preprocess='full'):
+    # Lecteur de chiffres d'abord; seules les plaques qu'il ne lit pas avec assez de confiance vont à EasyOCR
+    results = [(None, None)] * len(license_plate_crops)
+    fallback = []
+    for index, crop in enumerate(license_plate_crops):
+        if crop is None or crop.size == 0:
+            continue
+        binary = preprocess_image(crop, preprocess)
+        plate_text, score = fast_reader.read(binary)
+        if plate_text is not None:
+            plate_text = normalize_plate(plate_text)
+        if plate_text is not None:
+            results[index] = (plate_text, score)
+            metrics.inc('ocr_fast_hits')
+        else:
+            fallback.append((index, binary))
+    if fallback:
+        metrics.inc('ocr_fallbacks', len(fallback))
+        if batch_ocr:
+            fallback_results = recognize_binaries(fallback, reader, len(license_plate_crops))
+            for index, _ in fallback:
+                results[index] = fallback_results[index]
+        else:
+            for index, binary in fallback:
+                results[index] = read_license_plate(binary, reader)
+    return results
@@ -0,0 +1,255 @@
+"""Enregistrement et relecture des flux camera (tests de performance reproductibles).
+
+Un enregistrement est une paire de fichiers:
+
+    <nom>.mjpeg   les JPEG bruts de la camera, concatenes (lisible par MJPEGParser,
+                  bench_mjpeg.py et bench_decode.py)
+    <nom>.idx     une ligne par frame: "instant_us position longueur", instant
+                  relatif a la premiere frame
+
+``StreamRecorder`` est branche sur le thread lecteur de ``CaptureSupervisor``:
+toutes les frames recues de la camera sont enregistrees, y compris celles
+que le consommateur saute. libcamera-vid fournit deja du JPEG, ecrit tel quel;
+les frames d'une camera IP (cv2.VideoCapture, deja decodees) sont recompressees.
+
+``replay_frames`` rejoue un enregistrement en temps reel (speed=1), accelere
+(speed=4) ou aussi vite que possible (speed=0), comme une camera:
+
+    python main.py --record rue                            # enregistre la camera
+    python main.py --replay rue --replay-speed 0           # rejoue dans l'interface
+    python recording.py replay rue --speed 0 --json run.json   # pipeline complet sans Qt
+    python recording.py replay rue --speed 0 --compare run.json
+    python recording.py replay rue --speed 1 --latency-budget-ms 300   # controleur de qualite
+"""
+import argparse
+import json
+import mmap
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from metrics import metrics
+
+INDEX_HEADER = "# anpr recording v1"
+
+
+def recording_paths(path):
+    base = path[:-len('.mjpeg')] if path.endswith('.mjpeg') else path
+    return base + '.mjpeg', base + '.idx'
+
+
+class StreamRecorder:
+    def __init__(self, path, source=None, jpeg_quality=95):
+        self.data_path, self.index_path = recording_paths(path)
+        directory = os.path.dirname(self.data_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.jpeg_quality = jpeg_quality
+        self.frames = 0
+        self._data = open(self.data_path, 'wb')
+        self._index = open(self.index_path, 'w')
+        self._index.write(f"{INDEX_HEADER} source={source or ''}\n")
+        self._offset = 0
+        self._start = None
+        self._lock = threading.Lock()
+
+    def write(self, frame, timestamp=None):
+        """Ajoute une frame: octets JPEG, ou image BGR (recompressee)."""
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        if isinstance(frame, np.ndarray):
+            ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                return
+            frame = encoded
+        data = memoryview(frame).cast('B')
+        with self._lock:
+            if self._data.closed:
+                return
+            if self._start is None:
+                self._start = timestamp
+            self._data.write(data)
+            self._index.write(f"{int((timestamp - self._start) * 1e6)} {self._offset} {len(data)}\n")
+            self._offset += len(data)
+            self.frames += 1
+        metrics.inc('frames_recorded')
+
+    def close(self):
+        with self._lock:
+            if not self._data.closed:
+                self._data.close()
+                self._index.close()
+
+
+def read_index(path):
+    """Liste de (instant_us, position, longueur) d'un enregistrement."""
+    _, index_path = recording_paths(path)
+    entries = []
+    with open(index_path) as f:
+        for line in f:
+            if line.startswith('#') or not line.strip():
+                continue
+            t_us, offset, length = line.split()
+            entries.append((int(t_us), int(offset), int(length)))
+    return entries
+
+
+def replay_frames(path, speed=1.0, loop=False, decode_mode='full'):
+    """Frames d'un enregistrement, au rythme d'origine divise par ``speed`` (0: sans attente)."""
+    from capture import decode_libcamera_frame
+
+    data_path, _ = recording_paths(path)
+    index = read_index(path)
+    if not index:
+        return
+    with open(data_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        while True:
+            start = time.monotonic()
+            for t_us, offset, length in index:
+                if speed > 0:
+                    delay = start + t_us / 1e6 / speed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                metrics.inc('frames_captured')
+                with metrics.timer('decode'):
+                    frame = decode_libcamera_frame(data[offset:offset + length], decode_mode)
+                if frame is not None:
+                    yield frame
+            if not loop:
+                return
+
+
+def _record(args):
+    from capture import capture_ip_camera, capture_local_camera
+
+    recorder = StreamRecorder(args.output, source=args.camera)
+    if args.camera == 'libcamera':
+        frames = capture_local_camera(recorder=recorder)
+    else:
+        frames = capture_ip_camera(args.camera, recorder=recorder)
+    deadline = time.monotonic() + args.seconds if args.seconds else None
+    try:
+        for _ in frames:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            if args.frames and recorder.frames >= args.frames:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        frames.close()
+        recorder.close()
+    print(f"{recorder.frames} frames -> {recorder.data_path}")
+    return 0
+
+
+def _info(args):
+    index = read_index(args.recording)
+    if not index:
+        print("Enregistrement vide")
+        return 1
+    duration = index[-1][0] / 1e6
+    size = sum(length for _, _, length in index)
+    gaps = [b[0] - a[0] for a, b in zip(index, index[1:])]
+    print(f"{len(index)} frames, {duration:.1f} s, {len(index) / duration if duration else 0:.1f} fps, "
+          f"{size / 1e6:.1f} Mo, JPEG moyen {size / len(index) / 1e3:.1f} Ko, "
+          f"ecart max {max(gaps, default=0) / 1e3:.1f} ms")
+    return 0
+
+
+def _replay(args):
+    from models import registry
+    from pipeline import Pipeline, DROP_BLOCK, DROP_LATEST
+    from quality import QualityController
+    from recognition import PlateRecognizer
+
+    registry.configure(model_path=args.model, backend=args.backend, input_size=args.imgsz)
+    model, reader = registry.get()
+    recognizer = PlateRecognizer(model, reader)
+    controller = None
+    if args.latency_budget_ms:
+        controller = QualityController(args.latency_budget_ms, audit_path=args.quality_log,
+                                       on_change=lambda message: print(message, file=sys.stderr),
+                                       on_error=lambda message: print(message, file=sys.stderr))
+        controller.attach(recognizer)
+    plates = []
+
+    def recognize(packet):
+        recognizer.read_packets([packet])
+        return packet
+
+    def render(packet):
+        plates.extend(recognizer.plate_events(packet))
+
+    # Sans attente, aucune frame n'est jetée: le résultat ne dépend pas de la machine
+    pipeline = Pipeline(
+        replay_frames(args.recording, args.speed, decode_mode=args.decode_mode),
+        detect=recognizer.detect_packet,
+        recognize=recognize,
+        render=render,
+        ocr_workers=1,
+        drop_policy=DROP_BLOCK if args.speed == 0 else DROP_LATEST,
+        on_error=lambda e: print(f"Erreur du pipeline: {e}", file=sys.stderr),
+        controller=controller,
+    )
+    start = time.perf_counter()
+    pipeline.start()
+    pipeline.join()
+    elapsed = time.perf_counter() - start
+    if recognizer.tracker is not None:
+        recognizer.tracker.finish_all()
+        plates.extend(plate_text for _, plate_text, _, _ in recognizer.tracker.pop_finished())
+
+    stats = pipeline.stats()
+    frames = stats['end_to_end']['processed']
+    result = {'recording': args.recording, 'speed': args.speed, 'elapsed_s': elapsed,
+              'plates': sorted(plates), 'stats': stats}
+    if controller is not None:
+        result['quality'] = list(controller.decisions)
+        print(f"Qualite finale: {controller.current.name}, {len(controller.decisions)} changement(s) de niveau")
+    print(f"{len(plates)} plaques en {elapsed:.1f} s, frames rendues: {frames}")
+    for name, stage in stats.items():
+        print(f"  {name:>10}: {json.dumps(stage)}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            expected = json.load(f)['plates']
+        if expected != result['plates']:
+            print(f"Plaques differentes de {args.compare}: attendu {expected}, obtenu {result['plates']}")
+            return 1
+        print(f"Plaques identiques a {args.compare}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    record = commands.add_parser('record', help="enregistre une camera (libcamera ou URL)")
+    record.add_argument('--camera', default='libcamera')
+    record.add_argument('-o', '--output', required=True)
+    record.add_argument('--seconds', type=float)
+    record.add_argument('--frames', type=int)
+    info = commands.add_parser('info', help="resume d'un enregistrement")
+    info.add_argument('recording')
+    replay = commands.add_parser('replay', help="rejoue un enregistrement dans le pipeline (sans Qt)")
+    replay.add_argument('recording')
+    replay.add_argument('--speed', type=float, default=0.0, help="1 temps reel, 0 sans attente")
+    replay.add_argument('--decode-mode', default='full')
+    replay.add_argument('--backend', choices=('ultralytics', 'onnx'), default='ultralytics')
+    replay.add_argument('--model', default='best.pt')
+    replay.add_argument('--imgsz', type=int, default=640)
+    replay.add_argument('--json', help="enregistre plaques et statistiques")
+    replay.add_argument('--compare', help="JSON d'une execution precedente: echec si les plaques different")
+    replay.add_argument('--latency-budget-ms', type=float, help="active le controleur de qualite (quality.py)")
+    replay.add_argument('--quality-log', help="journal JSONL des changements de niveau")
+    args = parser.parse_args(argv)
+    return {'record': _record, 'info': _info, 'replay': _replay}[args.command](args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""Generateur de plaques et de frames synthetiques (benchmarks hors ligne).
+
+Les plaques suivent le format a 10 chiffres (5 serie + 3 annee + 2 wilaya);
+tout est deterministe pour une graine donnee.
+"""
+import cv2
+import numpy as np
+
+PLATE_SIZE = (200, 44)
+
+
+def random_plate_text(rng):
+    return "".join(str(d) for d in rng.integers(0, 10, 10))
+
+
+def make_plate(text, size=PLATE_SIZE):
+    w, h = size
+    plate = np.full((h, w, 3), 235, dtype=np.uint8)
+    cv2.rectangle(plate, (0, 0), (w - 1, h - 1), (20, 20, 20), 2)
+    scale = cv2.getFontScaleFromHeight(cv2.FONT_HERSHEY_SIMPLEX, int(h * 0.6), 2)
+    (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, 2)
+    cv2.putText(plate, text, ((w - tw) // 2, (h + th) // 2), cv2.FONT_HERSHEY_SIMPLEX, scale,
+                (15, 15, 15), 2, cv2.LINE_AA)
+    return plate
+
+
+def make_frame(rng, width=640, height=480, max_plates=2, noise=8):
+    """Renvoie (frame, [(xmin, ymin, xmax, ymax, texte), ...])."""
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    # Fond: degrade "route" + bruit
+    gradient = np.linspace(70, 140, height, dtype=np.float32)[:, None, None]
+    frame[:] = np.clip(gradient + rng.normal(0, noise, (height, width, 1)), 0, 255).astype(np.uint8)
+    truth = []
+    for _ in range(rng.integers(1, max_plates + 1)):
+        text = random_plate_text(rng)
+        scale = rng.uniform(0.6, 1.3)
+        w, h = int(PLATE_SIZE[0] * scale), int(PLATE_SIZE[1] * scale)
+        plate = make_plate(text, (w, h))
+        for _ in range(10):
+            x = int(rng.integers(0, width - w))
+            y = int(rng.integers(0, height - h))
+            if all(x + w < b[0] or b[2] < x or y + h < b[1] or b[3] < y for b in truth):
+                frame[y:y + h, x:x + w] = plate
+                truth.append((x, y, x + w, y + h, text))
+                break
+    return frame, truth
+
+
+def make_corpus(count, seed=0, **kwargs):
+    rng = np.random.default_rng(seed)
+    return [make_frame(rng, **kwargs) for _ in range(count)]
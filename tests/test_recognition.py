@@ -0,0 +1,38 @@
+"""Plafond max_ocr_plates avec le suivi: une piste reportée finit par être lue."""
+import numpy as np
+
+from recognition import PlateRecognizer
+
+BOXES = [(20, 20, 220, 64, 0.9), (300, 200, 500, 244, 0.6)]
+
+
+class FakeDetector:
+    def detect_batch(self, images):
+        return [list(BOXES) for _ in images]
+
+
+class FakeReader:
+    def __init__(self):
+        self.crops = []
+
+    def recognize(self, canvas, horizontal_list, **kwargs):
+        self.crops.append(len(horizontal_list))
+        return [([[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]], '0123456789', 0.9)
+                for x_min, x_max, y_min, y_max in horizontal_list]
+
+
+def test_deferred_tracks_are_read():
+    reader = FakeReader()
+    recognizer = PlateRecognizer(FakeDetector(), reader, motion_gate=False, max_ocr_plates=1)
+    frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    for seq in range(12):
+        recognizer.process(frame, seq)
+
+    tracks = list(recognizer.tracker.tracks.values())
+    assert len(tracks) == 2
+    assert all(track.reads > 0 for track in tracks)
+    assert max(reader.crops) == 1
+    assert recognizer.tracker.deferred > 0
+
+    events = recognizer.finish()
+    assert sorted(event.track_id for event in events) == [track.id for track in tracks]
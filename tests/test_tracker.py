@@ -0,0 +1,27 @@
+"""Lectures réservées du PlateTracker: une tentative ne compte qu'au retour de l'OCR."""
+from tracker import PlateTracker
+
+BOX = (20, 20, 220, 64, 0.9)
+
+
+def test_released_reads_do_not_use_attempts():
+    tracker = PlateTracker(max_reads=2)
+    for seq in range(10):
+        ((track_id, needs_ocr),) = tracker.update([BOX], seq=seq)
+        if needs_ocr:
+            # Paquet jeté avant l'OCR (file pleine)
+            tracker.release(track_id, seq)
+    track = tracker.tracks[track_id]
+    assert track.attempts == 0 and track.best_quality == 0.0 and not track.inflight
+
+    ((track_id, needs_ocr),) = tracker.update([BOX], seq=10)
+    assert needs_ocr
+    tracker.add_read(track_id, '0123456789', 0.9, 10)
+    assert track.attempts == 1 and track.reads == 1
+
+
+def test_inflight_reads_count_toward_max_reads():
+    tracker = PlateTracker(max_reads=2)
+    scheduled = [needs_ocr for seq in range(5) for _, needs_ocr in tracker.update([BOX], seq=seq)]
+    # Pas de lecture valide revenue: on réessaie, mais pas plus de max_reads lectures en vol
+    assert scheduled == [True, True, False, False, False]
@@ -0,0 +1,249 @@
+"""Suivi multi-objets des plaques detectees par YOLO.
+
+Chaque boite est associee a une piste (IoU, puis distance des centres). L'OCR
+n'est relance que pour une nouvelle piste ou quand un crop nettement plus net
+ou plus grand apparait; les lectures d'une piste sont combinees par vote
+caractere par caractere et un seul evenement est emis a la fin de la piste.
+La premiere lecture valide d'une piste est aussi signalee (``pop_first_reads``),
+pour les alertes qui ne peuvent pas attendre la sortie du champ.
+"""
+import itertools
+import threading
+import time
+from collections import Counter
+
+import cv2
+
+
+def iou(box_a, box_b):
+    xa = max(box_a[0], box_b[0])
+    ya = max(box_a[1], box_b[1])
+    xb = min(box_a[2], box_b[2])
+    yb = min(box_a[3], box_b[3])
+    inter = max(0, xb - xa) * max(0, yb - ya)
+    if inter == 0:
+        return 0.0
+    area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+    area_b = (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+def crop_quality(crop):
+    # Surface x nettete (variance du laplacien): un crop plus grand et plus net lit mieux
+    if crop is None or crop.size == 0:
+        return 0.0
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+    return float(gray.shape[0] * gray.shape[1]) * (1.0 + sharpness)
+
+
+class Track:
+    def __init__(self, track_id, box, timestamp):
+        self.id = track_id
+        self.box = box
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.hits = 1
+        self.missed = 0
+        # Qualité du meilleur crop effectivement lu, et lectures terminées (valides ou non)
+        self.best_quality = 0.0
+        self.reads = 0
+        self.attempts = 0
+        # Lectures demandées mais pas encore revenues: {seq du paquet: qualité du crop}
+        self.inflight = {}
+        # Première lecture valide déjà signalée (pop_first_reads)
+        self.announced = False
+        # Votes par longueur de texte puis par position: {longueur: [Counter, ...]}
+        self.votes = {}
+
+    def add_read(self, text, score):
+        if not text:
+            return
+        self.reads += 1
+        positions = self.votes.setdefault(len(text), [Counter() for _ in text])
+        for position, char in zip(positions, text):
+            position[char] += score if score else 1e-3
+
+    def plate(self):
+        """Renvoie (texte voté, confiance moyenne du vote) ou ("", 0.0)."""
+        if not self.votes:
+            return "", 0.0
+        positions = max(self.votes.values(), key=lambda p: sum(p[0].values()))
+        text = []
+        agreement = 0.0
+        for position in positions:
+            char, weight = position.most_common(1)[0]
+            text.append(char)
+            agreement += weight / sum(position.values())
+        return "".join(text), agreement / len(positions)
+
+
+class PlateTracker:
+    def __init__(self, iou_threshold=0.3, max_distance=0.5, max_missed=15, improve_ratio=1.3, max_reads=5):
+        self.iou_threshold = iou_threshold
+        # Distance max entre centres, relative a la diagonale de la piste
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.improve_ratio = improve_ratio
+        self.max_reads = max_reads
+        self.tracks = {}
+        self.ocr_calls = 0
+        # Lectures reportées faute de budget (max_ocr)
+        self.deferred = 0
+        self._finished = []
+        self._first_reads = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _match_score(self, track, box):
+        overlap = iou(track.box, box)
+        if overlap >= self.iou_threshold:
+            return 1.0 + overlap
+        tx, ty = (track.box[0] + track.box[2]) / 2.0, (track.box[1] + track.box[3]) / 2.0
+        bx, by = (box[0] + box[2]) / 2.0, (box[1] + box[3]) / 2.0
+        diagonal = ((track.box[2] - track.box[0]) ** 2 + (track.box[3] - track.box[1]) ** 2) ** 0.5
+        distance = ((tx - bx) ** 2 + (ty - by) ** 2) ** 0.5 / max(diagonal, 1.0)
+        if distance <= self.max_distance:
+            return 1.0 - distance
+        return 0.0
+
+    def update(self, boxes, frame=None, timestamp=None, max_ocr=None, seq=0):
+        """Associe les boites de la frame aux pistes.
+
+        Renvoie, pour chaque boite, ``(track_id, needs_ocr)``. Avec ``max_ocr``, seules
+        les ``max_ocr`` boites les plus sures parmi celles a lire sont retenues; les
+        autres pistes ne perdent ni tentative ni qualite de reference et seront lues
+        a une frame suivante. Une lecture demandee est reservee sous ``seq`` (numero du
+        paquet) et ne compte qu'a son retour (``add_read``) ou disparait avec ``release``.
+        """
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        with self._lock:
+            candidates = []
+            for track in self.tracks.values():
+                for index, box in enumerate(boxes):
+                    score = self._match_score(track, box)
+                    if score > 0:
+                        candidates.append((score, track.id, index))
+            candidates.sort(reverse=True)
+
+            assigned = {}
+            used_tracks = set()
+            for score, track_id, index in candidates:
+                if track_id in used_tracks or index in assigned:
+                    continue
+                assigned[index] = track_id
+                used_tracks.add(track_id)
+
+            tracks = []
+            wanted = {}
+            for index, box in enumerate(boxes):
+                box = tuple(box[:4])
+                track_id = assigned.get(index)
+                if track_id is None:
+                    track = Track(next(self._ids), box, timestamp)
+                    self.tracks[track.id] = track
+                    used_tracks.add(track.id)
+                else:
+                    track = self.tracks[track_id]
+                    track.box = box
+                    track.last_seen = timestamp
+                    track.hits += 1
+                    track.missed = 0
+                tracks.append(track)
+
+                if track.attempts + len(track.inflight) < self.max_reads:
+                    quality = 1.0
+                    if frame is not None:
+                        quality = crop_quality(frame[box[1]:box[3], box[0]:box[2]])
+                    # Tant qu'aucune lecture n'est valide on réessaie, sinon seulement sur un crop meilleur
+                    # que ceux déjà lus ou en cours de lecture
+                    reference = max(track.best_quality, max(track.inflight.values(), default=0.0))
+                    if track.reads == 0 or quality > reference * self.improve_ratio:
+                        wanted[index] = quality
+
+            if max_ocr is not None and len(wanted) > max_ocr:
+                # Les plus sûres d'abord; une piste écartée garde ses tentatives pour la frame suivante
+                keep = sorted(wanted, key=lambda i: boxes[i][4] if len(boxes[i]) > 4 else 0.0,
+                              reverse=True)[:max_ocr]
+                self.deferred += len(wanted) - len(keep)
+                wanted = {index: wanted[index] for index in keep}
+
+            results = []
+            for index, track in enumerate(tracks):
+                needs_ocr = index in wanted
+                if needs_ocr:
+                    track.inflight[seq] = wanted[index]
+                    self.ocr_calls += 1
+                results.append((track.id, needs_ocr))
+
+            for track_id in list(self.tracks):
+                if track_id not in used_tracks:
+                    track = self.tracks[track_id]
+                    track.missed += 1
+                    if track.missed > self.max_missed:
+                        self._finish(track)
+            return results
+
+    def skip_frame(self):
+        """Frame sans detection (porte de mouvement, pas de detection).
+
+        ``max_missed`` compte des frames, pas des appels a ``update``: les pistes
+        deja absentes a la derniere detection vieillissent aussi sur ces frames.
+        Celles vues a la derniere detection sont gardees, la scene n'ayant pas change.
+        """
+        with self._lock:
+            for track in list(self.tracks.values()):
+                if track.missed:
+                    track.missed += 1
+                    if track.missed > self.max_missed:
+                        self._finish(track)
+
+    def add_read(self, track_id, text, score, seq=0):
+        with self._lock:
+            track = self.tracks.get(track_id)
+            if track is not None:
+                quality = track.inflight.pop(seq, None)
+                if quality is not None:
+                    track.attempts += 1
+                    track.best_quality = max(track.best_quality, quality)
+                track.add_read(text, score)
+                if not track.announced:
+                    plate_text, confidence = track.plate()
+                    if plate_text:
+                        track.announced = True
+                        self._first_reads.append((track.id, plate_text, confidence, track.box, track.first_seen))
+
+    def release(self, track_id, seq=0):
+        """Lecture reservee sous ``seq`` abandonnee (paquet jete avant l'OCR): ni tentative ni qualite."""
+        with self._lock:
+            track = self.tracks.get(track_id)
+            if track is not None:
+                track.inflight.pop(seq, None)
+
+    def plate(self, track_id):
+        with self._lock:
+            track = self.tracks.get(track_id)
+            return track.plate() if track is not None else ("", 0.0)
+
+    def _finish(self, track):
+        del self.tracks[track.id]
+        plate_text, confidence = track.plate()
+        if plate_text:
+            self._finished.append((track.id, plate_text, confidence, track.box))
+
+    def finish_all(self):
+        with self._lock:
+            for track in list(self.tracks.values()):
+                self._finish(track)
+
+    def pop_first_reads(self):
+        """Renvoie ``(track_id, plaque, confiance, boite, premiere detection)`` des pistes lues pour la premiere fois."""
+        with self._lock:
+            first_reads, self._first_reads = self._first_reads, []
+            return first_reads
+
+    def pop_finished(self):
+        """Renvoie les evenements ``(track_id, plaque, confiance, derniere boite)`` des pistes terminees."""
+        with self._lock:
+            finished, self._finished = self._finished, []
+            return finished
@@ -0,0 +1,247 @@
+"""Liste de surveillance: recherche approchee des plaques reconnues.
+
+Chaque plaque est d'abord ramenee a une forme canonique (majuscules, sans
+separateurs, lettres confondues avec un chiffre remplacees par ce chiffre:
+O -> 0, S -> 5, B -> 8...), si bien qu'une confusion OCR ne coute rien a
+l'etape de recherche. Les candidats a distance d'edition <= ``max_distance``
+de la forme canonique viennent d'un index de suppressions (SymSpell):
+toutes les chaines obtenues en supprimant jusqu'a ``max_distance``
+caracteres de chaque plaque de la liste, hachees dans un tableau NumPy trie
+(12 octets par cle, un ``searchsorted`` par requete). Deux chaines a
+distance <= k partagent toujours une telle cle, la recherche est donc
+complete. Les candidats sont ensuite verifies et classes avec une distance
+de Levenshtein ponderee sur la plaque lue: une substitution entre
+caracteres confondus coute ``confusion_cost``, les autres operations 1.
+
+    watchlist = Watchlist.load('surveillance.txt')    # "plaque[,motif]" par ligne
+    watchlist.match('O1234S6789')                     # -> [WatchMatch('0123456789', 0.5, 'vol')]
+"""
+import collections
+import threading
+
+import numpy as np
+
+from events import Sink
+from metrics import metrics
+from plate_format import DIGIT_CONFUSABLES, LETTER_CONFUSABLES
+
+SEPARATORS = ' -.'
+
+# Lettre -> chiffre qu'elle remplace dans la forme canonique
+FOLDS = dict(DIGIT_CONFUSABLES)
+FOLDS.update({letter: digit for digit, letter in LETTER_CONFUSABLES.items()})
+
+_CANONICAL_TABLE = bytearray(range(256))
+for _lower in range(ord('a'), ord('z') + 1):
+    _CANONICAL_TABLE[_lower] = _lower - 32
+for _letter, _digit in FOLDS.items():
+    _CANONICAL_TABLE[ord(_letter)] = ord(_digit)
+    _CANONICAL_TABLE[ord(_letter.lower())] = ord(_digit)
+_CANONICAL_TABLE = bytes(_CANONICAL_TABLE)
+_SEPARATORS = SEPARATORS.encode('ascii')
+_STRIP = {ord(c): None for c in SEPARATORS}
+INF = float('inf')
+
+
+def clean(plate_text):
+    return plate_text.upper().translate(_STRIP)
+
+
+def canonical(plate_text):
+    return plate_text.encode('ascii', 'ignore').translate(_CANONICAL_TABLE, _SEPARATORS).decode('ascii')
+
+
+def deletions(text, depth):
+    """Toutes les chaines obtenues en supprimant au plus ``depth`` caracteres de ``text``."""
+    keys = frontier = {text}
+    for _ in range(depth):
+        # Niveau suivant: une suppression de plus sur chaque chaine du niveau courant
+        frontier = {key[:i] + key[i + 1:] for key in frontier for i in range(len(key))}
+        keys = keys | frontier
+    return keys
+
+
+def plate_distance(a, b, max_cost, confusion_cost=0.25):
+    """Levenshtein pondere entre deux plaques (majuscules), ou None au-dela de ``max_cost``."""
+    if abs(len(a) - len(b)) > max_cost:
+        return None
+    fa, fb = canonical(a), canonical(b)
+    if fa == fb and len(a) == len(b):
+        # Seules des confusions séparent les deux plaques: pas besoin de la programmation dynamique
+        cost = confusion_cost * sum(ca != cb for ca, cb in zip(a, b))
+        return cost if cost <= max_cost else None
+    if len(fa) != len(a) or len(fb) != len(b):
+        # Caractères hors ASCII ou séparateurs: pas de coût réduit pour les confusions
+        fa, fb = a, b
+    # Bande |i - j| <= max_cost: les autres cellules dépassent forcément le coût maximal
+    band = int(max_cost)
+    n, m = len(a), len(b)
+    previous = [float(j) if j <= band else INF for j in range(m + 1)]
+    for i in range(1, n + 1):
+        current = [INF] * (m + 1)
+        if i <= band:
+            current[0] = float(i)
+        row_min = current[0]
+        ca, fca = a[i - 1], fa[i - 1]
+        for j in range(max(1, i - band), min(m, i + band) + 1):
+            if ca == b[j - 1]:
+                cost = previous[j - 1]
+            elif fca == fb[j - 1]:
+                cost = previous[j - 1] + confusion_cost
+            else:
+                cost = previous[j - 1] + 1.0
+            if previous[j] + 1.0 < cost:
+                cost = previous[j] + 1.0
+            if current[j - 1] + 1.0 < cost:
+                cost = current[j - 1] + 1.0
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_cost:
+            return None
+        previous = current
+    return previous[m] if previous[m] <= max_cost else None
+
+
+class WatchMatch:
+    __slots__ = ('plate', 'cost', 'label')
+
+    def __init__(self, plate, cost, label=None):
+        self.plate = plate
+        self.cost = cost
+        self.label = label
+
+    def __repr__(self):
+        return f"WatchMatch({self.plate!r}, {self.cost}, {self.label!r})"
+
+
+class Watchlist:
+    def __init__(self, entries=(), max_distance=2, confusion_cost=0.25, rebuild_after=1024):
+        self.max_distance = max_distance
+        self.confusion_cost = confusion_cost
+        # Ajouts en attente, parcourus linéairement jusqu'à la reconstruction de l'index
+        self.rebuild_after = rebuild_after
+        self.plates = []
+        self.labels = []
+        self._pending = []
+        self._keys = np.empty(0, dtype=np.int64)
+        self._ids = np.empty(0, dtype=np.int32)
+        self._lock = threading.Lock()
+        for entry in entries:
+            plate, label = (entry, None) if isinstance(entry, str) else entry
+            self._append(plate, label)
+        self._rebuild()
+
+    @classmethod
+    def load(cls, path, **options):
+        entries = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                plate, _, label = line.strip().partition(',')
+                if plate and not plate.startswith('#'):
+                    entries.append((plate.strip(), label.strip() or None))
+        return cls(entries, **options)
+
+    def _append(self, plate, label):
+        plate = clean(plate)
+        self.plates.append(plate)
+        self.labels.append(label)
+        self._pending.append(len(self.plates) - 1)
+
+    def add(self, plate, label=None):
+        with self._lock:
+            self._append(plate, label)
+            if len(self._pending) >= self.rebuild_after:
+                self._rebuild()
+
+    def _rebuild(self):
+        # Clés: hash de chaque suppression de la forme canonique, triées avec l'indice de la plaque
+        keys, ids = [], []
+        for entry_id, plate in enumerate(self.plates):
+            for key in deletions(canonical(plate), self.max_distance):
+                keys.append(hash(key))
+                ids.append(entry_id)
+        keys = np.array(keys, dtype=np.int64)
+        ids = np.array(ids, dtype=np.int32)
+        order = np.argsort(keys, kind='stable')
+        self._keys, self._ids = keys[order], ids[order]
+        self._pending = []
+
+    def index_bytes(self):
+        return self._keys.nbytes + self._ids.nbytes
+
+    def __len__(self):
+        return len(self.plates)
+
+    def _candidates(self, query):
+        keys, ids = self._keys, self._ids
+        if not len(keys):
+            return set()
+        hashes = np.fromiter((hash(key) for key in deletions(query, self.max_distance)), dtype=np.int64)
+        low = np.searchsorted(keys, hashes)
+        hits = low[keys[np.minimum(low, len(keys) - 1)] == hashes]
+        candidates = set()
+        # Clé partagée par plusieurs plaques: elles se suivent dans le tableau trié
+        for start in hits.tolist():
+            key = keys[start]
+            stop = start + 1
+            while stop < len(keys) and keys[stop] == key:
+                stop += 1
+            candidates.update(ids[start:stop].tolist())
+        return candidates
+
+    def match(self, plate_text, limit=5):
+        """Plaques de la liste proches de ``plate_text``, de la plus proche a la plus lointaine."""
+        plate = clean(plate_text)
+        query = canonical(plate)
+        if not query:
+            return []
+        with metrics.timer('watchlist_match'):
+            with self._lock:
+                candidates = self._candidates(query)
+                candidates.update(self._pending)
+                matches = []
+                for entry_id in candidates:
+                    cost = plate_distance(plate, self.plates[entry_id], self.max_distance, self.confusion_cost)
+                    if cost is not None:
+                        matches.append(WatchMatch(self.plates[entry_id], cost, self.labels[entry_id]))
+        matches.sort(key=lambda match: (match.cost, match.plate))
+        if matches:
+            metrics.inc('watchlist_hits')
+        return matches[:limit]
+
+
+class WatchlistSink(Sink):
+    """Sink du bus d'evenements: ``on_match(event, matches)`` pour chaque plaque proche de la liste.
+
+    Avec le suivi, le sink recoit la premiere lecture valide de chaque piste
+    (evenement ``early``): l'alerte part pendant que le vehicule est encore dans
+    le champ. L'evenement final de la piste (vote complet) n'alerte de nouveau
+    que s'il trouve une plaque de la liste que la premiere lecture n'avait pas trouvee.
+    """
+
+    early_events = True
+
+    def __init__(self, watchlist, on_match, name='watchlist', batch_size=20, flush_interval_ms=20, max_tracks=1024,
+                 **options):
+        super().__init__(name, batch_size=batch_size, flush_interval_ms=flush_interval_ms, **options)
+        self.watchlist = watchlist
+        self.on_match = on_match
+        self.max_tracks = max_tracks
+        # (caméra, piste) -> plaques de la liste déjà signalées par la première lecture
+        self._alerted = collections.OrderedDict()
+
+    def write_batch(self, events):
+        for event in events:
+            matches = self.watchlist.match(event.plate)
+            key = (event.camera_id, event.track_id)
+            if event.early:
+                if matches:
+                    self._alerted[key] = {match.plate for match in matches}
+                    if len(self._alerted) > self.max_tracks:
+                        self._alerted.popitem(last=False)
+                    self.on_match(event, matches)
+                continue
+            alerted = self._alerted.pop(key, ()) if event.track_id is not None else ()
+            if any(match.plate not in alerted for match in matches):
+                self.on_match(event, matches)